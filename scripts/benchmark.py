@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Benchmark des commandes du bot contre le faux serveur OneFlex
+
+Chaque scénario lance un mode de main.py (aucun argument, --show, --date,
+--date en réservation optimiste, --recurring N, job de --schedule, --plan) contre un faux serveur neuf et mesure:
+  - le nombre de requêtes HTTP, détaillé par opération GraphQL
+  - les octets envoyés et reçus
+  - le temps écoulé
+  - le pic de mémoire Python (tracemalloc)
+
+Le nombre d'appels à l'API est notre vraie limite: --compare signale (code de
+sortie 1) toute hausse du nombre de requêtes par rapport à un résultat de référence.
+
+Usage:
+  python scripts/benchmark.py --output bench.json
+  python scripts/benchmark.py --compare bench.json
+  python scripts/benchmark.py --latency 0.05 --scenario recurring --scenario show
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+sys.path.insert(0, str(ROOT / 'src'))
+
+from mock_oneflex_server import MockOneFlexServer
+
+WEEKS = 4
+
+
+def _next_weekday(days_ahead: int) -> str:
+    """Premier jour ouvré à partir de aujourd'hui + days_ahead (YYYY-MM-DD)"""
+    date = datetime.now() + timedelta(days=days_ahead)
+    while date.isoweekday() > 5:
+        date += timedelta(days=1)
+    return date.strftime('%Y-%m-%d')
+
+
+def _vacation_range() -> str:
+    """Vacances couvrant la deuxième semaine de l'horizon (réservations à annuler)"""
+    start = datetime.now() + timedelta(days=7)
+    return f"{start.strftime('%Y-%m-%d')}:{(start + timedelta(days=6)).strftime('%Y-%m-%d')}"
+
+
+# Scénarios: nom -> (préparation non mesurée, commande mesurée, réglages Config)
+SCENARIOS = {
+    'default': (None, [], {}),
+    'show': (['--recurring', str(WEEKS)], ['--show'], {}),
+    'date': (None, ['--date', _next_weekday(3)], {}),
+    'date-optimistic': (None, ['--date', _next_weekday(3)], {'OPTIMISTIC_BOOKING': True}),
+    'recurring': (None, ['--recurring', str(WEEKS)], {}),
+    'recurring-again': (['--recurring', str(WEEKS)], ['--recurring', str(WEEKS)], {}),
+    'scheduled-job': (['--recurring', str(WEEKS)], 'job', {'RECURRING_WEEKS': WEEKS, 'VACATION_DATES': _vacation_range()}),
+    'plan': (['--recurring', str(WEEKS)], ['--plan', str(WEEKS + 2)], {'VACATION_DATES': _vacation_range()}),
+}
+
+
+def setup_environment(server: MockOneFlexServer, cache_dir: str):
+    """Configure le bot pour le faux serveur (avant l'import de main)"""
+    os.environ.update({
+        'ONEFLEX_BASE_URL': server.base_url,
+        'ONEFLEX_TOKEN': server.issue_token(ttl=24 * 3600),
+        'ONEFLEX_REFRESH_TOKEN': '',
+        'IDENTITY_CACHE_FILE': str(Path(cache_dir) / 'identity.json'),
+        'TOKEN_STORE_DIR': str(Path(cache_dir) / 'tokens'),
+        'DESK_CACHE_FILE': str(Path(cache_dir) / 'desks.json'),
+        'BOOKING_STORE_FILE': str(Path(cache_dir) / 'bookings.db'),
+        'BOOKING_JOURNAL_FILE': str(Path(cache_dir) / 'journal.jsonl'),
+        'RESERVATION_DAYS_OF_WEEK': '1,2,3,4,5',
+        'VACATION_DATES': '',
+        'NOTIFICATION_WEBHOOK_URL': '',
+        'RATE_LIMIT_PER_SECOND': '1000',
+        'RATE_LIMIT_BURST': '1000',
+    })
+
+
+def run_scenario(name: str, latency: float) -> dict:
+    """Lance un scénario sur un faux serveur neuf et retourne ses mesures"""
+    import main
+    from oneflex_client import OneFlexClient
+
+    prepare, command, settings = SCENARIOS[name]
+    server = MockOneFlexServer(latency=latency, seed=0).start()
+    OneFlexClient.BASE_URL = server.base_url
+    OneFlexClient.GQL_ENDPOINT = f"{server.base_url}/gql"
+
+    overrides = {key: getattr(main.Config, key) for key in settings}
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            main.Config.IDENTITY_CACHE_FILE = str(Path(cache_dir) / 'identity.json')
+            main.Config.TOKEN_STORE_DIR = str(Path(cache_dir) / 'tokens')
+            main.Config.DESK_CACHE_FILE = str(Path(cache_dir) / 'desks.json')
+            main.Config.BOOKING_STORE_FILE = str(Path(cache_dir) / 'bookings.db')
+            main.Config.BOOKING_JOURNAL_FILE = str(Path(cache_dir) / 'journal.jsonl')
+
+            if prepare is not None:
+                sys.argv = ['main.py'] + prepare
+                main.main()
+            for key, value in settings.items():
+                setattr(main.Config, key, value)
+            server.reset_stats()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            if command == 'job':
+                # Même contexte que le job_context du Scheduler: échéance, mémo et index propres au job
+                bot = main.OneFlexBot()
+                with bot.client.run_scope(main.Config.JOB_DEADLINE):
+                    bot.run_scheduled_booking()
+            else:
+                sys.argv = ['main.py'] + command
+                main.main()
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        for key, value in overrides.items():
+            setattr(main.Config, key, value)
+        server.stop()
+
+    stats = server.stats
+    return {
+        'http_requests': stats['http_requests'],
+        'operations': {key[3:]: count for key, count in sorted(stats.items()) if key.startswith('op:')},
+        'bytes_sent': stats['bytes_in'],
+        'bytes_received': stats['bytes_out'],
+        'wall_seconds': round(wall, 4),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict) -> bool:
+    """
+    Affiche l'écart avec une référence
+
+    Returns:
+        True si aucun scénario ne fait plus d'appels API que la référence
+    """
+    ok = True
+    print(f"\n{'Scénario':<18} {'Requêtes':>14} {'Octets':>20} {'Temps (s)':>20}")
+    for name, current in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            print(f"{name:<18} {current['http_requests']:>14} (nouveau)")
+            continue
+
+        volume_now = current['bytes_sent'] + current['bytes_received']
+        volume_before = before['bytes_sent'] + before['bytes_received']
+        marker = ''
+        if current['http_requests'] > before['http_requests']:
+            marker = '  ❌ régression'
+            ok = False
+        print(
+            f"{name:<18} {before['http_requests']:>5} → {current['http_requests']:<6}"
+            f" {volume_before:>8} → {volume_now:<9}"
+            f" {before['wall_seconds']:>8.3f} → {current['wall_seconds']:<8.3f}{marker}"
+        )
+
+        for operation in sorted(set(current['operations']) | set(before['operations'])):
+            count_now = current['operations'].get(operation, 0)
+            count_before = before['operations'].get(operation, 0)
+            if count_now != count_before:
+                print(f"    {operation}: {count_before} → {count_now}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des commandes du bot contre le faux serveur OneFlex")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="Scénario à lancer (tous par défaut)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Latence simulée par requête (secondes)")
+    parser.add_argument('--output', help="Fichier JSON où écrire les résultats")
+    parser.add_argument('--compare', help="Fichier JSON de référence à comparer")
+    parser.add_argument('--verbose', action='store_true', help="Afficher les logs du bot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        bootstrap = MockOneFlexServer()
+        setup_environment(bootstrap, cache_dir)
+        bootstrap._httpd.server_close()
+
+        import main as bot_main  # Importé après la configuration de l'environnement
+        logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+        results = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'latency': args.latency,
+            'scenarios': {}
+        }
+        for name in args.scenario or SCENARIOS:
+            results['scenarios'][name] = run_scenario(name, args.latency)
+            measures = results['scenarios'][name]
+            print(f"📊 {name:<16} {measures['http_requests']:>3} requête(s)  "
+                  f"{measures['bytes_sent'] + measures['bytes_received']:>7} octets  "
+                  f"{measures['wall_seconds']:>7.3f}s  {measures['peak_memory_kb']:>8.1f} Ko  "
+                  f"{measures['operations']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False) + '\n')
+        print(f"\n💾 Résultats écrits dans {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if not compare(results, baseline):
+            print("\n❌ Le nombre d'appels API a augmenté")
+            sys.exit(1)
+        print("\n✅ Pas de hausse du nombre d'appels API")
+
+
+if __name__ == '__main__':
+    main()
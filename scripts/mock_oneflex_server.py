@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Faux serveur OneFlex pour tester le bot hors ligne
+
+Implémente les opérations utilisées par OneFlexClient:
+  - POST /api/auth/token          (refresh du token)
+  - POST /api/gql                 me, user.favoriteSpacesAndDesks, user.affectations,
+                                  createAffectation, deleteAffectation
+                                  (requêtes aliasées regroupées comprises)
+
+Options de simulation: latence, erreurs HTTP aléatoires ou programmées, expiration
+des tokens (401), concurrence sur les bureaux, décalage d'horloge (en-tête Date).
+
+Usage:
+  python scripts/mock_oneflex_server.py --port 8080 --latency 0.05 --contention 0.2
+
+  Puis lancer le bot contre ce serveur:
+  ONEFLEX_BASE_URL=http://127.0.0.1:8080/api ONEFLEX_TOKEN=<token affiché> python src/main.py --show
+
+Utilisable aussi depuis Python (tests, benchmarks):
+  server = MockOneFlexServer(latency=0.01).start()
+  ... server.base_url, server.issue_token(), server.stats ...
+  server.stop()
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+FIELD_PATTERN = re.compile(r'(?:(\w+)\s*:\s*)?(\w+)\s*')
+
+DEFAULT_FAVORITES = [
+    {'space': {'id': 'space-1', 'name': 'Plateau 3'}, 'desk': {'id': 'desk-1', 'name': 'Bureau 3.12'}},
+    {'space': {'id': 'space-1', 'name': 'Plateau 3'}, 'desk': {'id': 'desk-2', 'name': 'Bureau 3.14'}},
+    {'space': {'id': 'space-2', 'name': 'Plateau 4'}, 'desk': {'id': 'desk-3', 'name': 'Bureau 4.02'}},
+]
+
+
+def _b64(data: Dict) -> str:
+    """Encode un dict en base64url sans padding (segment de JWT)"""
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+
+def _decode_claims(token: str) -> Optional[Dict]:
+    """Claims d'un token émis par le faux serveur (None si token opaque)"""
+    if token.count('.') != 2:
+        return None
+    payload = token.split('.')[1]
+    try:
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        return None
+
+
+def _block_end(doc: str, start: int, opening: str, closing: str) -> int:
+    """Index du délimiteur fermant le bloc ouvert à doc[start]"""
+    depth = 0
+    for i in range(start, len(doc)):
+        if doc[i] == opening:
+            depth += 1
+        elif doc[i] == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Document GraphQL mal formé")
+
+
+def parse_root_fields(document: str) -> List[tuple]:
+    """
+    Découpe les champs racine d'un document GraphQL
+
+    Returns:
+        Liste de (alias, nom, arguments, sélection)
+    """
+    i = document.index('{') + 1
+    fields = []
+    while i < len(document):
+        if document[i].isspace():
+            i += 1
+            continue
+        if document[i] == '}':
+            break
+
+        match = FIELD_PATTERN.match(document, i)
+        alias, name = match.group(1) or match.group(2), match.group(2)
+        i = match.end()
+
+        args = ''
+        if i < len(document) and document[i] == '(':
+            end = _block_end(document, i, '(', ')')
+            args, i = document[i + 1:end], end + 1
+        while i < len(document) and document[i].isspace():
+            i += 1
+
+        selection = ''
+        if i < len(document) and document[i] == '{':
+            end = _block_end(document, i, '{', '}')
+            selection, i = document[i:end + 1], end + 1
+
+        fields.append((alias, name, args, selection))
+    return fields
+
+
+def _argument(text: str, name: str, variables: Dict):
+    """Valeur d'un argument passé par variable (name: $variable)"""
+    match = re.search(name + r'\s*:\s*\$(\w+)', text)
+    return variables.get(match.group(1)) if match else None
+
+
+class MockOneFlexServer:
+    """Faux serveur OneFlex en mémoire, servi dans un thread"""
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        token_ttl: float = 900,
+        contention: float = 0.0,
+        clock_offset: float = 0.0,
+        favorites: Optional[List[Dict]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            host: Adresse d'écoute
+            port: Port d'écoute (0 = port libre choisi par le système)
+            latency: Latence ajoutée à chaque réponse (secondes)
+            jitter: Variation aléatoire ajoutée à la latence (secondes)
+            error_rate: Probabilité qu'une requête GraphQL échoue en HTTP 500/502/503
+            token_ttl: Durée de validité des tokens émis (secondes)
+            contention: Probabilité qu'un bureau soit pris par un autre utilisateur
+                au moment de la réservation
+            clock_offset: Avance de l'horloge du serveur sur l'horloge locale (en-tête Date)
+            favorites: Bureaux favoris ({'space': {...}, 'desk': {...}})
+            seed: Graine du générateur aléatoire (résultats reproductibles)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.contention = contention
+        self.clock_offset = clock_offset
+        self.favorites = favorites or DEFAULT_FAVORITES
+        self.random = random.Random(seed)
+
+        self.user = {'id': 'user-1', 'email': 'jane.doe@example.com', 'firstName': 'Jane',
+                     'lastName': 'Doe', 'fullName': 'Jane Doe'}
+        self.bookings: Dict[str, Dict] = {}  # Affectations de l'utilisateur par ID
+        self.taken = set()  # (date, desk_id) réservés par d'autres utilisateurs
+        self.removed_desks = set()  # Bureaux supprimés du plan (createAffectation: desk not found)
+        self.fail_next: List[Optional[int]] = []  # Codes HTTP à renvoyer aux prochaines requêtes GraphQL
+        self.apply_then_fail = 0  # Nombre de createAffectation appliqués puis répondus en 502
+        self.tokens_valid_after = 0.0  # Les tokens émis avant cet instant sont refusés (401)
+        self.stats = Counter()  # Requêtes par opération, octets échangés...
+
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """URL à utiliser comme ONEFLEX_BASE_URL"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> 'MockOneFlexServer':
+        """Démarre le serveur dans un thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mock-oneflex', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le serveur"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def issue_token(self, ttl: Optional[float] = None, subject: Optional[str] = None) -> str:
+        """Émet un access token (JWT non signé) valable ttl secondes"""
+        now = time.time() + self.clock_offset
+        claims = {'sub': subject or self.user['id'], 'iat': now, 'exp': now + (ttl if ttl is not None else self.token_ttl)}
+        return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}.mock"
+
+    def expire_tokens(self):
+        """Invalide tous les tokens émis jusqu'ici (les requêtes suivantes reçoivent un 401)"""
+        with self._lock:
+            self.tokens_valid_after = time.time() + self.clock_offset
+
+    def reset_stats(self):
+        """Remet les compteurs à zéro"""
+        with self._lock:
+            self.stats.clear()
+
+    def _token_valid(self, authorization: Optional[str]) -> bool:
+        """Vérifie l'en-tête Authorization (tokens opaques acceptés tant que rien n'a été expiré)"""
+        if not authorization or not authorization.startswith('Bearer '):
+            return False
+        claims = _decode_claims(authorization[len('Bearer '):])
+        now = time.time() + self.clock_offset
+        if claims is None:
+            return self.tokens_valid_after == 0
+        return claims.get('exp', now + 1) > now and claims.get('iat', 0) >= self.tokens_valid_after
+
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # OPÉRATIONS GRAPHQL
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+    def execute(self, document: str, variables: Dict) -> Dict:
+        """Exécute un document GraphQL (éventuellement aliasé) et retourne {data, errors}"""
+        data, errors = {}, []
+        for alias, name, args, selection in parse_root_fields(document):
+            if name == 'user':
+                operation = 'user.favoriteSpacesAndDesks' if 'favoriteSpacesAndDesks' in selection else 'user.affectations'
+            else:
+                operation = name
+
+            with self._lock:
+                self.stats[f"op:{operation}"] += 1
+                try:
+                    data[alias] = self._resolve(operation, args, selection, variables)
+                except ValueError as e:
+                    data[alias] = None
+                    errors.append({'message': str(e), 'path': [alias]})
+
+        result = {'data': data}
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def _resolve(self, operation: str, args: str, selection: str, variables: Dict):
+        """Résout un champ racine (verrou déjà pris)"""
+        if operation == '__typename':
+            return 'Query'
+
+        if operation == 'me':
+            return dict(self.user)
+
+        if operation == 'user.favoriteSpacesAndDesks':
+            return {'id': self.user['id'], 'favoriteSpacesAndDesks': [
+                {'id': f"fav-{i}", **favorite} for i, favorite in enumerate(self.favorites)
+            ], '__typename': 'User'}
+
+        if operation == 'user.affectations':
+            dates = set((_argument(selection, 'affectationFilter', variables) or {}).get('dates', []))
+            return {'id': self.user['id'], 'affectations': [
+                booking for booking in self.bookings.values() if booking['date'] in dates
+            ], '__typename': 'User'}
+
+        if operation == 'createAffectation':
+            return self._create_affectation(_argument(args, 'data', variables) or {})
+
+        if operation == 'deleteAffectation':
+            affectation_id = _argument(args, 'affectationId', variables)
+            return {'success': self.bookings.pop(affectation_id, None) is not None}
+
+        raise ValueError(f"Cannot query field \"{operation}\" on type \"Query\"")
+
+    def _create_affectation(self, data: Dict) -> Dict:
+        """Crée une affectation par date/moment, ou rejette toute la mutation"""
+        desk_id = data.get('deskId')
+        space_id = (data.get('spacesIdSelection') or [None])[0]
+        dated_moments = data.get('datedMoments') or []
+
+        if desk_id in self.removed_desks:
+            raise ValueError(f"Desk {desk_id} not found")
+
+        for dated_moment in dated_moments:
+            date, moment = dated_moment['date'], dated_moment['moment']
+            if any(b['date'] == date and b['moment'] == moment for b in self.bookings.values()):
+                raise ValueError(f"User already has an affectation on {date} {moment}")
+            if (date, desk_id) not in self.taken and self.random.random() < self.contention:
+                self.taken.add((date, desk_id))
+            if (date, desk_id) in self.taken:
+                raise ValueError(f"Desk {desk_id} is not available on {date}")
+
+        desk = next((f['desk'] for f in self.favorites if f['desk']['id'] == desk_id), {'id': desk_id, 'name': desk_id})
+        space = next((f['space'] for f in self.favorites if f['space']['id'] == space_id), {'id': space_id, 'name': space_id})
+
+        created = []
+        for dated_moment in dated_moments:
+            booking_id = uuid.uuid4().hex
+            self.bookings[booking_id] = {
+                'id': booking_id, 'date': dated_moment['date'], 'moment': dated_moment['moment'], 'active': True,
+                'desk': {**desk, 'coordinates': None, '__typename': 'Desk'},
+                'space': {**space, 'inheritedName': space.get('name'), 'serviceType': 'OFFICE', '__typename': 'Space'},
+                'type': 'OFFICE', 'description': None, '__typename': 'Affectation'
+            }
+            created.append(booking_id)
+
+        return {'id': created[0] if created else None, 'userId': self.user['id'], 'guestId': None,
+                'deskId': desk_id, 'spaceId': space_id, 'services': [], '__typename': 'Affectation'}
+
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # HTTP
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, comme le vrai serveur
+
+            def log_message(self, *args):
+                pass
+
+            def date_time_string(self, timestamp=None):
+                return formatdate(time.time() + server.clock_offset, usegmt=True)
+
+            def _reply(self, status: int, body: Dict):
+                payload = json.dumps(body).encode()
+                with server._lock:
+                    server.stats['bytes_out'] += len(payload)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length)
+                with server._lock:
+                    server.stats['http_requests'] += 1
+                    server.stats['bytes_in'] += len(raw)
+
+                delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0)
+                if delay > 0:
+                    time.sleep(delay)
+
+                try:
+                    body = json.loads(raw or b'{}')
+                except ValueError:
+                    return self._reply(400, {'error': 'invalid JSON'})
+
+                if self.path.rstrip('/').endswith('/auth/token'):
+                    return self._token(body)
+                if self.path.rstrip('/').endswith('/gql'):
+                    return self._graphql(body)
+                self._reply(404, {'error': 'not found'})
+
+            def _token(self, body: Dict):
+                with server._lock:
+                    server.stats['op:auth/token'] += 1
+                if body.get('grant_type') != 'refresh_token' or not body.get('refresh_token'):
+                    return self._reply(400, {'error': 'invalid_grant'})
+                self._reply(200, {'access_token': server.issue_token(), 'token_type': 'Bearer',
+                                  'expires_in': server.token_ttl})
+
+            def _graphql(self, body: Dict):
+                if not server._token_valid(self.headers.get('Authorization')):
+                    return self._reply(401, {'errors': [{'message': 'Unauthorized'}]})
+
+                with server._lock:
+                    code = server.fail_next.pop(0) if server.fail_next else None
+                if code is None and server.error_rate and server.random.random() < server.error_rate:
+                    code = server.random.choice((500, 502, 503))
+                if code:
+                    return self._reply(code, {'error': 'injected failure'})
+
+                document = body.get('query', '')
+                result = server.execute(document, body.get('variables') or {})
+
+                with server._lock:
+                    fail_after_apply = server.apply_then_fail > 0 and 'createAffectation' in document
+                    if fail_after_apply:
+                        server.apply_then_fail -= 1
+                if fail_after_apply:
+                    return self._reply(502, {'error': 'applied, but the gateway failed'})
+
+                self._reply(200, result)
+
+        return Handler
+
+
+def main():
+    """Lance le faux serveur en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Faux serveur OneFlex pour tester le bot hors ligne")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latence par requête (secondes)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variation aléatoire de la latence (secondes)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probabilité d'une erreur 5xx")
+    parser.add_argument('--token-ttl', type=float, default=900, help="Validité des tokens émis (secondes)")
+    parser.add_argument('--contention', type=float, default=0.0, help="Probabilité qu'un bureau soit déjà pris")
+    parser.add_argument('--clock-offset', type=float, default=0.0, help="Avance de l'horloge du serveur (secondes)")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockOneFlexServer(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, token_ttl=args.token_ttl, contention=args.contention,
+        clock_offset=args.clock_offset, seed=args.seed
+    )
+
+    print("🧪 Faux serveur OneFlex démarré")
+    print(f"   ONEFLEX_BASE_URL={server.base_url}")
+    print(f"   ONEFLEX_TOKEN={server.issue_token()}")
+    print("   ONEFLEX_REFRESH_TOKEN=mock-refresh-token")
+    print("   (Ctrl+C pour arrêter)")
+
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Arrêt du faux serveur")
+        server._httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
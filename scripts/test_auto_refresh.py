@@ -11,7 +11,9 @@ from pathlib import Path
 # Ajouter le répertoire parent au PYTHONPATH
 sys.path.insert(0, str(Path(__file__).parent))
 
+from config import Config
 from oneflex_client import OneFlexClient
+from token_store import TokenStore
 from dotenv import load_dotenv
 import logging
 
@@ -40,8 +42,8 @@ def test_refresh():
     print(f"   Token actuel: {token[:50]}...")
     print(f"   Refresh token: {refresh_token}")
     
-    # Créer le client
-    client = OneFlexClient(token=token, refresh_token=refresh_token)
+    # Créer le client (les tokens renouvelés sont enregistrés dans TOKEN_STORE_DIR)
+    client = OneFlexClient(token=token, refresh_token=refresh_token, token_store_dir=Config.TOKEN_STORE_DIR or None)
     
     # Test 1: Vérifier que le token actuel fonctionne
     print("\n" + "="*70)
@@ -85,25 +87,25 @@ def test_refresh():
         print("❌ Échec du refresh")
         return False
     
-    # Test 3: Vérifier que le .env a été mis à jour
+    # Test 3: Vérifier que le token renouvelé a été enregistré (le .env n'est plus réécrit)
     print("\n" + "="*70)
-    print("3️⃣  Test: Vérification de la persistence dans .env")
+    print("3️⃣  Test: Vérification de la persistence dans le stockage des tokens")
     print("="*70)
     
-    # Recharger le .env
-    import importlib
-    import dotenv
-    importlib.reload(dotenv)
-    dotenv.load_dotenv(override=True)
-    
-    token_in_env = os.getenv('ONEFLEX_TOKEN')
-    
-    if token_in_env == new_token:
-        print("✅ Le token dans .env a été mis à jour correctement")
+    if client.token_store is None:
+        print("ℹ️  TOKEN_STORE_DIR vide: les tokens renouvelés ne sont pas conservés")
+        persisted = None
     else:
-        print("⚠️  Le token dans .env ne correspond pas au nouveau token")
-        print(f"   .env: {token_in_env[:50] if token_in_env else 'None'}...")
-        print(f"   Mémoire: {new_token[:50]}...")
+        # Relire le fichier du compte, indépendamment de l'instance du client
+        stored = TokenStore(str(client.token_store.path)).load()
+        token_in_store = stored.get('access_token') if stored else None
+        persisted = token_in_store == new_token
+        if persisted:
+            print(f"✅ Le token renouvelé est enregistré dans {client.token_store.path}")
+        else:
+            print(f"❌ Le token enregistré dans {client.token_store.path} ne correspond pas au nouveau token")
+            print(f"   Fichier: {token_in_store[:50] if token_in_store else 'None'}...")
+            print(f"   Mémoire: {new_token[:50]}...")
     
     # Test 4: Simuler une requête après expiration
     print("\n" + "="*70)
@@ -134,9 +136,16 @@ def test_refresh():
     print("📊 RÉSUMÉ DES TESTS")
     print("="*70)
     print("✅ Refresh manuel: Fonctionne")
-    print("✅ Persistence .env: Fonctionne")
+    if persisted is None:
+        print("ℹ️  Persistence des tokens: Désactivée")
+    else:
+        print(("✅" if persisted else "❌") + " Persistence des tokens: " + ("Fonctionne" if persisted else "Échec"))
     print("✅ Auto-refresh sur 401: " + ("Fonctionne" if result else "À vérifier"))
     
+    if persisted is False:
+        print("\n❌ Le token renouvelé n'a pas été enregistré")
+        return False
+    
     print("\n🎉 Tous les tests sont OK!")
     print("\n💡 Le bot va maintenant renouveler automatiquement le token")
     print("   quand il expire (toutes les ~15 minutes)")
@@ -0,0 +1,122 @@
+"""
+Variante asyncio du client OneFlex, avec concurrence bornée
+"""
+import asyncio
+import contextvars
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import metrics
+from oneflex_client import OneFlexClient
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOneFlexClient:
+    """
+    Client OneFlex utilisable depuis asyncio
+
+    Les appels HTTP restent ceux de OneFlexClient (requests), exécutés dans un pool
+    de threads dédié. Un sémaphore borne le nombre de requêtes simultanées et la
+    session partagée dispose d'autant de connexions keep-alive que de requêtes
+    autorisées en parallèle.
+    """
+
+    def __init__(self, client: OneFlexClient, concurrency: int = 4):
+        """
+        Args:
+            client: Client synchrone déjà configuré (token, cache d'identité, index...)
+            concurrency: Nombre maximum de requêtes OneFlex simultanées
+        """
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='oneflex')
+        # Un sémaphore par boucle asyncio (asyncio.run en crée une par appel, éventuellement
+        # depuis plusieurs jobs planifiés en parallèle)
+        self._semaphores = weakref.WeakKeyDictionary()
+
+        # Pool de connexions partagé: au moins une connexion keep-alive par requête simultanée
+        if client.pool_size < self.concurrency:
+            client.configure_pool(self.concurrency)
+
+    async def _run(self, func, *args, **kwargs):
+        """Exécute un appel bloquant du client dans le pool, sous le sémaphore"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        async with semaphore:
+            # Propager le contexte (échéance du job...) dans le thread qui exécute l'appel
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, lambda: context.run(func, *args, **kwargs))
+
+    async def book_desk(self, desk_id: str, space_id: str, date: datetime, moments: List[str] = None, desk_name: str = "Bureau") -> tuple:
+        """Version asynchrone de OneFlexClient.book_desk"""
+        return await self._run(self.client.book_desk, desk_id, space_id, date, moments, desk_name)
+
+    async def cancel_booking(self, affectation_id: str) -> bool:
+        """Version asynchrone de OneFlexClient.cancel_booking"""
+        return await self._run(self.client.cancel_booking, affectation_id)
+
+    async def get_my_bookings(self, days: int = 30) -> List[Dict]:
+        """Version asynchrone de OneFlexClient.get_my_bookings"""
+        return await self._run(self.client.get_my_bookings, days)
+
+    async def get_favorite_desks(self, prefetch_dates: Optional[List[str]] = None) -> List[Dict]:
+        """Version asynchrone de OneFlexClient.get_favorite_desks"""
+        return await self._run(self.client.get_favorite_desks, prefetch_dates)
+
+    async def book_desk_bulk(
+        self,
+        desk_id: str,
+        space_id: str,
+        dates: List[datetime],
+        moments: List[str] = None,
+        desk_name: str = "Bureau",
+        batch_size: int = 31
+    ) -> Dict[str, tuple]:
+        """
+        Version concurrente de OneFlexClient.book_desk_bulk
+
+        L'horizon est lu une seule fois, puis les lots de dates (et, en cas de rejet,
+        les deux moitiés de chaque lot) sont envoyés en parallèle.
+        """
+        results = {}
+        user_id, chunks = await self._run(self.client._plan_bulk_booking, dates, batch_size, results)
+        moments = moments or ["MORNING", "AFTERNOON"]
+
+        async def book_chunk(date_strs: List[str]):
+            date_strs = await self._run(
+                self.client._try_book_dates, user_id, desk_id, space_id, date_strs, moments, desk_name, results
+            )
+            if date_strs:
+                middle = len(date_strs) // 2
+                await asyncio.gather(book_chunk(date_strs[:middle]), book_chunk(date_strs[middle:]))
+
+        await asyncio.gather(*(book_chunk(chunk) for chunk in chunks))
+        for success, already_existed in results.values():
+            metrics.record_booking(success, already_existed)
+        return results
+
+    async def cancel_bookings(self, affectation_ids: List[str]) -> Dict[str, bool]:
+        """
+        Version concurrente de OneFlexClient.cancel_bookings
+
+        Les annulations sont regroupées par paquets de MAX_BATCH_OPERATIONS
+        mutations aliasées, et les paquets partent en parallèle.
+        """
+        size = self.client.MAX_BATCH_OPERATIONS
+        groups = [affectation_ids[i:i + size] for i in range(0, len(affectation_ids), size)]
+
+        results = {}
+        for group_result in await asyncio.gather(*(self._run(self.client.cancel_bookings, group) for group in groups)):
+            results.update(group_result)
+        return results
+
+    def close(self):
+        """Libère le pool de threads"""
+        self._executor.shutdown(wait=False)
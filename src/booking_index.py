@@ -0,0 +1,130 @@
+"""
+Index local des réservations (affectations) par date et moment
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BookingIndex:
+    """
+    Vue en mémoire des réservations de l'utilisateur sur un horizon de dates
+
+    Rempli en une seule requête affectationsByUserAndDates, puis tenu à jour
+    après chaque création/annulation pour éviter de réinterroger l'API date par date.
+    Les accès sont protégés par un verrou (utilisé depuis plusieurs threads par le client async).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.covered_dates = set()  # Dates (YYYY-MM-DD) déjà chargées depuis l'API
+        self._entries: Dict[Tuple[str, str], List[Dict]] = {}  # (date, moment) -> affectations
+
+    def covers(self, date_str: str) -> bool:
+        """Indique si la date a été chargée dans l'index"""
+        with self._lock:
+            return date_str in self.covered_dates
+
+    def missing_dates(self, dates: Iterable[str]) -> List[str]:
+        """Retourne les dates qui ne sont pas encore couvertes par l'index"""
+        with self._lock:
+            return [d for d in dates if d not in self.covered_dates]
+
+    def load(self, dates: Iterable[str], affectations: List[Dict]):
+        """
+        Intègre le résultat d'une requête d'affectations
+
+        Args:
+            dates: Dates demandées à l'API (marquées comme couvertes même sans réservation)
+            affectations: Affectations retournées par l'API pour ces dates
+        """
+        with self._lock:
+            dates = list(dates)
+            for date_str in dates:
+                for key in [k for k in self._entries if k[0] == date_str]:
+                    del self._entries[key]
+            self.covered_dates.update(dates)
+
+            for affectation in affectations:
+                self.add(affectation)
+
+    def add(self, affectation: Dict):
+        """Ajoute (ou remplace) une affectation dans l'index"""
+        with self._lock:
+            date_str = affectation.get('date')
+            if not date_str:
+                return
+            key = (date_str, affectation.get('moment') or '')
+            entries = self._entries.setdefault(key, [])
+
+            affectation_id = affectation.get('id')
+            if affectation_id:
+                entries[:] = [a for a in entries if a.get('id') != affectation_id]
+            entries.append(affectation)
+
+    def remove(self, affectation_id: str) -> bool:
+        """
+        Retire une affectation de l'index
+
+        Returns:
+            True si l'affectation était présente
+        """
+        with self._lock:
+            removed = False
+            for key in list(self._entries):
+                entries = self._entries[key]
+                kept = [a for a in entries if a.get('id') != affectation_id]
+                if len(kept) != len(entries):
+                    removed = True
+                    if kept:
+                        self._entries[key] = kept
+                    else:
+                        del self._entries[key]
+            return removed
+
+    def dates_of(self, affectation_id: str) -> List[str]:
+        """Dates couvertes par une affectation de l'index"""
+        with self._lock:
+            return sorted({
+                date_str for (date_str, _), entries in self._entries.items()
+                if any(a.get('id') == affectation_id for a in entries)
+            })
+
+    def get(self, date_str: str, moment: Optional[str] = None) -> List[Dict]:
+        """Retourne les affectations d'une date (et éventuellement d'un moment)"""
+        with self._lock:
+            if moment is not None:
+                return list(self._entries.get((date_str, moment), []))
+
+            result = []
+            for (entry_date, _), entries in self._entries.items():
+                if entry_date == date_str:
+                    result.extend(entries)
+            return result
+
+    def active_bookings(self, date_str: str) -> List[Dict]:
+        """Retourne les réservations actives d'une date"""
+        return [a for a in self.get(date_str) if a.get('active', False)]
+
+    def has_booking(self, date_str: str, desk_id: Optional[str] = None) -> bool:
+        """
+        Vérifie si une réservation active existe pour une date
+
+        Args:
+            date_str: Date au format YYYY-MM-DD
+            desk_id: ID du bureau spécifique (optionnel, n'importe quel bureau si None)
+        """
+        active = self.active_bookings(date_str)
+        if desk_id:
+            return any((a.get('desk') or {}).get('id') == desk_id for a in active)
+        return bool(active)
+
+    def bookings(self) -> List[Dict]:
+        """Retourne toutes les affectations de l'index, triées par date puis moment"""
+        with self._lock:
+            result = []
+            for key in sorted(self._entries):
+                result.extend(self._entries[key])
+            return result
@@ -0,0 +1,185 @@
+"""
+Journal local (JSONL, ajout seul) des réservations et annulations en cours
+
+Chaque opération est inscrite avant l'envoi de sa mutation (intention), puis à
+nouveau une fois son résultat connu. Après un arrêt brutal, la reprise sait:
+- quelles dates sont confirmées (ni vérification préalable ni nouvelle mutation)
+- quelles mutations étaient en vol (à vérifier par une lecture avant tout renvoi)
+"""
+import json
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CONFIRMED = ('created', 'already_booked')  # Résultats qui garantissent une réservation
+
+
+class BookingJournal:
+    """
+    Journal des opérations d'écriture, relu au démarrage
+
+    Les enregistrements sont ajoutés en fin de fichier et synchronisés sur disque
+    (fsync) avant l'envoi des mutations correspondantes; une dernière ligne tronquée
+    par un arrêt brutal est ignorée. Seules les opérations de moins de max_age
+    secondes sont reprises: au-delà, une réservation a pu être annulée à la main et
+    l'API fait foi. Le fichier est compacté à l'ouverture, puis dès qu'il a reçu
+    COMPACT_THRESHOLD lignes (et plus de deux fois le nombre d'opérations suivies)
+    depuis le dernier compactage: un processus --schedule ne le fait pas grossir
+    indéfiniment. Les clés sont préfixées
+    par le compte (sujet du token): un changement de compte ne reprend rien.
+    Les accès sont protégés par un verrou (client async).
+    """
+
+    COMPACT_THRESHOLD = 1000  # Lignes ajoutées avant un nouveau compactage
+
+    def __init__(self, path: str, max_age: float = 3600, clock=None):
+        """
+        Args:
+            path: Fichier du journal (JSON lines)
+            max_age: Ancienneté maximale (secondes) d'une opération reprise
+            clock: Horloge (timestamp UNIX), time.time par défaut
+        """
+        self.path = Path(path)
+        self.max_age = max_age
+        self.clock = clock or time.time
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}  # clé -> dernier enregistrement
+        self._appended = 0  # Lignes ajoutées depuis le dernier compactage
+        self.account: Optional[str] = None  # Compte courant, mis à jour par le client
+        self._load()
+
+    def create_key(self, date_str: str) -> str:
+        """Clé d'idempotence d'une réservation: une seule par date (n'importe quel bureau)"""
+        return f"create:{self.account or '-'}:{date_str}"
+
+    def cancel_key(self, affectation_id: str) -> str:
+        """Clé d'idempotence d'une annulation"""
+        return f"cancel:{self.account or '-'}:{affectation_id}"
+
+    def begin(self, keys: Iterable[str], **details):
+        """
+        Inscrit l'intention d'envoyer une mutation (avant l'envoi)
+
+        Args:
+            keys: Clés d'idempotence des opérations de la mutation
+            **details: Informations conservées avec l'intention (bureau, moments...)
+        """
+        now = self.clock()
+        self._append([{'key': key, 'state': 'intent', 'at': now, **details} for key in keys])
+
+    def finish(self, outcomes: Dict[str, str]):
+        """
+        Inscrit le résultat d'opérations
+
+        Args:
+            outcomes: Clé -> 'created', 'already_booked', 'cancelled' ou 'failed'
+        """
+        now = self.clock()
+        self._append([{'key': key, 'state': 'done', 'outcome': outcome, 'at': now} for key, outcome in outcomes.items()])
+        with self._lock:
+            if self._appended >= max(self.COMPACT_THRESHOLD, 2 * len(self._entries)):
+                self._compact()
+
+    def revoke_dates(self, date_strs: Optional[Iterable[str]] = None):
+        """
+        Retire la confirmation de dates dont une réservation vient d'être annulée
+
+        Args:
+            date_strs: Dates concernées (None: toutes les dates confirmées du compte)
+        """
+        if date_strs is None:
+            prefix = self.create_key('')
+            with self._lock:
+                keys = [key for key in self._entries if key.startswith(prefix)]
+        else:
+            keys = [self.create_key(d) for d in date_strs]
+        self.finish({key: 'cancelled' for key in keys})
+
+    def confirmed_dates(self, date_strs: Iterable[str]) -> List[str]:
+        """Dates dont la réservation est confirmée par le journal"""
+        return [d for d in date_strs if self._outcome(self.create_key(d)) in CONFIRMED]
+
+    def pending_dates(self, date_strs: Iterable[str]) -> List[str]:
+        """Dates dont la mutation était en vol (résultat inconnu)"""
+        return [d for d in date_strs if self._state(self.create_key(d)) == 'intent']
+
+    def is_cancelled(self, affectation_id: str) -> bool:
+        """Indique si l'annulation de cette affectation est confirmée par le journal"""
+        return self._outcome(self.cancel_key(affectation_id)) == 'cancelled'
+
+    def _state(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or self.clock() - entry.get('at', 0) > self.max_age:
+                return None
+            return entry.get('state')
+
+    def _outcome(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry.get('state') != 'done' or self.clock() - entry.get('at', 0) > self.max_age:
+                return None
+            return entry.get('outcome')
+
+    def _append(self, records: List[Dict]):
+        """Ajoute des enregistrements et les synchronise sur disque"""
+        if not records:
+            return
+        with self._lock:
+            for record in records:
+                self._entries[record['key']] = record
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._appended += len(records)
+            except OSError as e:
+                logger.warning(f"⚠️ Impossible d'écrire dans le journal des réservations: {e}")
+
+    def _load(self):
+        """Relit le journal, oublie les opérations expirées et compacte le fichier"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                lines = f.readlines()
+        except OSError as e:
+            logger.warning(f"⚠️ Journal des réservations illisible: {e}")
+            return
+
+        now = self.clock()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Ligne tronquée par un arrêt brutal
+            if isinstance(record, dict) and record.get('key') and now - record.get('at', 0) <= self.max_age:
+                self._entries[record['key']] = record
+
+        pending = [key for key, record in self._entries.items() if record.get('state') == 'intent']
+        if pending:
+            logger.info(f"📓 Reprise: {len(pending)} opération(s) interrompue(s), vérifiées avant tout renvoi")
+
+        self._compact()
+
+    def _compact(self):
+        """Réécrit le fichier avec le dernier enregistrement de chaque opération non expirée (verrou tenu ou ouverture)"""
+        now = self.clock()
+        self._entries = {key: record for key, record in self._entries.items() if now - record.get('at', 0) <= self.max_age}
+        try:
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in self._entries.values())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._appended = 0
+        except OSError as e:
+            logger.warning(f"⚠️ Impossible de compacter le journal des réservations: {e}")
@@ -0,0 +1,179 @@
+"""
+Stockage local (SQLite) des réservations, synchronisé date par date avec OneFlex
+"""
+import json
+import sqlite3
+import threading
+import time
+import logging
+from datetime import date as date_type, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2  # 2: réservations rattachées au compte
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS affectations (
+    account TEXT NOT NULL,
+    id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    moment TEXT NOT NULL DEFAULT '',
+    desk_id TEXT,
+    desk_name TEXT,
+    space_id TEXT,
+    space_name TEXT,
+    active INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL,
+    PRIMARY KEY (account, id, date, moment)
+);
+CREATE INDEX IF NOT EXISTS affectations_date ON affectations (account, date);
+CREATE TABLE IF NOT EXISTS synced_dates (
+    account TEXT NOT NULL,
+    date TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (account, date)
+);
+"""
+
+
+class BookingStore:
+    """
+    Réservations de l'utilisateur conservées entre deux exécutions
+
+    Chaque date garde l'heure de sa dernière lecture complète depuis l'API. Une
+    synchronisation ne redemande que les dates jamais lues ou lues depuis plus
+    de max_age secondes (les dates passées ne changent plus). Les créations et
+    annulations faites par le bot sont reportées directement dans le stockage.
+    Les lignes sont rattachées au compte courant (sujet du token): un autre compte
+    ne voit jamais ces réservations et repart d'un stockage vide.
+    Les accès sont protégés par un verrou (client async).
+    """
+
+    RETENTION_DAYS = 30  # Les dates plus anciennes sont purgées
+
+    def __init__(self, path: str, clock=None):
+        """
+        Args:
+            path: Fichier SQLite (":memory:" pour un stockage non persistant)
+            clock: Horloge (timestamp UNIX), time.time par défaut
+        """
+        self.path = path
+        self.clock = clock or time.time
+        self.account = ''  # Compte courant, mis à jour par le client
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            # Ancien schéma (sans compte): ce n'est qu'un cache, il est recréé
+            if self._db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._db.executescript("DROP TABLE IF EXISTS affectations; DROP TABLE IF EXISTS synced_dates;")
+                self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db.executescript(SCHEMA)
+
+    def stale_dates(self, dates: Iterable[str], max_age: float) -> List[str]:
+        """
+        Dates à relire depuis l'API
+
+        Args:
+            dates: Dates au format YYYY-MM-DD
+            max_age: Ancienneté maximale d'une lecture en secondes
+
+        Returns:
+            Les dates jamais lues, ou lues il y a plus de max_age secondes (hors dates passées)
+        """
+        dates = list(dict.fromkeys(dates))
+        today = date_type.today().isoformat()
+        with self._lock:
+            synced = dict(self._db.execute(
+                f"SELECT date, synced_at FROM synced_dates WHERE account = ? AND date IN ({','.join('?' * len(dates))})",
+                [self.account] + dates
+            ).fetchall()) if dates else {}
+
+        now = self.clock()
+        return [
+            d for d in dates
+            if d not in synced or (d >= today and now - synced[d] > max_age)
+        ]
+
+    def replace_dates(self, dates: Iterable[str], affectations: List[Dict]):
+        """
+        Remplace les réservations de dates lues depuis l'API
+
+        Args:
+            dates: Dates demandées (marquées comme synchronisées même sans réservation)
+            affectations: Affectations retournées par l'API pour ces dates
+        """
+        dates = list(dict.fromkeys(dates))
+        now = self.clock()
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM affectations WHERE account = ? AND date = ?", [(self.account, d) for d in dates])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO synced_dates (account, date, synced_at) VALUES (?, ?, ?)",
+                [(self.account, d, now) for d in dates]
+            )
+            self._insert(a for a in affectations if a.get('date') in dates)
+            self._prune()
+
+    def upsert(self, affectation: Dict):
+        """Ajoute (ou remplace) une affectation créée par le bot"""
+        with self._lock, self._db:
+            self._insert([affectation])
+
+    def remove(self, affectation_id: str):
+        """Retire une affectation annulée par le bot"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM affectations WHERE account = ? AND id = ?", (self.account, affectation_id))
+
+    def dates_of(self, affectation_id: str) -> List[str]:
+        """Dates stockées d'une affectation"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT date FROM affectations WHERE account = ? AND id = ? ORDER BY date", (self.account, affectation_id)
+            ).fetchall()
+        return [date for (date,) in rows]
+
+    def bookings(self, dates: Iterable[str]) -> List[Dict]:
+        """Affectations stockées pour ces dates, triées par date puis moment (matin d'abord)"""
+        dates = list(dict.fromkeys(dates))
+        if not dates:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT data FROM affectations WHERE account = ? AND date IN ({','.join('?' * len(dates))}) "
+                "ORDER BY date, CASE moment WHEN 'MORNING' THEN 0 WHEN 'AFTERNOON' THEN 1 ELSE 2 END, id",
+                [self.account] + dates
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _insert(self, affectations: Iterable[Dict]):
+        """Écrit des affectations (verrou et transaction déjà pris)"""
+        rows = []
+        for affectation in affectations:
+            if not affectation.get('id') or not affectation.get('date'):
+                continue
+            desk = affectation.get('desk') or {}
+            space = affectation.get('space') or {}
+            rows.append((
+                self.account, affectation['id'], affectation['date'], affectation.get('moment') or '',
+                desk.get('id'), desk.get('name'), space.get('id'), space.get('name'),
+                1 if affectation.get('active', True) else 0,
+                json.dumps(affectation, ensure_ascii=False)
+            ))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO affectations "
+            "(account, id, date, moment, desk_id, desk_name, space_id, space_name, active, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def _prune(self):
+        """Purge les dates au-delà de la rétention (verrou et transaction déjà pris)"""
+        cutoff = (date_type.today() - timedelta(days=self.RETENTION_DAYS)).isoformat()
+        self._db.execute("DELETE FROM affectations WHERE date < ?", (cutoff,))
+        self._db.execute("DELETE FROM synced_dates WHERE date < ?", (cutoff,))
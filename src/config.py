@@ -21,6 +21,9 @@ if not env_path.exists():
         env_path = Path('.env')  # Fallback: ancien emplacement
 load_dotenv(env_path)  # Charge les variables d'environnement depuis le fichier
 
+# Dossier des fichiers d'état du bot (caches...), à côté du .env utilisé
+config_dir = env_path.parent
+
 
 class Config:
     """
@@ -41,6 +44,43 @@ class Config:
     TOKEN = os.getenv('ONEFLEX_TOKEN')  # Token d'accès SSO (obligatoire)
     REFRESH_TOKEN = os.getenv('ONEFLEX_REFRESH_TOKEN')  # Token de rafraîchissement (stocké mais non utilisé)
     
+    # Dossier des tokens renouvelés (un fichier par compte, écrit de façon atomique)
+    # Le .env n'est lu qu'au démarrage: les tokens obtenus par refresh sont enregistrés ici
+    # Mettre vide "" pour ne pas conserver les tokens renouvelés
+    TOKEN_STORE_DIR = os.getenv('TOKEN_STORE_DIR', str(config_dir / 'tokens'))
+    
+    # Cache du profil utilisateur (ID OneFlex), réutilisé entre deux exécutions
+    # Mettre vide "" pour ne pas le persister sur disque
+    IDENTITY_CACHE_FILE = os.getenv('IDENTITY_CACHE_FILE', str(config_dir / 'identity.json'))
+    
+    # Cache des bureaux favoris et de leurs métadonnées (noms, coordonnées, espaces)
+    # Mettre vide "" pour ne pas le persister sur disque
+    DESK_CACHE_FILE = os.getenv('DESK_CACHE_FILE', str(config_dir / 'desks.json'))
+    
+    # Durée de validité du cache des bureaux en secondes (les favoris changent rarement)
+    # Exemple: 604800 = 7 jours; au-delà, le cache est servi et rafraîchi en arrière-plan
+    DESK_CACHE_TTL = int(os.getenv('DESK_CACHE_TTL', 7 * 24 * 3600))
+    
+    # Stockage local (SQLite) des réservations, synchronisé date par date avec OneFlex
+    # Mettre vide "" pour toujours interroger l'API
+    BOOKING_STORE_FILE = os.getenv('BOOKING_STORE_FILE', str(config_dir / 'bookings.db'))
+    
+    # Ancienneté maximale (secondes) des réservations locales servies à --show et au rappel
+    # Exemple: 600 = une date lue il y a moins de 10 minutes n'est pas redemandée à l'API
+    BOOKING_STORE_MAX_AGE = int(os.getenv('BOOKING_STORE_MAX_AGE', 600))
+    
+    # Journal des réservations/annulations en cours, pour reprendre une exécution interrompue
+    # Mettre vide "" pour ne pas tenir de journal
+    BOOKING_JOURNAL_FILE = os.getenv('BOOKING_JOURNAL_FILE', str(config_dir / 'journal.jsonl'))
+    
+    # Ancienneté maximale (secondes) d'une opération du journal reprise au redémarrage
+    # Exemple: 3600 = après 1 heure, les dates sont revérifiées auprès de l'API
+    BOOKING_JOURNAL_MAX_AGE = int(os.getenv('BOOKING_JOURNAL_MAX_AGE', 3600))
+    
+    # Renouveler le token N secondes avant son expiration (lue dans le JWT)
+    # Exemple: 60 = refresh préventif 1 minute avant les 15 minutes de validité
+    TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', 60))
+    
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # FILTRES OPTIONNELS
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -58,6 +98,9 @@ class Config:
     # Exemple: "03:05" = le bot s'exécutera chaque jour à 3h05 du matin
     RESERVATION_TIME = os.getenv('RESERVATION_TIME', '09:00')
     
+    # Fuseau horaire des heures ci-dessous (changements d'heure été/hiver pris en compte)
+    TIMEZONE = os.getenv('TIMEZONE', 'Europe/Paris')
+    
     # Heure du rappel matinal pour connaître sa place (format HH:MM)
     # Exemple: "08:00" = le bot enverra un rappel à 8h les jours avec réservation
     # Mettre vide "" pour désactiver les rappels
@@ -76,6 +119,29 @@ class Config:
     # Si 0, le mode récurrent est désactivé
     RECURRING_WEEKS = int(os.getenv('RECURRING_WEEKS', 0))
     
+    # Heure d'ouverture des réservations (format HH:MM ou HH:MM:SS), pour le mode snipe
+    # Exemple: "00:00:00" = la date à RESERVATION_DAYS_AHEAD jours ouvre à minuit pile
+    # Mettre vide "" pour désactiver le mode snipe
+    SNIPE_TIME = os.getenv('SNIPE_TIME', '')
+    
+    # Préparation du snipe (token, favoris, requêtes...) N secondes avant l'ouverture
+    SNIPE_LEAD = float(os.getenv('SNIPE_LEAD', 30))
+    
+    # Durée après l'ouverture pendant laquelle les tentatives rejetées sont relancées
+    SNIPE_RETRY_WINDOW = float(os.getenv('SNIPE_RETRY_WINDOW', 3))
+    
+    # Nombre maximum de dates envoyées dans une même mutation createAffectation
+    # Exemple: 31 = un mois de réservations en une seule requête (coupé en deux si rejeté)
+    BOOKING_BATCH_SIZE = int(os.getenv('BOOKING_BATCH_SIZE', 31))
+    
+    # Réservation optimiste: envoyer la mutation sans vérifier d'abord les réservations du jour
+    # Le serveur signale lui-même une réservation existante (utile aux heures d'ouverture disputées)
+    OPTIMISTIC_BOOKING = os.getenv('OPTIMISTIC_BOOKING', 'false').lower() == 'true'
+    
+    # Nombre maximum de requêtes OneFlex envoyées en parallèle (lots de dates, annulations)
+    # Exemple: 1 = tout en séquentiel
+    CONCURRENCY = int(os.getenv('ONEFLEX_CONCURRENCY', 4))
+    
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # GESTION DES VACANCES / ABSENCES
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -95,6 +161,21 @@ class Config:
     # URL du webhook Discord pour recevoir les notifications
     NOTIFICATION_WEBHOOK_URL = os.getenv('NOTIFICATION_WEBHOOK_URL', '')
     
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # SUPERVISION
+    # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    
+    # Port de l'endpoint /metrics (format Prometheus) en mode --schedule
+    # Exemple: 9108 = métriques sur http://<hôte>:9108/metrics (0 = désactivé)
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+    
+    # Adresse d'écoute de /metrics ("0.0.0.0" pour y accéder depuis l'extérieur du container)
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    
+    # Traces des jobs et commandes: un span JSON par ligne (vide = désactivé)
+    # Exemple: /app/data/traces.jsonl
+    TRACE_FILE = os.getenv('TRACE_FILE', '')
+    
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # OPTIONS AVANCÉES
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -102,6 +183,37 @@ class Config:
     # Désactiver la validation des credentials (utile pour tester le container)
     SKIP_VALIDATION = os.getenv('SKIP_VALIDATION', 'false').lower() == 'true'
     
+    # Nouvelles tentatives sur erreur réseau/serveur transitoire (backoff exponentiel avec jitter)
+    # Exemple: 3 = 1 essai + 2 retries, délais tirés entre 0 et 0.5s puis 0 et 1s...
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 3))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 0.5))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 8))
+    
+    # Disjoncteur: après N échecs consécutifs, les requêtes échouent immédiatement
+    # pendant CIRCUIT_RESET_TIMEOUT secondes (OneFlex considéré comme indisponible)
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 60))
+    
+    # Limiteur de débit partagé par toutes les requêtes OneFlex (ralentit sur HTTP 429/503)
+    RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', 5))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', 10))
+    
+    # Connexions HTTP vers OneFlex: taille du pool et keep-alive (réutilisation des connexions TLS)
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+    HTTP_KEEPALIVE = os.getenv('HTTP_KEEPALIVE', 'true').lower() == 'true'
+    
+    # Timeouts de chaque requête en secondes: établissement de la connexion, puis lecture de la réponse
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+    
+    # Durée maximale d'un job planifié en secondes, partagée par toutes ses requêtes
+    # Exemple: 600 = un job bloqué est abandonné après 10 minutes (0 = pas de limite)
+    JOB_DEADLINE = float(os.getenv('JOB_DEADLINE', 600))
+    
+    # Nombre de jobs planifiés (réservation, rappel, snipe) pouvant tourner en même temps
+    # Un job lent ne retarde pas les autres; un même job n'est jamais lancé deux fois en parallèle
+    SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 3))
+    
     @classmethod
     def validate(cls):
         """
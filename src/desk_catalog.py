@@ -0,0 +1,133 @@
+"""
+Cache disque des bureaux favoris et des bureaux/espaces connus
+"""
+import json
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DeskCatalog:
+    """
+    Favoris de l'utilisateur et métadonnées des bureaux, persistés avec une durée de validité
+
+    Les favoris changent rarement: ils sont servis depuis le disque tant que le cache
+    est frais, et encore servis une fois expirés pendant qu'un rafraîchissement tourne
+    en arrière-plan. Le cache est lié à l'ID utilisateur et vidé dès qu'une réservation
+    échoue sur un bureau introuvable; chaque vidage change de génération, et les
+    données lues avant ne sont plus enregistrées.
+    """
+
+    def __init__(self, path: Optional[str], ttl: float = 7 * 24 * 3600, clock=None):
+        """
+        Args:
+            path: Fichier du cache (None = cache en mémoire uniquement)
+            ttl: Durée de validité en secondes
+            clock: Horloge (timestamp UNIX), time.time par défaut
+        """
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.clock = clock or time.time
+        self._lock = threading.Lock()
+        self._data: Optional[Dict] = None
+        self._generation = 0  # Incrémentée à chaque invalidate()
+        self._load()
+
+    @property
+    def generation(self) -> int:
+        """Génération courante, à passer à store() pour des données lues maintenant"""
+        with self._lock:
+            return self._generation
+
+    def favorites(self, user_id: str) -> Optional[List[Dict]]:
+        """Favoris en cache pour cet utilisateur (même expirés), None si absents"""
+        with self._lock:
+            if not self._data or self._data.get('user_id') != user_id:
+                return None
+            return [dict(desk) for desk in self._data.get('favorites', [])]
+
+    def is_fresh(self, user_id: str) -> bool:
+        """Indique si le cache de cet utilisateur a moins de ttl secondes"""
+        with self._lock:
+            if not self._data or self._data.get('user_id') != user_id:
+                return False
+            return self.clock() - self._data.get('fetched_at', 0) < self.ttl
+
+    def desk(self, desk_id: str) -> Optional[Dict]:
+        """Métadonnées connues d'un bureau (nom, coordonnées, espace)"""
+        with self._lock:
+            desk = (self._data or {}).get('desks', {}).get(desk_id)
+            return dict(desk) if desk else None
+
+    def store(self, user_id: str, favorites: List[Dict], desks: List[Dict], source: str, generation: Optional[int] = None) -> bool:
+        """
+        Remplace le contenu du cache
+
+        Args:
+            user_id: ID de l'utilisateur
+            favorites: Favoris ordonnés (desk_id, space_id, name)
+            desks: Métadonnées des bureaux rencontrés (id, name, coordinates, space_id, space_name)
+            source: 'favorites' (favoris explicites) ou 'history' (bureaux les plus réservés)
+            generation: Génération lue avant la requête (les données sont ignorées si le cache a été vidé depuis)
+
+        Returns:
+            True si le cache a été remplacé
+        """
+        data = {
+            'user_id': user_id,
+            'fetched_at': self.clock(),
+            'source': source,
+            'favorites': favorites,
+            'desks': {desk['id']: desk for desk in desks if desk.get('id')},
+        }
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                logger.info("🗑️ Cache des bureaux vidé pendant le rafraîchissement, données ignorées")
+                return False
+            self._data = data
+            self._save(data)
+        return True
+
+    def invalidate(self):
+        """Oublie le cache (mémoire + disque)"""
+        with self._lock:
+            self._data = None
+            self._generation += 1
+            if self.path:
+                try:
+                    self.path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"⚠️ Impossible de supprimer le cache des bureaux: {e}")
+
+    def _load(self):
+        """Relit le cache depuis le disque"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Cache des bureaux illisible: {e}")
+            return
+        if isinstance(data, dict) and data.get('user_id') and isinstance(data.get('favorites'), list):
+            self._data = data
+
+    def _save(self, data: Dict):
+        """Écrit le cache (remplacement atomique, verrou déjà pris)"""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Impossible de sauvegarder le cache des bureaux: {e}")
@@ -0,0 +1,165 @@
+"""
+Regroupement de plusieurs opérations GraphQL indépendantes en une seule requête HTTP
+
+Chaque opération est renommée avec un alias (b0, b1, ...) et ses variables sont
+préfixées pour éviter les collisions. Le résultat et les erreurs sont ensuite
+redistribués à chaque opération d'origine via ces alias.
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# query|mutation [Nom] [(définitions de variables)] { corps }
+_OPERATION_RE = re.compile(
+    r'^\s*(?:(query|mutation)\b\s*(\w+)?\s*(?:\((.*?)\))?)?\s*\{(.*)\}\s*$',
+    re.S
+)
+_FIELD_RE = re.compile(r'\s*(?:(\w+)\s*:\s*)?(\w+)')
+_VARIABLE_RE = re.compile(r'\$(\w+)')
+
+
+def operation_name(query: str) -> str:
+    """
+    Nom d'une opération GraphQL, pour les logs et les métriques
+
+    Le nom déclaré (query monNom) est utilisé, sinon le premier champ racine.
+    """
+    match = _OPERATION_RE.match(query)
+    if not match:
+        return 'unknown'
+    if match.group(2):
+        return match.group(2)
+    field = _FIELD_RE.match(match.group(4))
+    return field.group(2) if field else 'anonymous'
+
+
+def batch_label(names: Iterable[str]) -> str:
+    """Libellé d'une requête HTTP regroupant des opérations (ex: lot[deleteAffectation×3])"""
+    counts = Counter(names)
+    return 'lot[' + ', '.join(name if n == 1 else f"{name}×{n}" for name, n in counts.items()) + ']'
+
+
+class BatchOperation:
+    """Une opération GraphQL à fusionner dans un lot"""
+
+    def __init__(self, query: str, variables: Optional[Dict] = None):
+        match = _OPERATION_RE.match(query)
+        if not match:
+            raise ValueError("Opération GraphQL non reconnue")
+
+        self.kind = match.group(1) or 'query'
+        self.variable_defs = (match.group(3) or '').strip()
+        self.variables = variables or {}
+
+        body = match.group(4)
+        field = _FIELD_RE.match(body)
+        if not field:
+            raise ValueError("Opération GraphQL sans champ racine")
+        self.result_key = field.group(1) or field.group(2)
+        self.field = body[field.start(2):].strip()
+
+        end = _skip_selection(body, field.end())
+        if body[end:].strip():
+            raise ValueError("Le regroupement n'accepte qu'un champ racine par opération")
+
+
+def _skip_balanced(text: str, pos: int, opening: str, closing: str) -> int:
+    """Retourne la position qui suit le bloc équilibré commençant à pos"""
+    depth = 0
+    in_string = False
+    i = pos
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if char == '\\':
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("Opération GraphQL mal formée")
+
+
+def _skip_selection(body: str, pos: int) -> int:
+    """Saute les arguments puis le sous-ensemble de sélection d'un champ racine"""
+    while pos < len(body) and body[pos].isspace():
+        pos += 1
+    if pos < len(body) and body[pos] == '(':
+        pos = _skip_balanced(body, pos, '(', ')')
+        while pos < len(body) and body[pos].isspace():
+            pos += 1
+    if pos < len(body) and body[pos] == '{':
+        pos = _skip_balanced(body, pos, '{', '}')
+    return pos
+
+
+def merge_operations(operations: List[BatchOperation]) -> Tuple[str, Dict, List[str]]:
+    """
+    Fusionne des opérations de même type en un seul document GraphQL
+
+    Args:
+        operations: Opérations à fusionner (toutes query ou toutes mutation)
+
+    Returns:
+        tuple: (document, variables, alias de chaque opération)
+    """
+    kinds = {op.kind for op in operations}
+    if len(kinds) != 1:
+        raise ValueError("Impossible de mélanger query et mutation dans un même lot")
+
+    definitions = []
+    fields = []
+    variables = {}
+    aliases = []
+
+    for i, op in enumerate(operations):
+        alias = f"b{i}"
+        prefix = f"{alias}_"
+        rename = lambda m: f"${prefix}{m.group(1)}"
+
+        if op.variable_defs:
+            definitions.append(_VARIABLE_RE.sub(rename, op.variable_defs))
+        fields.append(f"{alias}: {_VARIABLE_RE.sub(rename, op.field)}")
+        variables.update({f"{prefix}{name}": value for name, value in op.variables.items()})
+        aliases.append(alias)
+
+    header = kinds.pop() + " batch"
+    if definitions:
+        header += "(" + ", ".join(definitions) + ")"
+    document = header + " {\n" + "\n".join(fields) + "\n}"
+    return document, variables, aliases
+
+
+def split_result(result: Dict, operations: List[BatchOperation], aliases: List[str]) -> List[Tuple[Optional[Dict], List[Dict]]]:
+    """
+    Redistribue la réponse d'un lot à chaque opération d'origine
+
+    Les erreurs dont le path commence par un alias sont attribuées à l'opération
+    correspondante; les erreurs sans path concernent tout le lot.
+
+    Returns:
+        Liste de (data, errors) dans l'ordre des opérations, data ayant la même
+        forme que si l'opération avait été envoyée seule
+    """
+    data = result.get('data') or {}
+    errors = result.get('errors') or []
+    global_errors = [e for e in errors if not e.get('path')]
+
+    split = []
+    for op, alias in zip(operations, aliases):
+        op_errors = list(global_errors)
+        for error in errors:
+            path = error.get('path')
+            if path and path[0] == alias:
+                op_errors.append(dict(error, path=[op.result_key] + list(path[1:])))
+
+        op_data = {op.result_key: data[alias]} if alias in data else None
+        split.append((op_data, op_errors))
+    return split
@@ -2,13 +2,21 @@
 Bot de réservation OneFlex
 """
 from datetime import datetime, timedelta
+import asyncio
 import logging
-import schedule
 import time
-from typing import Optional
+from typing import List, Optional
 
 from config import Config
 from oneflex_client import OneFlexClient
+from async_client import AsyncOneFlexClient
+from rate_limiter import rate_limiter
+from resilience import CircuitBreaker, RetryPolicy
+from metrics import MetricsServer, metrics, record_booking
+import tracing
+from scheduler import Scheduler
+from sniper import BookingSniper
+from reconciler import Reconciler, ReconciliationPlan, parse_days_of_week
 from notifications import notification_service
 from vacation_manager import VacationManager
 
@@ -24,16 +32,39 @@ class OneFlexBot:
     
     def __init__(self):
         Config.validate()
+        rate_limiter.configure(Config.RATE_LIMIT_PER_SECOND, Config.RATE_LIMIT_BURST)
+        client_options = {
+            'identity_cache_path': Config.IDENTITY_CACHE_FILE,
+            'token_store_dir': Config.TOKEN_STORE_DIR,
+            'desk_cache_path': Config.DESK_CACHE_FILE,
+            'desk_cache_ttl': Config.DESK_CACHE_TTL,
+            'booking_store_path': Config.BOOKING_STORE_FILE,
+            'booking_store_max_age': Config.BOOKING_STORE_MAX_AGE,
+            'journal_path': Config.BOOKING_JOURNAL_FILE,
+            'journal_max_age': Config.BOOKING_JOURNAL_MAX_AGE,
+            'retry_policy': RetryPolicy(Config.RETRY_MAX_ATTEMPTS, Config.RETRY_BASE_DELAY, Config.RETRY_MAX_DELAY),
+            'circuit_breaker': CircuitBreaker(Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RESET_TIMEOUT),
+            'token_refresh_margin': Config.TOKEN_REFRESH_MARGIN,
+            'pool_size': Config.HTTP_POOL_SIZE,
+            'keepalive': Config.HTTP_KEEPALIVE,
+            'connect_timeout': Config.HTTP_CONNECT_TIMEOUT,
+            'read_timeout': Config.HTTP_READ_TIMEOUT,
+            'optimistic_booking': Config.OPTIMISTIC_BOOKING
+        }
         # Utiliser le token si disponible (pour SSO), sinon email/password
         if Config.TOKEN:
             self.client = OneFlexClient(
                 token=Config.TOKEN,
-                refresh_token=Config.REFRESH_TOKEN
+                refresh_token=Config.REFRESH_TOKEN,
+                **client_options
             )
         else:
-            self.client = OneFlexClient(Config.EMAIL, Config.PASSWORD)
+            self.client = OneFlexClient(Config.EMAIL, Config.PASSWORD, **client_options)
         self.is_logged_in = False
         
+        # Variante asyncio pour traiter les dates en parallèle (concurrence bornée)
+        self.async_client = AsyncOneFlexClient(self.client, Config.CONCURRENCY)
+        
         # Initialiser le gestionnaire de vacances
         self.vacation_manager = VacationManager(Config.VACATION_DATES)
     
@@ -70,10 +101,16 @@ class OneFlexBot:
             days = days_ahead if days_ahead else Config.RESERVATION_DAYS_AHEAD
             date = datetime.now() + timedelta(days=days)
         
+        # Les réservations du jour sont chargées une seule fois dans l'index
+        # (évite une vérification par bureau essayé); en mode optimiste, aucune
+        # vérification: le serveur signale lui-même une réservation existante
+        date_str = date.strftime('%Y-%m-%d')
+        prefetch_dates = None if self.client.optimistic_booking else [date_str]
+        
         # Si pas d'ID spécifié, utiliser le bureau favori avec fallback
         if not desk_id or not space_id:
             logger.info("🔍 Recherche de vos bureaux favoris...")
-            favorite_desks = self.client.get_favorite_desks()
+            favorite_desks = self.client.get_favorite_desks(prefetch_dates=prefetch_dates)
             
             if not favorite_desks:
                 logger.error("❌ Impossible de trouver un bureau favori")
@@ -101,17 +138,21 @@ class OneFlexBot:
                 )
                 
                 if success:
+                    record_booking(True, already_existed)
                     return (True, already_existed)
                 
                 # Si ce n'est pas le dernier bureau, continuer
                 if i < len(favorite_desks) - 1:
                     logger.warning(f"⚠️ Bureau occupé, essai du suivant...")
             
-            # Aucun bureau n'est disponible
+            # Aucun bureau n'est disponible (un seul échec compté pour la date)
             logger.error(f"❌ Aucun de vos {len(favorite_desks)} bureau(x) favori(s) n'est disponible")
+            record_booking(False, False)
             return (False, False)
         else:
             desk_name = Config.DESK_NAME if hasattr(Config, 'DESK_NAME') else "Bureau"
+            if prefetch_dates:
+                self.client.load_booking_index(prefetch_dates)
         
         logger.info(f"🎯 Réservation du bureau: {desk_name}")
         logger.info(f"📅 Date: {date.strftime('%d/%m/%Y')}")
@@ -123,122 +164,240 @@ class OneFlexBot:
             date=date,
             desk_name=desk_name
         )
+        record_booking(success, already_existed)
         
         return (success, already_existed)
     
-    def book_recurring_days(self, weeks_ahead: int = 4) -> dict:
-        """
-        Réserve selon les jours de semaine configurés (ex: tous les lundis, mercredis, vendredis)
-        
-        Args:
-            weeks_ahead: Nombre de semaines à l'avance à réserver
-            
-        Returns:
-            dict: Statistiques des réservations (succès, échecs, déjà réservé)
-        """
-        if not Config.RESERVATION_DAYS_OF_WEEK:
-            logger.error("❌ RESERVATION_DAYS_OF_WEEK n'est pas configuré dans .env")
-            return {'success': 0, 'failed': 0, 'already_booked': 0}
-        
-        if not self.connect():
-            return {'success': 0, 'failed': 0, 'already_booked': 0}
-        
-        # Parser les jours de la semaine (1=Lundi, 7=Dimanche)
+    def _days_of_week(self) -> Optional[List[int]]:
+        """Jours configurés dans RESERVATION_DAYS_OF_WEEK (None si le format est invalide)"""
         try:
-            days_of_week = [int(d.strip()) for d in Config.RESERVATION_DAYS_OF_WEEK.split(',')]
+            return parse_days_of_week(Config.RESERVATION_DAYS_OF_WEEK)
         except ValueError:
             logger.error("❌ Format invalide pour RESERVATION_DAYS_OF_WEEK. Utilisez des chiffres séparés par des virgules (ex: 1,3,5)")
-            return {'success': 0, 'failed': 0, 'already_booked': 0}
+            return None
+    
+    def _reconciler(self, weeks_ahead: int) -> Optional[Reconciler]:
+        """Calendrier souhaité d'après la configuration (None si RESERVATION_DAYS_OF_WEEK est invalide)"""
+        if not Config.RESERVATION_DAYS_OF_WEEK:
+            logger.error("❌ RESERVATION_DAYS_OF_WEEK n'est pas configuré dans .env")
+            return None
+        days_of_week = self._days_of_week()
+        if days_of_week is None:
+            return None
+        return Reconciler(
+            days_of_week,
+            weeks_ahead,
+            self.vacation_manager,
+            auto_cancel=Config.AUTO_CANCEL_VACATIONS
+        )
+    
+    def plan_bookings(self, weeks_ahead: int) -> tuple:
+        """
+        Compare le calendrier souhaité aux réservations réelles
         
-        # Noms des jours pour l'affichage
-        day_names = {1: 'Lundi', 2: 'Mardi', 3: 'Mercredi', 4: 'Jeudi', 5: 'Vendredi', 6: 'Samedi', 7: 'Dimanche'}
-        selected_days = [day_names.get(d, str(d)) for d in days_of_week]
+        Les favoris (en cache) et les réservations des seules dates utiles sont
+        lus en une requête au plus.
         
-        logger.info(f"📅 Réservation récurrente pour: {', '.join(selected_days)}")
-        logger.info(f"⏱️ Période: {weeks_ahead} semaines à l'avance")
+        Returns:
+            tuple: (plan, bureau favori), (None, None) si le plan n'a pas pu être établi
+        """
+        reconciler = self._reconciler(weeks_ahead)
+        if not reconciler or not self.connect():
+            return None, None
+        
+        # Dates confirmées par le journal d'une exécution interrompue: pas de relecture
+        read_dates = reconciler.dates_to_read()
+        confirmed = []
+        if self.client.journal:
+            desired = [d.strftime('%Y-%m-%d') for d in reconciler.desired_dates()]
+            confirmed = self.client.journal.confirmed_dates(desired)
+            read_dates = [d for d in read_dates if d not in confirmed]
+        
+        favorite = self.client.get_favorite_desk(prefetch_dates=read_dates)
+        index = self.client.load_booking_index(read_dates)
+        if index is None:
+            return None, None
+        
+        wanted = set(read_dates)
+        plan = reconciler.plan([b for b in index.bookings() if b.get('date') in wanted], confirmed=confirmed)
+        return plan, favorite
+    
+    def reconcile_bookings(self, weeks_ahead: int = 4) -> dict:
+        """
+        Aligne les réservations sur le calendrier souhaité (jours configurés, hors vacances)
         
-        # Récupérer le bureau favori une seule fois
-        logger.info("🔍 Recherche de votre bureau favori...")
-        favorite = self.client.get_favorite_desk()
+        Une seule lecture, puis seulement les créations et les annulations (vacances)
+        nécessaires, envoyées ensemble. Point d'entrée de --recurring et du mode --schedule.
         
-        if not favorite:
+        Args:
+            weeks_ahead: Nombre de semaines à l'avance à réserver
+            
+        Returns:
+            dict: Statistiques (succès, échecs, déjà réservé, annulées)
+        """
+        stats = {'success': 0, 'failed': 0, 'already_booked': 0, 'cancelled': 0}
+        plan, favorite = self.plan_bookings(weeks_ahead)
+        if plan is None:
+            return stats
+        
+        # Un résultat par date planifiée: les dates à réserver sont comptées par book_desk_bulk
+        stats['already_booked'] = len(plan.already_booked)
+        for _ in plan.already_booked:
+            record_booking(True, True)
+        if plan.is_empty:
+            logger.info(f"✅ Réservations à jour ({len(plan.already_booked)} date(s) déjà réservée(s)), rien à faire")
+            return stats
+        
+        if plan.to_book and not favorite:
             logger.error("❌ Impossible de trouver un bureau favori")
-            return {'success': 0, 'failed': 0, 'already_booked': 0}
-        
-        desk_id = favorite['desk_id']
-        space_id = favorite['space_id']
-        desk_name = favorite['name']
+            stats['failed'] = len(plan.to_book)
+            for _ in plan.to_book:
+                record_booking(False, False)
+            plan.to_book = []
+        
+        logger.info(f"📋 Plan: {len(plan.to_book)} réservation(s), {len(plan.to_cancel)} annulation(s)")
+        for line in plan.describe():
+            logger.info(f"   {line}")
+        
+        cancel_ids = plan.cancel_ids()
+        
+        async def execute():
+            # Annulations et créations envoyées en même temps
+            cancellation = self.async_client.cancel_bookings(cancel_ids) if cancel_ids else None
+            booking = self.async_client.book_desk_bulk(
+                desk_id=favorite['desk_id'],
+                space_id=favorite['space_id'],
+                dates=[datetime.strptime(d, '%Y-%m-%d') for d in plan.to_book],
+                desk_name=favorite['name'],
+                batch_size=Config.BOOKING_BATCH_SIZE
+            ) if plan.to_book else None
+            results = await asyncio.gather(*(task for task in (cancellation, booking) if task is not None))
+            results = iter(results)
+            return (next(results) if cancellation else {}), (next(results) if booking else {})
+        
+        cancelled, booked = asyncio.run(execute())
+        
+        new_bookings = []
+        for date_str in plan.to_book:
+            success, already_existed = booked.get(date_str, (False, False))
+            if success and already_existed:
+                stats['already_booked'] += 1
+            elif success:
+                stats['success'] += 1
+                new_bookings.append(datetime.strptime(date_str, '%Y-%m-%d').strftime('%d/%m/%Y'))
+            else:
+                stats['failed'] += 1
         
-        logger.info(f"🎯 Bureau: {desk_name}\n")
+        cancelled_list = [b for b in plan.to_cancel if cancelled.get(b.get('id'))]
+        stats['cancelled'] = len(cancelled_list)
         
-        # Générer toutes les dates à réserver
-        dates_to_book = []
-        today = datetime.now().date()
+        logger.info(f"\n✅ Résumé:")
+        logger.info(f"  • Nouvelles réservations: {stats['success']}")
+        logger.info(f"  • Déjà réservé: {stats['already_booked']}")
+        logger.info(f"  • Annulées (vacances): {stats['cancelled']}/{len(plan.to_cancel)}")
+        logger.info(f"  • Échecs: {stats['failed']}")
         
-        for week in range(weeks_ahead):
-            for day_of_week in days_of_week:
-                # Calculer la date
-                days_until = (day_of_week - today.isoweekday()) % 7
-                if days_until == 0:
-                    days_until = 7  # Si c'est le même jour, toujours prendre la semaine suivante
-                
-                target_date = today + timedelta(days=days_until + (week * 7))
-                dates_to_book.append(target_date)
+        if new_bookings:
+            notification_service.send_booking_success(stats['success'], weeks_ahead, new_bookings)
+        if cancelled_list:
+            notification_service.send_vacation_cancellation(cancelled_list)
         
-        # Trier les dates
-        dates_to_book.sort()
+        return stats
+    
+    def show_plan(self, weeks_ahead: int) -> Optional[ReconciliationPlan]:
+        """
+        Affiche ce que ferait reconcile_bookings et son coût en requêtes, sans rien modifier
         
-        # Filtrer les dates de vacances
-        dates_to_book = self.vacation_manager.filter_vacation_dates(dates_to_book)
+        Les lectures nécessaires au plan sont faites (et comptées telles quelles);
+        aucune mutation n'est envoyée, leur nombre est calculé à partir du plan.
         
-        if not dates_to_book:
-            logger.warning("⚠️ Aucune date à réserver (toutes sont en vacances)")
-            return {'success': 0, 'failed': 0, 'already_booked': 0}
+        Args:
+            weeks_ahead: Nombre de semaines à l'avance
+            
+        Returns:
+            Le plan, ou None s'il n'a pas pu être établi
+        """
+        before = self.client.sent_requests()
+        plan, favorite = self.plan_bookings(weeks_ahead)
+        reads = self.client.sent_requests() - before
+        if plan is None:
+            logger.error("❌ Impossible d'établir le plan")
+            return None
+        
+        logger.info(f"\n🧭 Plan sur {weeks_ahead} semaine(s) (simulation, aucune réservation modifiée)")
+        logger.info(f"  • Dates lues: {len(plan.read_dates)}, déjà réservées: {len(plan.already_booked)}")
+        if plan.is_empty:
+            logger.info("  ✅ Réservations à jour, rien à faire")
+        for line in plan.describe():
+            logger.info(f"  {line}")
+        
+        if plan.to_book and not favorite:
+            logger.warning("  ⚠️ Aucun bureau favori: les réservations ne pourraient pas être faites")
+            plan.to_book = []
+        elif plan.to_book:
+            logger.info(f"  🪑 Bureau: {favorite['name']}")
+        writes = plan.mutation_requests(Config.BOOKING_BATCH_SIZE, self.client.MAX_BATCH_OPERATIONS)
+        
+        logger.info(f"\n💰 Coût: {sum(reads.values()) + len(writes)} requête(s) GraphQL")
+        logger.info(f"  • Lectures (déjà faites pour ce plan): {sum(reads.values())}")
+        for label, count in sorted(reads.items()):
+            logger.info(f"      {label} ×{count}")
+        logger.info(f"  • Écritures (non envoyées): {len(writes)}")
+        for label in writes:
+            logger.info(f"      {label}")
+        if any(label.startswith('createAffectation') for label in writes):
+            logger.info("  💡 Un lot de réservations rejeté par le serveur est redécoupé (requêtes en plus)")
+        
+        return plan
+    
+    def next_release(self) -> datetime:
+        """Prochain instant d'ouverture des réservations (SNIPE_TIME), à l'heure du serveur"""
+        fmt = '%H:%M:%S' if Config.SNIPE_TIME.count(':') == 2 else '%H:%M'
+        release_time = datetime.strptime(Config.SNIPE_TIME, fmt).time()
+        scheduler = Scheduler(Config.TIMEZONE)
+        release_ts = scheduler.next_occurrence(release_time, self.client.server_clock.now())
+        return datetime.fromtimestamp(release_ts, scheduler.tz)
+    
+    def snipe_release(self, release_at: datetime) -> tuple:
+        """
+        Réserve la date qui ouvre à release_at, à l'instant même de son ouverture
         
-        # Réserver chaque date
-        stats = {'success': 0, 'failed': 0, 'already_booked': 0}
-        new_bookings = []  # Tracker uniquement les NOUVELLES réservations
+        La préparation (token, favoris, requêtes sérialisées, connexion) est faite
+        immédiatement: appeler cette méthode SNIPE_LEAD secondes avant l'ouverture.
         
-        for date in dates_to_book:
-            date_obj = datetime.combine(date, datetime.min.time())
-            day_name = day_names.get(date.isoweekday(), str(date.isoweekday()))
-            
-            logger.info(f"📅 {day_name} {date.strftime('%d/%m/%Y')}")
-            
-            success, already_existed = self.client.book_desk(
-                desk_id=desk_id,
-                space_id=space_id,
-                date=date_obj,
-                desk_name=desk_name
-            )
-            
-            if success:
-                if already_existed:
-                    stats['already_booked'] += 1
-                else:
-                    stats['success'] += 1
-                    new_bookings.append(date.strftime('%d/%m/%Y'))  # Nouvelle réservation
-            else:
-                stats['failed'] += 1
+        Args:
+            release_at: Instant d'ouverture des réservations
             
-            # Petite pause entre les réservations
-            import time
-            time.sleep(0.5)
+        Returns:
+            tuple: (success: bool, already_existed: bool)
+        """
+        date = release_at + timedelta(days=Config.RESERVATION_DAYS_AHEAD)
         
-        # Afficher le résumé
-        logger.info(f"\n✅ Résumé:")
-        logger.info(f"  • Nouvelles réservations: {stats['success']}")
-        logger.info(f"  • Déjà réservé: {stats['already_booked']}")
-        logger.info(f"  • Échecs: {stats['failed']}")
-        logger.info(f"  • Total tenté: {len(dates_to_book)}")
+        if Config.VACATION_DATES and self.vacation_manager.is_vacation_day(date.date()):
+            logger.info(f"🏖️ {date.strftime('%d/%m/%Y')} pendant les vacances, pas de snipe")
+            return (False, False)
         
-        # Envoyer notification UNIQUEMENT si nouvelles réservations
-        if stats['success'] > 0:
-            notification_service.send_booking_success(stats['success'], weeks_ahead, new_bookings)
-        elif stats['already_booked'] > 0 and stats['failed'] == 0:
-            logger.info("ℹ️  Aucune nouvelle réservation (toutes déjà existantes)")
+        if Config.RESERVATION_DAYS_OF_WEEK:
+            days_of_week = self._days_of_week()
+            if days_of_week is None:
+                return (False, False)
+            if date.isoweekday() not in days_of_week:
+                logger.info(f"📅 {date.strftime('%d/%m/%Y')} hors des jours configurés, pas de snipe")
+                return (False, False)
         
-        return stats
+        if not self.connect():
+            return (False, False)
+        
+        sniper = BookingSniper(self.client, retry_window=Config.SNIPE_RETRY_WINDOW)
+        release_ts = release_at.timestamp()
+        if not sniper.prepare(date, release_ts):
+            return (False, False)
+        
+        logger.info(f"⏱️ Ouverture à {release_at.strftime('%H:%M:%S')}, envoi programmé")
+        success, already_existed = sniper.run(release_ts)
+        if success and not already_existed:
+            notification_service.send_booking_success(1, 1, [date.strftime('%d/%m/%Y')])
+        return (success, already_existed)
     
     def send_daily_reminder(self):
         """Envoie un rappel avec les réservations du jour"""
@@ -281,51 +440,42 @@ class OneFlexBot:
             
             logger.info(f"  • {date}{moment_str}: {desk_name}{space_str}")
     
-    def cancel_vacation_bookings(self):
-        """Annule les réservations qui tombent pendant les vacances"""
-        if not self.connect():
-            return
-        
-        logger.info("\n🏖️ Vérification des réservations pendant les vacances...")
-        
-        # Récupérer toutes les réservations
-        bookings = self.client.get_my_bookings(days=90)  # 3 mois à l'avance
-        
-        if not bookings:
-            return
-        
-        # Identifier les réservations à annuler
-        to_cancel = self.vacation_manager.get_vacation_bookings_to_cancel(bookings)
-        
-        if not to_cancel:
-            logger.info("✅ Aucune réservation à annuler pendant les vacances")
-            return
-        
-        logger.info(f"📋 {len(to_cancel)} réservation(s) à annuler:")
-        
-        cancelled_count = 0
-        cancelled_list = []
-        for booking in to_cancel:
-            date = booking.get('date')
-            moment = booking.get('moment', '')
-            booking_id = booking.get('id')
-            desk = booking.get('desk', {})
-            desk_name = desk.get('name', 'Bureau') if desk else 'Bureau'
-            
-            logger.info(f"   🗑️  {date} ({moment}) - {desk_name}")
-            
-            if booking_id and self.client.cancel_booking(booking_id):
-                cancelled_count += 1
-                cancelled_list.append(booking)
-        
-        logger.info(f"\n✅ {cancelled_count}/{len(to_cancel)} réservation(s) annulée(s)\n")
-        
-        # Envoyer une notification si des réservations ont été annulées
-        if cancelled_list:
-            notification_service.send_vacation_cancellation(cancelled_list)
+    def start_metrics_server(self) -> MetricsServer:
+        """Expose les métriques du bot sur /metrics (METRICS_HOST:METRICS_PORT)"""
+        client = self.client
+        metrics.gauge('oneflex_server_clock_offset_seconds', "Décalage estimé de l'horloge OneFlex (serveur - local)",
+                      lambda: client.server_clock.offset if client.server_clock.uncertainty is not None else None)
+        metrics.gauge('oneflex_server_clock_uncertainty_seconds', "Incertitude du décalage d'horloge",
+                      lambda: client.server_clock.uncertainty)
+        metrics.gauge('oneflex_token_expires_in_seconds', "Secondes avant l'expiration du token",
+                      client.token_expires_in)
+        metrics.gauge('oneflex_circuit_open', "1 si le disjoncteur OneFlex est ouvert",
+                      lambda: 0 if client.circuit_breaker.state == client.circuit_breaker.CLOSED else 1)
+        metrics.gauge('oneflex_rate_limit_per_second', "Débit courant du limiteur de requêtes",
+                      lambda: client.rate_limiter.rate)
+        return MetricsServer(metrics, Config.METRICS_PORT, Config.METRICS_HOST).start()
+    
+    def run_scheduled_booking(self):
+        """Job quotidien de réservation du mode --schedule"""
+        # Chaque job part d'un index vide (run_scope): les réservations ont pu changer depuis la veille
+        if Config.RECURRING_WEEKS > 0:
+            # Réserver les semaines à venir et annuler pendant les vacances, en un seul plan
+            self.reconcile_bookings(Config.RECURRING_WEEKS)
+        else:
+            self.book_next_available()
     
     def schedule_daily_booking(self):
         """Configure une réservation automatique quotidienne"""
+        # Jobs déclenchés à l'heure du serveur OneFlex (décalage estimé à chaque réponse)
+        # Chaque job tourne dans son worker, sous l'échéance JOB_DEADLINE du client
+        scheduler = Scheduler(
+            Config.TIMEZONE,
+            clock=self.client.server_clock.now,
+            workers=Config.SCHEDULER_WORKERS,
+            job_timeout=Config.JOB_DEADLINE,
+            job_context=self.client.run_scope
+        )
+        
         # Afficher les périodes de vacances configurées
         if Config.VACATION_DATES:
             logger.info(self.vacation_manager.format_vacations_summary())
@@ -334,45 +484,68 @@ class OneFlexBot:
             logger.info(f"⏰ Réservation récurrente configurée pour {Config.RESERVATION_TIME}")
             logger.info(f"📅 Mode: {Config.RECURRING_WEEKS} semaines à l'avance sur les jours configurés")
             
-            def job():
-                # Annuler les réservations pendant les vacances si activé
-                if Config.AUTO_CANCEL_VACATIONS and Config.VACATION_DATES:
-                    self.cancel_vacation_bookings()
-                
-                # Réserver pour les semaines à venir (en excluant les vacances)
-                self.book_recurring_days(Config.RECURRING_WEEKS)
-            
-            schedule.every().day.at(Config.RESERVATION_TIME).do(job)
+            scheduler.every_day_at(Config.RESERVATION_TIME, self.run_scheduled_booking, 'réservation')
             
             # Planifier le rappel matinal si configuré
             if Config.REMINDER_TIME:
-                schedule.every().day.at(Config.REMINDER_TIME).do(self.send_daily_reminder)
+                scheduler.every_day_at(Config.REMINDER_TIME, self.send_daily_reminder, 'rappel')
                 logger.info(f"⏰ Rappel matinal configuré pour {Config.REMINDER_TIME}")
-                self.book_recurring_days(weeks_ahead=Config.RECURRING_WEEKS)
+                # Premier passage immédiat: mêmes créations et annulations que le job quotidien
+                with self.client.run_scope(Config.JOB_DEADLINE):
+                    self.reconcile_bookings(Config.RECURRING_WEEKS)
                 self.show_my_bookings()
-            
-            schedule.every().day.at(Config.RESERVATION_TIME).do(job)
         else:
             logger.info(f"⏰ Réservation automatique configurée pour {Config.RESERVATION_TIME}")
-            schedule.every().day.at(Config.RESERVATION_TIME).do(self.book_next_available)
+            scheduler.every_day_at(Config.RESERVATION_TIME, self.run_scheduled_booking, 'réservation')
         
+        # Snipe: préparation SNIPE_LEAD secondes avant l'ouverture, envoi à l'instant exact
+        if Config.SNIPE_TIME:
+            release_at = self.next_release()
+            prepare_at = (release_at - timedelta(seconds=Config.SNIPE_LEAD)).strftime('%H:%M:%S')
+            
+            scheduler.every_day_at(prepare_at, lambda: self.snipe_release(self.next_release()), 'snipe')
+            logger.info(f"🎯 Snipe configuré: ouverture à {release_at.strftime('%H:%M:%S')}, préparation à {prepare_at}")
+        
+        # Renouveler le token avant son expiration pour que les jobs ne paient jamais un 401
+        self.client.start_token_refresher()
+        
+        if Config.METRICS_PORT:
+            self.start_metrics_server()
+        
+        for line in scheduler.describe():
+            logger.info(f"📆 Prochaine exécution {line}")
         logger.info("🤖 Bot en attente... (Ctrl+C pour arrêter)")
         
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Vérifier toutes les minutes
+            scheduler.run_forever()
         except KeyboardInterrupt:
+            scheduler.shutdown()
             logger.info("\n👋 Arrêt du bot")
 
 
 def main():
     """Point d'entrée principal"""
     import sys
-    from datetime import datetime, timedelta
     
+    tracing.tracer.configure(Config.TRACE_FILE)
     bot = OneFlexBot()
     
+    # Mode planifié: chaque job ouvre sa propre trace
+    if len(sys.argv) == 2 and sys.argv[1] == '--schedule':
+        bot.schedule_daily_booking()
+        return
+    
+    # Une trace par commande, dont les appels API sont les spans enfants;
+    # les lectures répétées pendant la commande ne coûtent qu'un appel
+    with tracing.span('command', command=' '.join(sys.argv[1:]) or '(aucun)'), bot.client.run_scope():
+        run_command(bot)
+
+
+def run_command(bot: OneFlexBot):
+    """Exécute la commande passée en ligne de commande (hors --schedule)"""
+    import sys
+    from datetime import datetime, timedelta
+    
     # Si aucun argument, réserver pour demain
     if len(sys.argv) == 1:
         logger.info("🚀 Lancement du bot OneFlex")
@@ -387,9 +560,20 @@ def main():
         
         bot.show_my_bookings()
     
-    # Mode planifié
-    elif len(sys.argv) == 2 and sys.argv[1] == '--schedule':
-        bot.schedule_daily_booking()
+    # Réserver la prochaine date à l'instant de son ouverture
+    elif len(sys.argv) == 2 and sys.argv[1] == '--snipe':
+        if not Config.SNIPE_TIME:
+            logger.error("❌ Définissez SNIPE_TIME (heure d'ouverture des réservations) dans .env")
+            return
+        
+        bot.connect()  # Premières réponses du serveur: estimation du décalage d'horloge
+        release_at = bot.next_release()
+        wait = release_at.timestamp() - bot.client.server_clock.now() - Config.SNIPE_LEAD
+        if wait > 0:
+            logger.info(f"⏳ Préparation dans {wait:.0f}s (ouverture à {release_at.strftime('%H:%M:%S')})")
+            time.sleep(wait)
+        bot.snipe_release(release_at)
+        bot.show_my_bookings()
     
     # Afficher les réservations
     elif len(sys.argv) == 2 and sys.argv[1] == '--show':
@@ -397,11 +581,8 @@ def main():
     
     # Réservation récurrente selon les jours de semaine configurés
     elif len(sys.argv) == 2 and sys.argv[1] == '--recurring':
-        # Annuler les réservations pendant les vacances si activé
-        if Config.AUTO_CANCEL_VACATIONS and Config.VACATION_DATES:
-            bot.cancel_vacation_bookings()
-        
-        bot.book_recurring_days()
+        # Réservations et annulations (vacances) calculées en un seul plan
+        bot.reconcile_bookings()
         bot.show_my_bookings()
     
     # Réservation récurrente avec nombre de semaines personnalisé
@@ -409,15 +590,20 @@ def main():
         try:
             weeks = int(sys.argv[2])
             
-            # Annuler les réservations pendant les vacances si activé
-            if Config.AUTO_CANCEL_VACATIONS and Config.VACATION_DATES:
-                bot.cancel_vacation_bookings()
-            
-            bot.book_recurring_days(weeks_ahead=weeks)
+            # Réservations et annulations (vacances) calculées en un seul plan
+            bot.reconcile_bookings(weeks_ahead=weeks)
             bot.show_my_bookings()
         except ValueError:
             logger.error("❌ Le nombre de semaines doit être un entier")
     
+    # Simulation: plan et coût en requêtes, sans réserver ni annuler
+    elif len(sys.argv) in (2, 3) and sys.argv[1] == '--plan':
+        try:
+            weeks = int(sys.argv[2]) if len(sys.argv) == 3 else (Config.RECURRING_WEEKS or 4)
+            bot.show_plan(weeks)
+        except ValueError:
+            logger.error("❌ Le nombre de semaines doit être un entier")
+    
     # Réserver pour une date spécifique (YYYY-MM-DD)
     elif len(sys.argv) == 3 and sys.argv[1] == '--date':
         try:
@@ -466,18 +652,24 @@ Options:
   (aucun)                    Réserve un bureau selon RESERVATION_DAYS_AHEAD
   --schedule                 Lance le bot en mode automatique quotidien
   --show                     Affiche vos réservations actuelles
+  --snipe                    Réserve la prochaine date à l'instant de son ouverture (SNIPE_TIME)
   --date YYYY-MM-DD          Réserve pour une date spécifique (bloqué si vacances)
   --date YYYY-MM-DD --force  Force la réservation même pendant les vacances
   --recurring [WEEKS]        Réserve selon les jours configurés dans RESERVATION_DAYS_OF_WEEK
                              WEEKS: nombre de semaines (défaut: 4)
+  --plan [WEEKS]             Affiche les réservations/annulations que ferait --recurring
+                             et leur coût en requêtes, sans rien envoyer
+                             WEEKS: nombre de semaines (défaut: RECURRING_WEEKS, sinon 4)
 
 Exemples:
   python main.py
   python main.py --schedule
   python main.py --show
+  python main.py --snipe
   python main.py --date 2026-02-01
   python main.py --recurring          # 4 semaines par défaut
   python main.py --recurring 8        # 8 semaines
+  python main.py --plan 8             # Coût d'un passage à 8 semaines
 
 Configuration récurrente (.env):
   RESERVATION_DAYS_OF_WEEK=1,3,5      # Lundi, Mercredi, Vendredi
@@ -0,0 +1,258 @@
+"""
+Métriques du bot (compteurs, histogrammes) et exposition au format Prometheus
+
+Pas de dépendance externe: le format texte de Prometheus est produit directement
+et servi par un petit serveur HTTP local (/metrics) en mode --schedule.
+"""
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    """Formate les labels d'un échantillon: {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    """Échappe une valeur de label"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    """Formate une valeur (entiers sans décimale)"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Compteur monotone, par combinaison de labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """Incrémente le compteur"""
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Valeur courante pour une combinaison de labels"""
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histogramme cumulatif (buckets, somme, nombre), par combinaison de labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # [compteurs par bucket..., +Inf, somme]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Enregistre une observation"""
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in values:
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {counts[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {counts[-2]}"
+
+
+class Gauge:
+    """Valeur instantanée, lue au moment de l'export"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Optional[float]]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self) -> Iterator[str]:
+        value = self.read()
+        if value is not None:
+            yield f"{self.name} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exportées"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], Optional[float]]) -> Gauge:
+        """Enregistre (ou remplace) une jauge lue à l'export"""
+        gauge = Gauge(name, documentation, read)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """Export au format texte Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.debug(f"Métrique {metric.name} illisible: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serveur HTTP local exposant /metrics"""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = '127.0.0.1'):
+        """
+        Args:
+            registry: Métriques à exposer
+            port: Port d'écoute
+            host: Adresse d'écoute (0.0.0.0 pour un accès depuis l'extérieur du container)
+        """
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+
+    def start(self) -> 'MetricsServer':
+        """Démarre le serveur dans un thread"""
+        threading.Thread(target=self._httpd.serve_forever, name='metrics', daemon=True).start()
+        host, port = self._httpd.server_address[:2]
+        logger.info(f"📈 Métriques exposées sur http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# Registre global et métriques du bot
+metrics = MetricsRegistry()
+
+graphql_requests = metrics.counter(
+    'oneflex_graphql_requests_total',
+    "Opérations GraphQL envoyées, par opération et résultat",
+    ('operation', 'outcome')
+)
+graphql_memo_hits = metrics.counter(
+    'oneflex_graphql_memo_hits_total',
+    "Queries GraphQL servies par le mémo de l'exécution, sans appel à l'API, par opération",
+    ('operation',)
+)
+graphql_latency = metrics.histogram(
+    'oneflex_graphql_request_duration_seconds',
+    "Durée des requêtes GraphQL (retries compris), par opération et résultat",
+    ('operation', 'outcome')
+)
+token_refreshes = metrics.counter(
+    'oneflex_token_refresh_total',
+    "Renouvellements du token, par résultat",
+    ('outcome',)
+)
+token_refresh_latency = metrics.histogram(
+    'oneflex_token_refresh_duration_seconds',
+    "Durée des renouvellements du token, par résultat",
+    ('outcome',)
+)
+bookings = metrics.counter(
+    'oneflex_bookings_total',
+    "Réservations traitées, par résultat (created, already_existed, failed)",
+    ('result',)
+)
+job_runs = metrics.counter(
+    'oneflex_job_runs_total',
+    "Exécutions des jobs planifiés, par job et statut",
+    ('job', 'status')
+)
+job_duration = metrics.histogram(
+    'oneflex_job_duration_seconds',
+    "Durée des jobs planifiés",
+    ('job',),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800)
+)
+
+
+def record_booking(success: bool, already_existed: bool):
+    """
+    Compte le résultat d'une date à réserver (tuple retourné par book_desk)
+
+    Un seul résultat par date: l'appelant qui essaie plusieurs bureaux le compte une
+    fois la date tranchée, pas à chaque bureau essayé.
+    """
+    if already_existed:
+        bookings.inc(result='already_existed')
+    elif success:
+        bookings.inc(result='created')
+    else:
+        bookings.inc(result='failed')
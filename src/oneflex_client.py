@@ -2,13 +2,108 @@
 Client pour l'API OneFlex
 """
 import requests
-from typing import Optional, Dict, List
+from requests.adapters import HTTPAdapter
+from contextlib import contextmanager
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Optional, Dict, List
 from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+import json
 import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from booking_index import BookingIndex
+from booking_journal import BookingJournal
+from booking_store import BookingStore
+from desk_catalog import DeskCatalog
+from graphql_batch import BatchOperation, batch_label, merge_operations, operation_name, split_result
+from token_utils import token_expiry, token_lifetime, token_subject
+from token_store import TokenStore
+from rate_limiter import RateLimiter, rate_limiter as shared_rate_limiter
+from server_clock import ServerClock
+from resilience import CircuitBreaker, RetryPolicy
+from request_memo import RequestMemo
+import metrics
+import tracing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Échéance (time.monotonic) du job ou de la commande en cours, partagée par ses requêtes
+_job_deadline: ContextVar[Optional[float]] = ContextVar('oneflex_job_deadline', default=None)
+
+# Lectures déjà obtenues pendant la commande ou le job en cours (None hors exécution)
+_run_memo: ContextVar[Optional[RequestMemo]] = ContextVar('oneflex_run_memo', default=None)
+
+# Index des réservations de la commande ou du job en cours, par client (None hors exécution)
+_run_indexes: ContextVar[Optional[Dict[int, Optional[BookingIndex]]]] = ContextVar('oneflex_run_indexes', default=None)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Le temps alloué au job en cours est épuisé"""
+
+
+# Motifs des erreurs GraphQL d'un createAffectation rejeté, par type de rejet
+_BOOKING_ERRORS = (
+    # Un bureau supprimé ou inconnu (le cache des bureaux est alors périmé)
+    ('desk_not_found', re.compile(r"desk\b.*\b(not found|does not exist|unknown|introuvable|inexistant)", re.IGNORECASE)),
+    # L'utilisateur lui-même a déjà une réservation sur ce créneau (à confirmer par une lecture)
+    ('already_booked', re.compile(r"\b(user|you) already (has|have) an? (affectation|booking|reservation)\b|\bvous avez déjà une (réservation|affectation)\b", re.IGNORECASE)),
+    # Le bureau est pris par quelqu'un d'autre (ou rejet "déjà réservé" sans précision)
+    ('desk_taken', re.compile(r"not available|unavailable|already (taken|booked|reserved)|conflict|indisponible|déjà (pris|réservé)", re.IGNORECASE)),
+)
+
+
+def booking_error_kind(errors: Optional[List[Dict]]) -> Optional[str]:
+    """
+    Type de rejet d'un createAffectation d'après ses erreurs GraphQL
+    
+    Returns:
+        'desk_not_found', 'already_booked', 'desk_taken', ou None si l'erreur n'est pas reconnue
+    """
+    messages = [str((error or {}).get('message', '')) for error in errors or []]
+    for kind, pattern in _BOOKING_ERRORS:
+        if any(pattern.search(message) for message in messages):
+            return kind
+    return None
+
+
+def _desk_metadata(desk: Dict, space: Dict) -> Dict:
+    """Métadonnées d'un bureau pour le cache (id, nom, coordonnées, espace)"""
+    return {
+        'id': desk['id'],
+        'name': desk.get('name'),
+        'coordinates': desk.get('coordinates'),
+        'space_id': space.get('id'),
+        'space_name': space.get('name') or space.get('inheritedName'),
+    }
+
+
+def _span_attributes(*variables: Optional[Dict]) -> Dict:
+    """Bureau et dates visés par des variables GraphQL (attributs de trace)"""
+    desk_ids, dates = [], []
+    for values in variables:
+        data = (values or {}).get('data') or {}
+        if data.get('deskId') and data['deskId'] not in desk_ids:
+            desk_ids.append(data['deskId'])
+        for dated_moment in data.get('datedMoments') or []:
+            if dated_moment.get('date') not in dates:
+                dates.append(dated_moment.get('date'))
+
+    attributes = {}
+    if desk_ids:
+        attributes['desk_id'] = desk_ids[0] if len(desk_ids) == 1 else desk_ids
+    if dates:
+        attributes['date'] = dates[0] if len(dates) == 1 else dates
+    return attributes
+
+
 # Import optionnel pour les notifications (éviter erreur circulaire)
 try:
     from notifications import NotificationService
@@ -20,19 +115,77 @@ except ImportError:
 class OneFlexClient:
     """Client pour interagir avec l'API OneFlex (GraphQL)"""
     
-    BASE_URL = "https://oneflex.myworldline.com/api"
+    BASE_URL = os.getenv('ONEFLEX_BASE_URL', "https://oneflex.myworldline.com/api").rstrip('/')  # Surchargeable (faux serveur de test)
     GQL_ENDPOINT = f"{BASE_URL}/gql"
+    MAX_BATCH_OPERATIONS = 20  # Opérations fusionnées au maximum dans une requête HTTP
+    MIN_REFRESH_INTERVAL = 30  # Écart minimal (secondes) entre deux refresh préventifs
     
-    def __init__(self, email: Optional[str] = None, password: Optional[str] = None, token: Optional[str] = None, refresh_token: Optional[str] = None):
+    def __init__(self, email: Optional[str] = None, password: Optional[str] = None, token: Optional[str] = None, refresh_token: Optional[str] = None, identity_cache_path: Optional[str] = None, rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None, token_refresh_margin: float = 60, pool_size: int = 10, keepalive: bool = True, connect_timeout: float = 5.0, read_timeout: float = 30.0, desk_cache_path: Optional[str] = None, desk_cache_ttl: float = 7 * 24 * 3600, optimistic_booking: bool = False, booking_store_path: Optional[str] = None, booking_store_max_age: float = 600, journal_path: Optional[str] = None, journal_max_age: float = 3600, token_store_dir: Optional[str] = None):
         self.email = email
         self.password = password
         self.token = token
         self.refresh_token = refresh_token
+        
+        # Tokens renouvelés par une exécution précédente (le .env n'est plus réécrit)
+        self.token_store = TokenStore.for_account(token_store_dir, email or token_subject(token)) if token_store_dir else None
+        if self.token_store:
+            self._restore_tokens()
+        
+        # Expiration du token (claim exp) et marge de refresh préventif en secondes
+        self.token_expires_at: Optional[float] = token_expiry(self.token)
+        self._token_lifetime = token_lifetime(self.token) or self.token_expires_in()
+        self.token_refresh_margin = token_refresh_margin
+        self._refresh_lock = threading.Lock()  # Un seul refresh en vol, partagé par les appelants
+        self._refresher_stop: Optional[threading.Event] = None
+        self._last_refresh_failure = 0.0
+        
+        self.rate_limiter = rate_limiter or shared_rate_limiter  # Partagé par tous les clients par défaut
+        self.server_clock = ServerClock()  # Décalage avec l'horloge OneFlex, affiné à chaque réponse
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._sent_requests: Counter = Counter()  # Requêtes GraphQL envoyées, par opération (ou lot)
+        self._sent_lock = threading.Lock()
+        self._booking_index: Optional[BookingIndex] = None  # Index hors commande/job (voir booking_index)
+        self.optimistic_booking = optimistic_booking  # book_desk sans vérification préalable
+        
+        # Réservations persistées entre deux exécutions, servies aux lectures d'affichage
+        # (--show, rappel) tant qu'elles ont moins de booking_store_max_age secondes
+        self.booking_store: Optional[BookingStore] = None
+        self.booking_store_max_age = booking_store_max_age
+        if booking_store_path:
+            try:
+                self.booking_store = BookingStore(booking_store_path)
+                self.booking_store.account = token_subject(self.token) or ''
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"⚠️ Stockage local des réservations indisponible: {e}")
+        
+        # Intentions et résultats des mutations, pour reprendre une exécution interrompue
+        self.journal: Optional[BookingJournal] = BookingJournal(journal_path, journal_max_age) if journal_path else None
+        if self.journal:
+            self.journal.account = token_subject(self.token)
+        
+        # Profil de l'utilisateur connecté (rempli par verify_token, persistable sur disque)
+        self.identity_cache_path = Path(identity_cache_path) if identity_cache_path else None
+        self.identity: Optional[Dict] = None
+        self._load_identity()
+        
+        # Favoris et bureaux connus (persistables sur disque, rafraîchis en arrière-plan)
+        self.desk_catalog = DeskCatalog(desk_cache_path, desk_cache_ttl)
+        self._desk_refresh: Optional[threading.Thread] = None
+        self._desk_refresh_lock = threading.Lock()
         self.session = requests.Session()
         self.session.headers.update({
             'Content-Type': 'application/json'
         })
         
+        # Pool de connexions et timeouts (connexion / lecture) appliqués à tout le trafic OneFlex
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = 0
+        self.configure_pool(pool_size)
+        if not keepalive:
+            self.session.headers['Connection'] = 'close'
+        
         # Si un token est fourni directement, l'utiliser
         if self.token:
             self.session.headers.update({
@@ -42,14 +195,36 @@ class OneFlexClient:
             if self.refresh_token:
                 logger.info("🔄 Refresh token disponible pour auto-refresh")
     
+    @tracing.traced('refresh_token')
     def refresh_access_token(self) -> bool:
         """
         Renouvelle l'access token en utilisant le refresh token
         Utilise l'endpoint /api/auth/token avec grant_type=refresh_token
         
+        Les appels simultanés partagent le même refresh: ceux qui attendaient
+        le verrou réutilisent le token obtenu au lieu d'en demander un autre.
+        
         Returns:
             bool: True si le refresh est réussi
         """
+        token_before = self.token
+        with self._refresh_lock:
+            if self.token != token_before:
+                logger.debug("🔄 Token déjà renouvelé par un autre appel")
+                metrics.token_refreshes.inc(outcome='shared')
+                return True
+            
+            start = time.perf_counter()
+            success = self._request_new_token()
+            outcome = 'success' if success else 'failure'
+            metrics.token_refresh_latency.observe(time.perf_counter() - start, outcome=outcome)
+            metrics.token_refreshes.inc(outcome=outcome)
+            if not success:
+                self._last_refresh_failure = time.time()
+            return success
+    
+    def _request_new_token(self) -> bool:
+        """Appelle /auth/token pour obtenir un nouvel access token (verrou déjà pris)"""
         if not self.refresh_token:
             logger.error("❌ Aucun refresh token disponible")
             return False
@@ -58,14 +233,15 @@ class OneFlexClient:
             logger.info("🔄 Tentative de refresh du token...")
             
             # Utiliser l'endpoint /api/auth/token avec la méthode OAuth2 standard
-            response = requests.post(
+            response = self._send(
+                'POST',
                 f"{self.BASE_URL}/auth/token",
+                use_session=False,
                 json={
                     'grant_type': 'refresh_token',
                     'refresh_token': self.refresh_token
                 },
-                headers={'Content-Type': 'application/json'},
-                timeout=10
+                headers={'Content-Type': 'application/json'}
             )
             
             if response.status_code == 200:
@@ -73,14 +249,20 @@ class OneFlexClient:
                 new_token = data.get('access_token')
                 
                 if new_token:
+                    # Rotation éventuelle du refresh token
+                    if data.get('refresh_token'):
+                        self.refresh_token = data['refresh_token']
+                    
+                    # Un token émis pour un autre utilisateur invalide le profil en cache
+                    if self.identity and self.identity.get('subject') != token_subject(new_token):
+                        logger.info("👤 Nouveau sujet de token, cache d'identité vidé")
+                        self.clear_identity()
+                    
                     # Mettre à jour le token en mémoire
-                    self.token = new_token
-                    self.session.headers.update({
-                        'Authorization': f'Bearer {new_token}'
-                    })
+                    self._set_token(new_token)
                     
-                    # Sauvegarder le nouveau token dans .env
-                    self._update_env_token(new_token)
+                    # Sauvegarder les tokens pour les prochaines exécutions
+                    self._save_tokens()
                     
                     logger.info("✅ Token renouvelé avec succès")
                     return True
@@ -93,121 +275,562 @@ class OneFlexClient:
             logger.error(f"❌ Erreur lors du refresh: {e}")
             return False
     
-    def _update_env_token(self, new_token: str):
+    def _restore_tokens(self):
+        """Reprend les tokens du stockage s'ils sont plus récents que ceux fournis (.env)"""
+        stored = self.token_store.load()
+        if not stored:
+            return
+        
+        # Un token collé à la main dans le .env après le dernier refresh reste prioritaire
+        stored_expiry = token_expiry(stored['access_token']) or stored.get('expires_at') or 0
+        if self.token and stored_expiry <= (token_expiry(self.token) or 0):
+            return
+        
+        self.token = stored['access_token']
+        self.refresh_token = stored.get('refresh_token') or self.refresh_token
+        logger.info(f"🔑 Tokens repris depuis {self.token_store.path}")
+    
+    def _save_tokens(self):
+        """Enregistre les tokens courants dans le stockage (si configuré)"""
+        if self.token_store and self.token:
+            self.token_store.save(self.token, self.refresh_token, self.token_expires_at)
+    
+    def _set_token(self, token: Optional[str]):
+        """Installe un nouvel access token (mémoire, en-tête de session, expiration)"""
+        self.token = token
+        self.token_expires_at = token_expiry(token)
+        self._token_lifetime = token_lifetime(token) or self.token_expires_in()
+        if self.journal:
+            self.journal.account = token_subject(token)
+        if self.booking_store:
+            self.booking_store.account = token_subject(token) or ''
+        if token:
+            self.session.headers.update({
+                'Authorization': f'Bearer {token}'
+            })
+    
+    def token_expires_in(self) -> Optional[float]:
+        """Secondes restantes avant l'expiration du token (None si inconnue)"""
+        if self.token_expires_at is None:
+            return None
+        return self.token_expires_at - time.time()
+    
+    def refresh_margin(self) -> float:
+        """
+        Marge du refresh préventif (secondes avant expiration)
+        
+        token_refresh_margin, bornée à la moitié de la durée de vie du token: sinon un
+        token neuf serait aussitôt à renouveler, à chaque requête comme dans le thread.
+        """
+        lifetime = self._token_lifetime
+        if lifetime and lifetime > 0:
+            return min(self.token_refresh_margin, lifetime / 2)
+        return self.token_refresh_margin
+    
+    def _ensure_fresh_token(self):
+        """Renouvelle le token s'il expire dans moins de refresh_margin() secondes"""
+        if not self.refresh_token:
+            return
+        
+        remaining = self.token_expires_in()
+        if remaining is None or remaining > self.refresh_margin():
+            return
+        
+        # Après un échec, ne pas retenter à chaque requête (le refresh sur 401 reste actif)
+        if time.time() - self._last_refresh_failure < 60:
+            return
+        
+        logger.info(f"⏰ Token expirant dans {max(0, remaining):.0f}s, refresh préventif...")
+        self.refresh_access_token()
+    
+    def start_token_refresher(self):
+        """
+        Démarre un thread qui renouvelle le token peu avant son expiration
+        
+        Utilisé en mode --schedule pour que les jobs ne tombent jamais sur un 401.
+        Sans expiration lisible dans le token, le refresh reste réactif (sur 401).
+        """
+        if self._refresher_stop is not None or not self.refresh_token:
+            return
+        
+        if self.token_expires_at is None:
+            logger.info("ℹ️ Expiration du token inconnue, refresh uniquement sur 401")
+            return
+        
+        stop = threading.Event()
+        self._refresher_stop = stop
+        
+        def run():
+            while not stop.is_set():
+                remaining = self.token_expires_in()
+                if remaining is None:
+                    return
+                
+                wait = remaining - self.refresh_margin()
+                if wait > 0:
+                    stop.wait(wait)
+                    continue
+                
+                if self.refresh_access_token():
+                    stop.wait(self.MIN_REFRESH_INTERVAL)
+                else:
+                    # Nouvel essai dans une minute (le refresh sur 401 reste en place)
+                    stop.wait(60)
+        
+        threading.Thread(target=run, name='token-refresher', daemon=True).start()
+        logger.info(f"🔄 Refresh préventif du token activé ({self.refresh_margin():.0f}s avant expiration)")
+    
+    def stop_token_refresher(self):
+        """Arrête le thread de refresh préventif"""
+        if self._refresher_stop is not None:
+            self._refresher_stop.set()
+            self._refresher_stop = None
+    
+    def configure_pool(self, pool_size: int):
         """
-        Met à jour le token dans le fichier .env
+        (Re)dimensionne le pool de connexions keep-alive de la session
         
         Args:
-            new_token: Le nouveau access token
+            pool_size: Nombre maximum de connexions simultanées vers OneFlex
         """
+        self.pool_size = max(1, pool_size)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    @contextmanager
+    def deadline(self, seconds: Optional[float]):
+        """
+        Limite la durée totale d'un job: chaque requête puise dans le temps restant
+        
+        Les échéances imbriquées ne peuvent que raccourcir le délai. L'échéance suit
+        le contexte d'exécution (contextvars), y compris dans les threads du client async.
+        
+        Args:
+            seconds: Durée allouée (None ou 0 = pas de limite)
+        """
+        current = _job_deadline.get()
+        new_deadline = current
+        if seconds:
+            new_deadline = time.monotonic() + seconds
+            if current is not None:
+                new_deadline = min(current, new_deadline)
+        
+        token = _job_deadline.set(new_deadline)
         try:
-            import os
-            from pathlib import Path
-            
-            # Chemins possibles pour .env
-            env_paths = [
-                Path('.env'),
-                Path(__file__).parent / '.env',
-                Path('/app/.env'),  # Dans Docker (root)
-                Path('/app/config/.env')  # Dans Docker (volume monté)
-            ]
-            
-            env_file = None
-            for path in env_paths:
-                if path.exists():
-                    env_file = path
-                    break
-            
-            if not env_file:
-                logger.warning("⚠️  Fichier .env non trouvé, token non sauvegardé")
-                return
-            
-            # Lire le contenu actuel
-            with open(env_file, 'r') as f:
-                lines = f.readlines()
-            
-            # Mettre à jour la ligne ONEFLEX_TOKEN
-            updated = False
-            for i, line in enumerate(lines):
-                if line.startswith('ONEFLEX_TOKEN='):
-                    lines[i] = f'ONEFLEX_TOKEN={new_token}\n'
-                    updated = True
-                    break
-            
-            # Si la ligne n'existe pas, l'ajouter
-            if not updated:
-                lines.append(f'ONEFLEX_TOKEN={new_token}\n')
-            
-            # Écrire le nouveau contenu
-            with open(env_file, 'w') as f:
-                f.writelines(lines)
+            yield
+        finally:
+            _job_deadline.reset(token)
+    
+    @contextmanager
+    def memo_scope(self):
+        """
+        Mémorise les queries GraphQL le temps d'une commande ou d'un job
+        
+        Une lecture répétée dans le scope ne coûte plus d'appel réseau; les mutations
+        invalident les lectures qu'elles ont pu rendre fausses. Un scope imbriqué
+        réutilise le mémo englobant.
+        """
+        if _run_memo.get() is not None:
+            yield
+            return
+        
+        memo = RequestMemo()
+        token = _run_memo.set(memo)
+        try:
+            yield
+        finally:
+            _run_memo.reset(token)
+            if memo.hits:
+                logger.debug(f"♻️ {memo.hits} requête(s) servie(s) par le mémo ({memo.misses} envoyée(s))")
+    
+    @property
+    def booking_index(self) -> Optional[BookingIndex]:
+        """Réservations connues sur l'horizon chargé, propres à la commande ou au job en cours"""
+        indexes = _run_indexes.get()
+        if indexes is None:
+            return self._booking_index
+        return indexes.get(id(self))
+    
+    @booking_index.setter
+    def booking_index(self, index: Optional[BookingIndex]):
+        indexes = _run_indexes.get()
+        if indexes is None:
+            self._booking_index = index
+        else:
+            indexes[id(self)] = index
+    
+    @contextmanager
+    def booking_index_scope(self):
+        """
+        Donne à une commande ou à un job son propre index des réservations
+        
+        Deux jobs simultanés ne partagent ni ne vident l'index de l'autre. Comme le
+        mémo, l'index suit le contexte d'exécution et un scope imbriqué réutilise
+        l'index englobant.
+        """
+        if _run_indexes.get() is not None:
+            yield
+            return
+        
+        token = _run_indexes.set({})
+        try:
+            yield
+        finally:
+            _run_indexes.reset(token)
+    
+    @contextmanager
+    def run_scope(self, seconds: Optional[float] = None):
+        """Contexte d'une commande ou d'un job: échéance (optionnelle), mémo des lectures et index des réservations"""
+        with self.deadline(seconds), self.memo_scope(), self.booking_index_scope():
+            yield
+    
+    def forget_reads(self, mutation: str, variables: Optional[Dict] = None):
+        """Invalide les lectures mémorisées touchées par une mutation envoyée hors _graphql_request"""
+        memo = _run_memo.get()
+        if memo is not None:
+            memo.invalidate(mutation, variables)
+    
+    def sent_requests(self) -> Counter:
+        """
+        Requêtes GraphQL envoyées depuis la création du client (hors réponses mémorisées et rejeux)
+        
+        Returns:
+            Copie du compteur libellé -> nombre de requêtes HTTP (une opération, ou lot[...] pour un regroupement)
+        """
+        with self._sent_lock:
+            return Counter(self._sent_requests)
+    
+    def _count_request(self, label: str):
+        with self._sent_lock:
+            self._sent_requests[label] += 1
+    
+    def deadline_remaining(self) -> Optional[float]:
+        """Secondes restantes avant l'échéance du job en cours (None si aucune)"""
+        deadline = _job_deadline.get()
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+    
+    def _request_timeout(self) -> tuple:
+        """
+        Timeouts (connexion, lecture) de la prochaine requête, bornés par l'échéance du job
+        
+        Raises:
+            DeadlineExceeded: Si le temps du job est déjà épuisé
+        """
+        connect, read = self.connect_timeout, self.read_timeout
+        remaining = self.deadline_remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceeded("Temps alloué au job épuisé")
+            connect, read = min(connect, remaining), min(read, remaining)
+        return (connect, read)
+    
+    def _send(self, method: str, url: str, use_session: bool = True, **kwargs) -> requests.Response:
+        """
+        Envoie une requête HTTP vers OneFlex en passant par le limiteur de débit
+        
+        Args:
+            method: Méthode HTTP
+            url: URL complète
+            use_session: False pour ne pas envoyer les en-têtes de session (ex: refresh du token)
+            **kwargs: Arguments transmis à requests
             
-            logger.info(f"💾 Token mis à jour dans {env_file}")
+        Returns:
+            La réponse HTTP
             
-        except Exception as e:
-            logger.error(f"❌ Erreur lors de la mise à jour du .env: {e}")
+        Raises:
+            DeadlineExceeded: Si le temps du job est épuisé avant l'envoi (attente du limiteur comprise)
+        """
+        # Les requêtes authentifiées ne doivent pas partir avec un token sur le point d'expirer
+        if use_session:
+            self._ensure_fresh_token()
+        
+        waited = self.rate_limiter.acquire()
+        if waited >= 1:
+            logger.info(f"⏳ Requête retardée de {waited:.1f}s par le limiteur de débit")
+        else:
+            logger.debug(f"⏳ Attente limiteur: {waited * 1000:.0f} ms")
+        
+        # L'attente du limiteur a pu consommer le temps restant: timeouts calculés après elle
+        timeout = self._request_timeout()
+        if 'timeout' not in kwargs:
+            kwargs['timeout'] = timeout
+        sender = self.session.request if use_session else requests.request
+        with tracing.span(f"HTTP {method}", path=urlsplit(url).path) as span:
+            sent_at = time.time()
+            response = sender(method, url, **kwargs)
+            self.server_clock.observe(sent_at, time.time(), response.headers.get('Date'))
+            if span:
+                span.set(status=response.status_code)
+        
+        self.rate_limiter.on_response(response.status_code, response.headers.get('Retry-After'))
+        return response
     
-    def _graphql_request(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict]:
+    def _graphql_request(
+        self,
+        query: str,
+        variables: Optional[Dict] = None,
+        idempotent: Optional[bool] = None,
+        already_applied: Optional[Callable[[], bool]] = None,
+        memoize: bool = True,
+        errors: Optional[List[Dict]] = None
+    ) -> Optional[Dict]:
         """
         Exécute une requête GraphQL
         
         Args:
             query: Requête GraphQL
             variables: Variables de la requête
+            idempotent: Rejouable sans risque (par défaut: oui pour une query, non pour une mutation)
+            already_applied: Vérification avant de rejouer une mutation (voir _post_graphql)
+            memoize: False pour toujours interroger le serveur (ex: sondes de latence)
+            errors: Liste complétée avec les erreurs GraphQL de la réponse (pour les analyser)
             
         Returns:
             Données de la réponse ou None en cas d'erreur
         """
-        try:
-            payload = {'query': query}
-            if variables:
-                payload['variables'] = variables
+        payload = {'query': query}
+        if variables:
+            payload['variables'] = variables
+        
+        is_mutation = query.lstrip().startswith('mutation')
+        if idempotent is None:
+            idempotent = not is_mutation
+        
+        operation = operation_name(query)
+        memo = _run_memo.get() if memoize else None
+        if memo is not None:
+            if is_mutation:
+                # Avant l'envoi aussi: already_applied doit relire l'état du serveur
+                memo.invalidate(query, variables)
+            else:
+                hit, data = memo.get(query, variables)
+                if hit:
+                    logger.debug(f"♻️ {operation}: réponse déjà obtenue pendant cette exécution")
+                    metrics.graphql_memo_hits.inc(operation=operation)
+                    return data
+        
+        with tracing.span(f"graphql {operation}", operation=operation, **_span_attributes(variables)) as span:
+            start = time.perf_counter()
+            self._count_request(operation)
+            result = self._post_graphql(payload, idempotent, already_applied)
+            duration = time.perf_counter() - start
             
-            response = self.session.post(self.GQL_ENDPOINT, json=payload)
+            outcome = 'success'
+            if result is None:
+                outcome = 'failed'
+            elif 'errors' in result:
+                logger.error(f"❌ Erreur GraphQL: {result['errors']}")
+                outcome = 'graphql_error'
+                if errors is not None:
+                    errors.extend(result['errors'])
+            
+            metrics.graphql_latency.observe(duration, operation=operation, outcome=outcome)
+            metrics.graphql_requests.inc(operation=operation, outcome=outcome)
+            if span:
+                span.set(outcome=outcome)
+                if outcome != 'success':
+                    span.status = 'error'
+        
+        if memo is not None:
+            if is_mutation:
+                memo.invalidate(query, variables)
+            elif outcome == 'success':
+                memo.store(query, variables, result.get('data'))
+        
+        return result.get('data') if outcome == 'success' else None
+    
+    def _graphql_batch(self, operations: List[tuple], idempotent_mutations: bool = False) -> List[Optional[Dict]]:
+        """
+        Exécute plusieurs opérations GraphQL indépendantes en regroupant les requêtes HTTP
+        
+        Les opérations de même type (query/mutation) sont fusionnées via des alias,
+        par paquets de MAX_BATCH_OPERATIONS, puis chaque résultat est redistribué.
+        Les queries déjà obtenues pendant l'exécution en cours ne sont pas renvoyées.
+        
+        Args:
+            operations: Liste de (query, variables)
+            idempotent_mutations: True si les mutations du lot peuvent être rejouées
             
-            # Si erreur 401, tenter un refresh automatique
-            if response.status_code == 401:
-                logger.warning("⚠️  Token expiré, tentative de refresh automatique...")
+        Returns:
+            Liste des données de chaque opération (None si elle a échoué), dans l'ordre
+        """
+        results: List[Optional[Dict]] = [None] * len(operations)
+        parsed = [(i, BatchOperation(query, variables)) for i, (query, variables) in enumerate(operations)]
+        memo = _run_memo.get()
+        
+        for kind in ('query', 'mutation'):
+            group = [(i, op) for i, op in parsed if op.kind == kind]
+            if memo is not None and kind == 'query':
+                pending = []
+                for i, op in group:
+                    hit, data = memo.get(*operations[i])
+                    if hit:
+                        metrics.graphql_memo_hits.inc(operation=operation_name(operations[i][0]))
+                        results[i] = data
+                    else:
+                        pending.append((i, op))
+                group = pending
+            for start in range(0, len(group), self.MAX_BATCH_OPERATIONS):
+                chunk = group[start:start + self.MAX_BATCH_OPERATIONS]
                 
-                # Tenter le refresh une seule fois
-                if self.refresh_access_token():
-                    logger.info("✅ Token refreshé, nouvelle tentative de requête...")
-                    # Réessayer la requête avec le nouveau token
-                    response = self.session.post(self.GQL_ENDPOINT, json=payload)
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        if 'errors' not in result:
-                            return result.get('data')
+                # Une opération seule n'a pas besoin d'être réécrite
+                if len(chunk) == 1:
+                    i, _ = chunk[0]
+                    results[i] = self._graphql_request(*operations[i], idempotent=(kind == 'query' or idempotent_mutations))
+                    continue
                 
-                # Si le refresh échoue ou la requête échoue encore
-                logger.error("❌ Refresh automatique échoué ou token toujours invalide")
-                if notification_service:
-                    notification_service.send_token_expired_alert(
-                        "🔑 Token OneFlex expiré et refresh automatique échoué\n\n"
-                        "Reconnectez-vous avec:\n"
-                        "```\npython auto_get_tokens.py\n```\n"
-                        "Puis redémarrez le bot Docker."
-                    )
-                return None
+                ops = [op for _, op in chunk]
+                names = [operation_name(operations[i][0]) for i, _ in chunk]
+                document, variables, aliases = merge_operations(ops)
+                if memo is not None and kind == 'mutation':
+                    for i, _ in chunk:
+                        memo.invalidate(*operations[i])
+                with tracing.span("graphql batch", operations=names, **_span_attributes(*(op.variables for op in ops))) as span:
+                    start = time.perf_counter()
+                    self._count_request(batch_label(names))
+                    result = self._post_graphql({'query': document, 'variables': variables}, idempotent=(kind == 'query' or idempotent_mutations))
+                    if result is None:
+                        batch_outcome = 'failed'
+                    else:
+                        batch_outcome = 'graphql_error' if result.get('errors') else 'success'
+                    metrics.graphql_latency.observe(time.perf_counter() - start, operation='batch', outcome=batch_outcome)
+                    if span and result is None:
+                        span.status = 'error'
+                if memo is not None and kind == 'mutation':
+                    for i, _ in chunk:
+                        memo.invalidate(*operations[i])
+                if result is None:
+                    for name in names:
+                        metrics.graphql_requests.inc(operation=name, outcome='failed')
+                    continue
+                
+                for name, (i, _), (data, errors) in zip(names, chunk, split_result(result, ops, aliases)):
+                    if errors:
+                        logger.error(f"❌ Erreur GraphQL: {errors}")
+                        metrics.graphql_requests.inc(operation=name, outcome='graphql_error')
+                        continue
+                    metrics.graphql_requests.inc(operation=name, outcome='success')
+                    results[i] = data
+                    if memo is not None and kind == 'query':
+                        memo.store(*operations[i], data)
+        
+        return results
+    
+    def _post_graphql(self, payload: Dict, idempotent: bool = True, already_applied: Optional[Callable[[], bool]] = None) -> Optional[Dict]:
+        """
+        Envoie un document GraphQL et retourne la réponse JSON complète (data + errors)
+        
+        Gère le refresh automatique du token sur 401, les retries avec backoff
+        et le disjoncteur. Une mutation non idempotente n'est retentée que si le
+        serveur ne l'a certainement pas traitée (timeout de connexion, 429, 503),
+        ou si already_applied confirme qu'elle n'a pas été appliquée.
+        
+        Args:
+            payload: Corps de la requête (query, variables)
+            idempotent: True si la requête peut être rejouée sans risque
+            already_applied: Vérification appelée avant de rejouer une mutation après
+                un échec ambigu (retourne True si la mutation a déjà pris effet)
             
-            # Afficher plus de détails en cas d'erreur
-            if response.status_code != 200:
-                logger.error(f"❌ Erreur HTTP {response.status_code}")
-                logger.error(f"Response: {response.text[:500]}")
+        Returns:
+            Réponse JSON, ou None en cas d'erreur HTTP ou réseau
+        """
+        policy = self.retry_policy
+        
+        for attempt in range(policy.max_attempts):
+            if attempt > 0:
+                delay = policy.delay(attempt - 1)
+                remaining = self.deadline_remaining()
+                if remaining is not None and remaining <= delay:
+                    logger.error("⌛ Temps alloué au job épuisé, pas de nouvelle tentative")
+                    return None
+                logger.warning(f"🔁 Nouvelle tentative ({attempt + 1}/{policy.max_attempts}) dans {delay:.1f}s...")
+                time.sleep(delay)
+            
+            remaining = self.deadline_remaining()
+            if remaining is not None and remaining <= 0:
+                logger.error("⌛ Temps alloué au job épuisé, requête abandonnée")
                 return None
             
-            result = response.json()
+            if not self.circuit_breaker.allow_request():
+                logger.error("⛔ Circuit OneFlex ouvert, requête abandonnée sans appel réseau")
+                return None
             
-            if 'errors' in result:
-                logger.error(f"❌ Erreur GraphQL: {result['errors']}")
+            try:
+                response = self._send('POST', self.GQL_ENDPOINT, json=payload)
+                
+                # Si erreur 401, tenter un refresh automatique
+                if response.status_code == 401:
+                    self.circuit_breaker.record_success()  # Le serveur répond
+                    return self._retry_after_refresh(payload)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    self.circuit_breaker.record_success()
+                    return result
+                
+                # Afficher plus de détails en cas d'erreur
+                logger.error(f"❌ Erreur HTTP {response.status_code}")
+                logger.error(f"Response: {response.text[:500]}")
+                
+                if response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                
+                if response.status_code not in policy.RETRYABLE_STATUSES:
+                    return None
+                not_processed = response.status_code in policy.NOT_PROCESSED_STATUSES
+                
+            except DeadlineExceeded:
+                # Levée avant l'envoi: rien n'est parti, le serveur n'est pas en cause,
+                # mais une éventuelle requête de test du disjoncteur doit être rendue
+                self.circuit_breaker.release_trial()
+                logger.error("⌛ Temps alloué au job épuisé, requête abandonnée")
                 return None
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ Erreur de requête: {e}")
+                self.circuit_breaker.record_failure()
+                # Un timeout de connexion garantit que la requête n'est jamais partie
+                not_processed = isinstance(e, requests.exceptions.ConnectTimeout)
             
-            return result.get('data')
+            if attempt + 1 >= policy.max_attempts:
+                break
+            if not (idempotent or not_processed):
+                if already_applied is None:
+                    logger.warning("⚠️ Mutation non rejouée: impossible de savoir si elle a été appliquée")
+                    return None
+                if already_applied():
+                    logger.info("ℹ️ La mutation a déjà été appliquée côté serveur, pas de nouvelle tentative")
+                    return None
+        
+        return None
+    
+    def _retry_after_refresh(self, payload: Dict) -> Optional[Dict]:
+        """Renouvelle le token après un 401 puis rejoue la requête une fois"""
+        logger.warning("⚠️  Token expiré, tentative de refresh automatique...")
+        
+        # Tenter le refresh une seule fois
+        if self.refresh_access_token():
+            logger.info("✅ Token refreshé, nouvelle tentative de requête...")
+            # Réessayer la requête avec le nouveau token
+            response = self._send('POST', self.GQL_ENDPOINT, json=payload)
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Erreur de requête: {e}")
-            return None
+            if response.status_code == 200:
+                return response.json()
+        
+        # Si le refresh échoue ou la requête échoue encore
+        logger.error("❌ Refresh automatique échoué ou token toujours invalide")
+        if notification_service:
+            notification_service.send_token_expired_alert(
+                "🔑 Token OneFlex expiré et refresh automatique échoué\n\n"
+                "Reconnectez-vous avec:\n"
+                "```\npython auto_get_tokens.py\n```\n"
+                "Puis redémarrez le bot Docker."
+            )
+        return None
     
     def login(self) -> bool:
         """
@@ -219,6 +842,13 @@ class OneFlexClient:
         """
         # Si un token existe déjà, vérifier qu'il fonctionne
         if self.token:
+            # Profil déjà connu pour ce token (cache disque): pas besoin de requête me.
+            # Un token expiré sera renouvelé au premier 401. Le profil doit être celui
+            # du compte du token (sujet), sinon il est revérifié.
+            subject = token_subject(self.token)
+            if self.identity and subject and self.identity.get('subject') == subject:
+                logger.info(f"✅ Authentifié en tant que: {self.identity.get('fullName') or self.identity.get('email')} (cache)")
+                return True
             return self.verify_token()
         
         # Login classique (ne fonctionne pas avec SSO)
@@ -247,13 +877,9 @@ class OneFlexClient:
         data = self._graphql_request(query, variables)
         
         if data and 'login' in data:
-            self.token = data['login'].get('token')
+            self._set_token(data['login'].get('token'))
             
             if self.token:
-                self.session.headers.update({
-                    'Authorization': f'Bearer {self.token}'
-                })
-                
                 logger.info("✅ Connexion réussie à OneFlex")
                 return True
         
@@ -284,6 +910,7 @@ class OneFlexClient:
         
         if data and 'me' in data:
             user = data['me']
+            self._store_identity(user)
             logger.info(f"✅ Authentifié en tant que: {user.get('fullName', user.get('email'))}")
             return True
         
@@ -321,7 +948,8 @@ class OneFlexClient:
             if zone_id:
                 params['zone_id'] = zone_id
             
-            response = self.session.get(
+            response = self._send(
+                'GET',
                 f"{self.BASE_URL}/desks/available",
                 params=params
             )
@@ -335,23 +963,29 @@ class OneFlexClient:
             logger.error(f"❌ Erreur lors de la récupération des bureaux: {e}")
             return []
     
+    @tracing.traced('book_desk')
     def book_desk(
         self, 
         desk_id: str, 
         space_id: str,
         date: datetime, 
         moments: List[str] = None,
-        desk_name: str = "Bureau"
+        desk_name: str = "Bureau",
+        optimistic: Optional[bool] = None
     ) -> bool:
         """
         Réserve un bureau pour une date donnée via GraphQL
         
+        En mode optimiste, la mutation part sans vérification préalable (hors index déjà
+        chargé): un rejet "déjà réservé" du serveur donne (True, True), comme la vérification.
+        
         Args:
             desk_id: ID du bureau à réserver
             space_id: ID de l'espace
             date: Date de réservation
             moments: Liste des moments (MORNING, AFTERNOON, ou les deux)
             desk_name: Nom du bureau (pour l'affichage)
+            optimistic: Sauter la vérification préalable (optimistic_booking par défaut)
             
         Returns:
             tuple: (success: bool, already_existed: bool)
@@ -359,9 +993,30 @@ class OneFlexClient:
                 - (True, True): Réservation déjà existante
                 - (False, False): Échec de la réservation
         """
+        date_str = date.strftime('%Y-%m-%d')
+        tracing.annotate(date=date_str, desk_id=desk_id, desk_name=desk_name)
+        
         # Vérifier si une réservation existe déjà pour cette date (n'importe quel bureau)
-        if self.has_booking_for_date(date):
+        # L'index chargé pour l'horizon évite une requête par date
+        if optimistic is None:
+            optimistic = self.optimistic_booking
+        if self.journal and self.journal.confirmed_dates([date_str]):
+            logger.info(f"📓 Réservation du {date.strftime('%d/%m/%Y')} déjà confirmée par le journal")
+            return (True, True)
+        if self.journal and self.journal.pending_dates([date_str]):
+            optimistic = False  # Mutation interrompue: vérifier avant de la renvoyer
+        
+        if self.booking_index and self.booking_index.covers(date_str):
+            already_booked = self.booking_index.has_booking(date_str)
+        elif optimistic:
+            already_booked = False  # Le serveur tranchera (erreur "déjà réservé")
+        else:
+            already_booked = self.has_booking_for_date(date)
+        
+        if already_booked:
             logger.info(f"✅ Réservation déjà existante pour {desk_name} le {date.strftime('%d/%m/%Y')}")
+            if self.journal:
+                self.journal.finish({self.journal.create_key(date_str): 'already_booked'})
             return (True, True)
         
         user_id = self.get_my_user_id()
@@ -374,8 +1029,249 @@ class OneFlexClient:
             moments = ["MORNING", "AFTERNOON"]
         
         # Créer les datedMoments
-        dated_moments = [{"date": date.strftime('%Y-%m-%d'), "moment": moment} for moment in moments]
+        dated_moments = [{"date": date_str, "moment": moment} for moment in moments]
+        
+        errors = []
+        if self.journal:
+            self.journal.begin([self.journal.create_key(date_str)], desk_id=desk_id, moments=moments)
+        created = self._create_affectation(user_id, desk_id, space_id, dated_moments, errors)
+        
+        # Un rejet "déjà réservé" n'est cru qu'après relecture de la date: sinon le bureau
+        # est peut-être simplement pris par quelqu'un d'autre
+        rejection = booking_error_kind(errors)
+        if rejection == 'already_booked' and not self._own_booking_exists(date_str):
+            rejection = 'desk_taken'
+        
+        if created:
+            outcome = 'created'
+        elif rejection == 'already_booked':
+            outcome = 'already_booked'
+        elif self.booking_index and self.booking_index.covers(date_str) and self.booking_index.has_booking(date_str):
+            outcome = 'created'  # Échec ambigu relu côté serveur: la réservation a en fait été créée
+        else:
+            outcome = 'failed'
+        if self.journal:
+            self.journal.finish({self.journal.create_key(date_str): outcome})
+        
+        if created:
+            self._index_created_affectation(created, dated_moments, desk_name)
+            moments_str = " + ".join(moments)
+            logger.info(f"✅ Réservation confirmée: {desk_name} le {date.strftime('%d/%m/%Y')} ({moments_str})")
+            return (True, False)  # Nouvelle réservation créée
+        
+        # Rejet explicite du serveur, confirmé par la relecture: même résultat que la vérification préalable
+        if outcome == 'already_booked':
+            logger.info(f"✅ Réservation déjà existante le {date.strftime('%d/%m/%Y')} (signalée par le serveur)")
+            return (True, True)
         
+        if outcome == 'created':
+            logger.info(f"✅ Réservation confirmée après vérification: {desk_name} le {date.strftime('%d/%m/%Y')}")
+            return (True, False)
+        
+        if rejection == 'desk_taken':
+            logger.warning(f"⚠️ {desk_name} déjà pris le {date.strftime('%d/%m/%Y')}")
+        
+        logger.error(f"❌ Échec de la réservation")
+        return (False, False)
+    
+    @tracing.traced('book_desk_bulk')
+    def book_desk_bulk(
+        self,
+        desk_id: str,
+        space_id: str,
+        dates: List[datetime],
+        moments: List[str] = None,
+        desk_name: str = "Bureau",
+        batch_size: int = 31
+    ) -> Dict[str, tuple]:
+        """
+        Réserve un bureau pour plusieurs dates avec le moins de mutations possible
+        
+        Les dates sont regroupées dans les datedMoments d'un même createAffectation.
+        Si le serveur rejette un lot (ex: une date déjà prise), le lot est coupé en
+        deux et chaque moitié est retentée, jusqu'à isoler la ou les dates fautives.
+        
+        Args:
+            desk_id: ID du bureau à réserver
+            space_id: ID de l'espace
+            dates: Dates de réservation
+            moments: Liste des moments (MORNING, AFTERNOON, ou les deux)
+            desk_name: Nom du bureau (pour l'affichage)
+            batch_size: Nombre maximum de dates par mutation
+            
+        Returns:
+            Dict date (YYYY-MM-DD) -> (success, already_existed), même sémantique que book_desk
+        """
+        tracing.annotate(desk_id=desk_id, desk_name=desk_name, dates=[date.strftime('%Y-%m-%d') for date in dates])
+        results = {}
+        user_id, chunks = self._plan_bulk_booking(dates, batch_size, results)
+        
+        for chunk in chunks:
+            self._book_dates_chunk(user_id, desk_id, space_id, chunk, moments or ["MORNING", "AFTERNOON"], desk_name, results)
+        
+        for success, already_existed in results.values():
+            metrics.record_booking(success, already_existed)
+        return results
+    
+    def _plan_bulk_booking(self, dates: List[datetime], batch_size: int, results: Dict[str, tuple]) -> tuple:
+        """
+        Prépare une réservation multi-dates: lit l'horizon et découpe les dates libres en lots
+        
+        Les dates déjà réservées (ou impossibles à traiter) sont directement
+        renseignées dans results.
+        
+        Returns:
+            tuple: (user_id, liste des lots de dates YYYY-MM-DD à réserver)
+        """
+        date_strs = sorted({d.strftime('%Y-%m-%d') for d in dates})
+        
+        # Dates confirmées par une exécution interrompue: ni relues ni renvoyées
+        confirmed = self.journal.confirmed_dates(date_strs) if self.journal else []
+        if confirmed:
+            logger.info(f"📓 {len(confirmed)} date(s) déjà confirmée(s) par le journal")
+            results.update({date_str: (True, True) for date_str in confirmed})
+            date_strs = [d for d in date_strs if d not in confirmed]
+        if not date_strs:
+            return None, []
+        
+        # Une seule lecture pour tout l'horizon (y compris les mutations interrompues)
+        index = self.load_booking_index(date_strs)
+        if index is None:
+            results.update({date_str: (False, False) for date_str in date_strs})
+            return None, []
+        
+        to_book = []
+        for date_str in date_strs:
+            if index.has_booking(date_str):
+                results[date_str] = (True, True)
+            else:
+                to_book.append(date_str)
+        if self.journal:
+            self.journal.finish({self.journal.create_key(d): 'already_booked' for d in date_strs if d not in to_book})
+        
+        if not to_book:
+            return None, []
+        
+        user_id = self.get_my_user_id()
+        if not user_id:
+            logger.error("❌ Impossible de récupérer l'ID utilisateur")
+            results.update({date_str: (False, False) for date_str in to_book})
+            return None, []
+        
+        batch_size = max(1, batch_size)
+        return user_id, [to_book[start:start + batch_size] for start in range(0, len(to_book), batch_size)]
+    
+    def _book_dates_chunk(
+        self,
+        user_id: Dict,
+        desk_id: str,
+        space_id: str,
+        date_strs: List[str],
+        moments: List[str],
+        desk_name: str,
+        results: Dict[str, tuple]
+    ):
+        """Réserve un lot de dates en une mutation, en le coupant en deux en cas de rejet"""
+        date_strs = self._try_book_dates(user_id, desk_id, space_id, date_strs, moments, desk_name, results)
+        if not date_strs:
+            return
+        
+        middle = len(date_strs) // 2
+        self._book_dates_chunk(user_id, desk_id, space_id, date_strs[:middle], moments, desk_name, results)
+        self._book_dates_chunk(user_id, desk_id, space_id, date_strs[middle:], moments, desk_name, results)
+    
+    def _try_book_dates(
+        self,
+        user_id: Dict,
+        desk_id: str,
+        space_id: str,
+        date_strs: List[str],
+        moments: List[str],
+        desk_name: str,
+        results: Dict[str, tuple]
+    ) -> List[str]:
+        """
+        Tente de réserver un lot de dates en une seule mutation
+        
+        Returns:
+            Les dates restant à réserver (à couper en deux), vide si le lot est traité
+        """
+        dated_moments = [{"date": date_str, "moment": moment} for date_str in date_strs for moment in moments]
+        if self.journal:
+            self.journal.begin([self.journal.create_key(d) for d in date_strs], desk_id=desk_id, moments=moments)
+        created = self._create_affectation(user_id, desk_id, space_id, dated_moments)
+        
+        if created:
+            self._index_created_affectation(created, dated_moments, desk_name)
+            logger.info(f"✅ {len(date_strs)} date(s) réservée(s) en une requête: {desk_name} ({' + '.join(moments)})")
+            for date_str in date_strs:
+                results[date_str] = (True, False)
+            if self.journal:
+                self.journal.finish({self.journal.create_key(d): 'created' for d in date_strs})
+            return []
+        
+        # Après un échec ambigu, l'index a pu être relu: des dates ont peut-être été réservées
+        if self.booking_index:
+            applied = [d for d in date_strs if self.booking_index.has_booking(d)]
+            for date_str in applied:
+                results[date_str] = (True, False)
+            date_strs = [d for d in date_strs if d not in applied]
+            if self.journal:
+                self.journal.finish({self.journal.create_key(d): 'created' for d in applied})
+        
+        if len(date_strs) <= 1:
+            for date_str in date_strs:
+                logger.error(f"❌ Échec de la réservation pour le {date_str}")
+                results[date_str] = (False, False)
+            if self.journal:
+                self.journal.finish({self.journal.create_key(d): 'failed' for d in date_strs})
+            return []
+        
+        logger.warning(f"⚠️ Lot de {len(date_strs)} date(s) rejeté, découpage en deux...")
+        return date_strs
+    
+    def _create_affectation(self, user_id: Dict, desk_id: str, space_id: str, dated_moments: List[Dict], errors: Optional[List[Dict]] = None) -> Optional[Dict]:
+        """
+        Envoie la mutation createAffectation
+        
+        Args:
+            user_id: Identifiant utilisateur (retour de get_my_user_id)
+            desk_id: ID du bureau à réserver
+            space_id: ID de l'espace
+            dated_moments: Liste de {date, moment} à réserver
+            errors: Liste complétée avec les erreurs GraphQL en cas de rejet
+            
+        Returns:
+            L'affectation créée, ou None en cas d'échec
+        """
+        dates = sorted({dm['date'] for dm in dated_moments})
+        errors = [] if errors is None else errors
+        data = self._graphql_request(
+            *self._create_affectation_operation(user_id, desk_id, space_id, dated_moments),
+            already_applied=lambda: self._dates_already_booked(dates),
+            errors=errors
+        )
+        
+        if data and data.get('createAffectation'):
+            return data['createAffectation']
+        self._forget_missing_desk(desk_id, errors)
+        return None
+    
+    def _forget_missing_desk(self, desk_id: str, errors: List[Dict]) -> bool:
+        """
+        Vide le cache des bureaux si la réservation a échoué sur un bureau introuvable
+        
+        Returns:
+            True si le cache a été vidé
+        """
+        if booking_error_kind(errors) != 'desk_not_found':
+            return False
+        logger.warning(f"🗑️ Bureau {desk_id} introuvable, cache des bureaux vidé")
+        self.desk_catalog.invalidate()
+        return True
+    
+    def _create_affectation_operation(self, user_id: Dict, desk_id: str, space_id: str, dated_moments: List[Dict]) -> tuple:
+        """Construit la mutation createAffectation (query, variables)"""
         query = """
         mutation createAffectation($data: CreateSimpleAffectationInput!) {
             createAffectation(data: $data) {
@@ -411,15 +1307,77 @@ class OneFlexClient:
             }
         }
         
-        data = self._graphql_request(query, variables)
+        return query, variables
+    
+    def _dates_already_booked(self, date_strs: List[str]) -> bool:
+        """
+        Relit les réservations de dates après un échec ambigu de createAffectation
         
-        if data and 'createAffectation' in data:
-            moments_str = " + ".join(moments)
-            logger.info(f"✅ Réservation confirmée: {desk_name} le {date.strftime('%d/%m/%Y')} ({moments_str})")
-            return (True, False)  # Nouvelle réservation créée
+        L'index est mis à jour avec ce qui a été lu.
         
-        logger.error(f"❌ Échec de la réservation")
-        return (False, False)
+        Returns:
+            True si au moins une date est réservée, ou si la vérification a échoué
+            (dans le doute, on ne rejoue pas la mutation)
+        """
+        booked = self._reload_booked_dates(date_strs)
+        if booked is None:
+            return True
+        return any(date_str in booked for date_str in date_strs)
+    
+    def _own_booking_exists(self, date_str: str) -> bool:
+        """
+        Confirme par une lecture qu'une réservation de l'utilisateur existe à cette date
+        
+        Returns:
+            True seulement si la lecture a réussi et montre une réservation active
+        """
+        booked = self._reload_booked_dates([date_str])
+        return bool(booked) and date_str in booked
+    
+    def _reload_booked_dates(self, date_strs: List[str]) -> Optional[set]:
+        """
+        Relit les réservations de dates et met l'index à jour
+        
+        Returns:
+            Les dates ayant une réservation active, None si la lecture a échoué
+        """
+        affectations = self._fetch_affectations(date_strs)
+        if affectations is None:
+            return None
+        
+        if self.booking_index is None:
+            self.booking_index = BookingIndex()
+        self.booking_index.load(date_strs, affectations)
+        
+        return {a.get('date') for a in affectations if a.get('active', False)}
+    
+    def _index_created_affectation(self, created: Dict, dated_moments: List[Dict], desk_name: str):
+        """
+        Reporte une réservation fraîchement créée dans l'index local
+        
+        Args:
+            created: Objet createAffectation retourné par l'API
+            dated_moments: Dates/moments envoyés dans la mutation
+            desk_name: Nom du bureau réservé
+        """
+        if not created:
+            return
+        
+        # Nom de l'espace connu par le cache des bureaux (la mutation ne le retourne pas)
+        desk = self.desk_catalog.desk(created.get('deskId')) or {}
+        for dated_moment in dated_moments:
+            affectation = {
+                'id': created.get('id'),
+                'date': dated_moment['date'],
+                'moment': dated_moment['moment'],
+                'active': True,
+                'desk': {'id': created.get('deskId'), 'name': desk_name},
+                'space': {'id': created.get('spaceId'), 'name': desk.get('space_name')}
+            }
+            if self.booking_index:
+                self.booking_index.add(affectation)
+            if self.booking_store:
+                self.booking_store.upsert(affectation)
     
     def cancel_booking(self, affectation_id: str) -> bool:
         """
@@ -431,6 +1389,71 @@ class OneFlexClient:
         Returns:
             True si l'annulation a réussi
         """
+        dates = self._affectation_dates(affectation_id)
+        data = self._graphql_request(*self._delete_affectation_operation(affectation_id), idempotent=True)
+        
+        if self._handle_cancel_result(affectation_id, data):
+            if self.journal:
+                self.journal.revoke_dates(dates or None)
+            return True
+        
+        logger.error(f"❌ Échec de l'annulation de la réservation")
+        return False
+    
+    @tracing.traced('cancel_bookings')
+    def cancel_bookings(self, affectation_ids: List[str]) -> Dict[str, bool]:
+        """
+        Annule plusieurs réservations en regroupant les deleteAffectation dans une requête
+        
+        Args:
+            affectation_ids: IDs des réservations à annuler
+            
+        Returns:
+            Dict ID -> True si l'annulation a réussi
+        """
+        results = {}
+        
+        # Annulations confirmées par une exécution interrompue: inutile de les renvoyer
+        if self.journal:
+            done = [affectation_id for affectation_id in affectation_ids if self.journal.is_cancelled(affectation_id)]
+            results.update({affectation_id: True for affectation_id in done})
+            affectation_ids = [affectation_id for affectation_id in affectation_ids if affectation_id not in results]
+            if not affectation_ids:
+                return results
+            self.journal.begin([self.journal.cancel_key(affectation_id) for affectation_id in affectation_ids])
+            # Dates des affectations, lues avant que l'annulation ne les retire de l'index
+            dates = {affectation_id: self._affectation_dates(affectation_id) for affectation_id in affectation_ids}
+        
+        operations = [self._delete_affectation_operation(affectation_id) for affectation_id in affectation_ids]
+        
+        # Supprimer deux fois la même affectation ne change rien: les mutations sont rejouables
+        for affectation_id, data in zip(affectation_ids, self._graphql_batch(operations, idempotent_mutations=True)):
+            results[affectation_id] = self._handle_cancel_result(affectation_id, data)
+            if not results[affectation_id]:
+                logger.error(f"❌ Échec de l'annulation de la réservation {affectation_id}")
+        
+        if self.journal:
+            self.journal.finish({
+                self.journal.cancel_key(affectation_id): 'cancelled' if results[affectation_id] else 'failed'
+                for affectation_id in affectation_ids
+            })
+            # Une date annulée n'est plus confirmée (date inconnue: toutes les confirmations tombent)
+            cancelled = [affectation_id for affectation_id in affectation_ids if results[affectation_id]]
+            if any(not dates[affectation_id] for affectation_id in cancelled):
+                self.journal.revoke_dates()
+            else:
+                self.journal.revoke_dates({d for affectation_id in cancelled for d in dates[affectation_id]})
+        return results
+    
+    def _affectation_dates(self, affectation_id: str) -> List[str]:
+        """Dates connues localement (index, stockage) d'une affectation"""
+        dates = set(self.booking_index.dates_of(affectation_id)) if self.booking_index else set()
+        if self.booking_store:
+            dates.update(self.booking_store.dates_of(affectation_id))
+        return sorted(dates)
+    
+    def _delete_affectation_operation(self, affectation_id: str) -> tuple:
+        """Construit la mutation deleteAffectation (query, variables)"""
         query = """
         mutation deleteAffectation($affectationId: ID!, $deleteGuestsOf: Boolean!) {
             deleteAffectation(affectationId: $affectationId, deleteGuestsOf: $deleteGuestsOf) {
@@ -443,46 +1466,117 @@ class OneFlexClient:
             'affectationId': affectation_id,
             'deleteGuestsOf': False
         }
-        
-        data = self._graphql_request(query, variables)
-        
-        if data and 'deleteAffectation' in data:
+        return query, variables
+    
+    def _handle_cancel_result(self, affectation_id: str, data: Optional[Dict]) -> bool:
+        """Interprète la réponse de deleteAffectation et met à jour l'index"""
+        if data and data.get('deleteAffectation'):
             result = data['deleteAffectation']
             if result.get('success', False):
+                if self.booking_index:
+                    self.booking_index.remove(affectation_id)
+                if self.booking_store:
+                    self.booking_store.remove(affectation_id)
                 logger.info(f"✅ Réservation annulée: {affectation_id}")
                 return True
-        
-        logger.error(f"❌ Échec de l'annulation de la réservation")
         return False
     
     def get_my_user_id(self) -> Optional[Dict]:
         """
         Récupère l'ID de l'utilisateur connecté
         
+        Utilise le profil en cache (rempli par verify_token) et n'interroge
+        l'API que s'il est absent.
+        
         Returns:
             Dict avec l'ID et le type de l'utilisateur
         """
-        query = """
-        query {
-            me(languages: ["fr-FR"], defaultTimezone: "Europe/Paris") {
-                id
+        if not self.identity:
+            query = """
+            query {
+                me(languages: ["fr-FR"], defaultTimezone: "Europe/Paris") {
+                    id
+                }
             }
+            """
+            
+            data = self._graphql_request(query)
+            
+            if not data or 'me' not in data:
+                return None
+            self._store_identity(data['me'])
+        
+        return {
+            'id': self.identity['id'],
+            'type': 'Internal'
         }
-        """
+    
+    def _store_identity(self, user: Dict):
+        """Met en cache le profil de l'utilisateur connecté (mémoire + disque)"""
+        if not user or not user.get('id'):
+            return
         
-        data = self._graphql_request(query)
+        identity = dict(self.identity or {})
+        if identity.get('id') != user['id']:
+            identity = {}
+        identity.update({k: v for k, v in user.items() if v is not None})
+        identity['subject'] = token_subject(self.token)
+        self.identity = identity
         
-        if data and 'me' in data:
-            return {
-                'id': data['me']['id'],
-                'type': 'Internal'
-            }
-        return None
+        if not self.identity_cache_path:
+            return
+        
+        try:
+            self.identity_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.identity_cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(identity, f)
+            os.replace(tmp_path, self.identity_cache_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Impossible de sauvegarder le cache d'identité: {e}")
+    
+    def _load_identity(self):
+        """Recharge le profil depuis le disque s'il correspond au sujet du token actuel"""
+        if not self.identity_cache_path or not self.identity_cache_path.exists():
+            return
+        
+        subject = token_subject(self.token)
+        if not subject:
+            return
+        
+        try:
+            with open(self.identity_cache_path, 'r') as f:
+                identity = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Cache d'identité illisible: {e}")
+            return
+        
+        if identity.get('subject') == subject and identity.get('id'):
+            self.identity = identity
     
-    def get_favorite_desks(self) -> List[Dict]:
+    def clear_identity(self):
+        """Oublie le profil en cache (mémoire + disque)"""
+        self.identity = None
+        if self.identity_cache_path:
+            try:
+                self.identity_cache_path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"⚠️ Impossible de supprimer le cache d'identité: {e}")
+    
+    @tracing.traced('get_favorite_desks')
+    def get_favorite_desks(self, prefetch_dates: Optional[List[str]] = None) -> List[Dict]:
         """
         Récupère la liste des bureaux favoris de l'utilisateur
         
+        Les favoris sont servis depuis le cache des bureaux; un cache expiré est encore
+        servi pendant qu'un rafraîchissement tourne en arrière-plan.
+        
+        Args:
+            prefetch_dates: Dates (YYYY-MM-DD) à charger dans l'index des réservations
+                dans la même requête HTTP que les favoris (optionnel)
+        
         Returns:
             Liste des bureaux favoris (desk_id, space_id, name) par ordre de préférence
         """
@@ -490,8 +1584,119 @@ class OneFlexClient:
         if not user_id:
             return []
         
-        # Récupérer les bureaux favoris
+        cached = self.desk_catalog.favorites(user_id['id'])
+        if cached:
+            if not self.desk_catalog.is_fresh(user_id['id']):
+                self._refresh_desk_catalog()
+            if prefetch_dates:
+                self.load_booking_index(prefetch_dates)
+            return cached
+        
+        return self._fetch_favorite_desks(user_id, prefetch_dates)
+    
+    def _fetch_favorite_desks(self, user_id: Dict, prefetch_dates: Optional[List[str]] = None) -> List[Dict]:
+        """Interroge l'API pour les favoris (voir get_favorite_desks) et met le cache à jour"""
+        # Un cache vidé pendant la requête ne doit pas être réécrit avec ces données
+        generation = self.desk_catalog.generation
+        favorites_operation = self._favorites_operation(user_id)
+        
+        # Récupérer les bureaux favoris, avec les réservations de l'horizon si demandé
+        missing = []
+        if prefetch_dates:
+            if self.booking_index is None:
+                self.booking_index = BookingIndex()
+            missing = self.booking_index.missing_dates(prefetch_dates)
+        
+        if missing:
+            data, affectations_data = self._graphql_batch([
+                favorites_operation,
+                self._affectations_operation(user_id, missing)
+            ])
+            if affectations_data and 'user' in affectations_data and 'affectations' in affectations_data['user']:
+                self.booking_index.load(missing, affectations_data['user']['affectations'])
+                if self.booking_store:
+                    self.booking_store.replace_dates(missing, affectations_data['user']['affectations'])
+                logger.info(f"🗂️ Index des réservations chargé avec les favoris: {len(missing)} date(s)")
+        else:
+            data = self._graphql_request(*favorites_operation)
+        
+        if not data or 'user' not in data:
+            return []
+        
+        favorite_desks = []
+        desks = []
+        source = 'favorites'
+        
+        if 'favoriteSpacesAndDesks' in data['user']:
+            favorites = data['user']['favoriteSpacesAndDesks'] or []
+            for fav in favorites:
+                if fav.get('desk') and fav.get('space'):
+                    favorite_desks.append({
+                        'desk_id': fav['desk']['id'],
+                        'space_id': fav['space']['id'],
+                        'name': fav['desk'].get('name', 'Bureau favori')
+                    })
+                    desks.append(_desk_metadata(fav['desk'], fav['space']))
+        
+        # Si aucun favori explicite, utiliser les bureaux les plus réservés
+        if not favorite_desks:
+            source = 'history'
+            bookings = self._fetch_affectations(
+                [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(90)],
+                max_age=self.booking_store_max_age
+            )
+            if bookings is None:
+                return []
+            
+            desk_count = {}
+            for booking in bookings:
+                if booking.get('desk') and booking.get('space'):
+                    desk_id = booking['desk']['id']
+                    if desk_id not in desk_count:
+                        desk_count[desk_id] = {
+                            'count': 0,
+                            'desk_id': desk_id,
+                            'space_id': booking['space']['id'],
+                            'name': booking['desk'].get('name', 'Bureau')
+                        }
+                        desks.append(_desk_metadata(booking['desk'], booking['space']))
+                    desk_count[desk_id]['count'] += 1
+            
+            # Trier par nombre de réservations (décroissant)
+            sorted_desks = sorted(desk_count.values(), key=lambda x: x['count'], reverse=True)
+            for desk_info in sorted_desks:
+                favorite_desks.append({
+                    'desk_id': desk_info['desk_id'],
+                    'space_id': desk_info['space_id'],
+                    'name': desk_info['name']
+                })
+        
+        self.desk_catalog.store(user_id['id'], favorite_desks, desks, source, generation=generation)
+        return favorite_desks
+    
+    def _refresh_desk_catalog(self):
+        """Rafraîchit le cache des bureaux dans un thread (un seul à la fois)"""
+        with self._desk_refresh_lock:
+            if self._desk_refresh is not None and self._desk_refresh.is_alive():
+                return
+            user_id = self.get_my_user_id()
+            
+            def run():
+                try:
+                    if self._fetch_favorite_desks(user_id):
+                        logger.info("🔄 Cache des bureaux rafraîchi")
+                except Exception as e:
+                    logger.warning(f"⚠️ Rafraîchissement du cache des bureaux échoué: {e}")
+            
+            # Thread non démon: une commande ponctuelle attend la fin du rafraîchissement avant de quitter
+            self._desk_refresh = threading.Thread(target=run, name='desk-cache-refresh')
+            self._desk_refresh.start()
+        logger.info("🔄 Cache des bureaux expiré, rafraîchissement en arrière-plan")
+    
+    def _favorites_operation(self, user_id: Dict) -> tuple:
+        """Construit la requête des bureaux favoris (query, variables)"""
         query = """
+
         query userFavoriteSpacesAndDesks($userId: UserIdType!) {
             user(idV2: $userId) {
                 id
@@ -505,6 +1710,7 @@ class OneFlexClient:
                     desk {
                         id
                         name
+                        coordinates
                         __typename
                     }
                     __typename
@@ -514,57 +1720,19 @@ class OneFlexClient:
         }
         """
         
-        variables = {'userId': user_id}
-        data = self._graphql_request(query, variables)
-        
-        favorite_desks = []
-        
-        if data and 'user' in data and 'favoriteSpacesAndDesks' in data['user']:
-            favorites = data['user']['favoriteSpacesAndDesks']
-            for fav in favorites:
-                if fav.get('desk') and fav.get('space'):
-                    favorite_desks.append({
-                        'desk_id': fav['desk']['id'],
-                        'space_id': fav['space']['id'],
-                        'name': fav['desk'].get('name', 'Bureau favori')
-                    })
-        
-        # Si aucun favori explicite, utiliser les bureaux les plus réservés
-        if not favorite_desks:
-            bookings = self.get_my_bookings(days=90)
-            if bookings:
-                desk_count = {}
-                for booking in bookings:
-                    if booking.get('desk') and booking.get('space'):
-                        desk_id = booking['desk']['id']
-                        if desk_id not in desk_count:
-                            desk_count[desk_id] = {
-                                'count': 0,
-                                'desk_id': desk_id,
-                                'space_id': booking['space']['id'],
-                                'name': booking['desk'].get('name', 'Bureau')
-                            }
-                        desk_count[desk_id]['count'] += 1
-                
-                # Trier par nombre de réservations (décroissant)
-                sorted_desks = sorted(desk_count.values(), key=lambda x: x['count'], reverse=True)
-                for desk_info in sorted_desks:
-                    favorite_desks.append({
-                        'desk_id': desk_info['desk_id'],
-                        'space_id': desk_info['space_id'],
-                        'name': desk_info['name']
-                    })
-        
-        return favorite_desks
+        return query, {'userId': user_id}
     
-    def get_favorite_desk(self) -> Optional[Dict]:
+    def get_favorite_desk(self, prefetch_dates: Optional[List[str]] = None) -> Optional[Dict]:
         """
         Récupère le bureau favori principal de l'utilisateur
         
+        Args:
+            prefetch_dates: Dates à charger dans l'index en même temps (voir get_favorite_desks)
+        
         Returns:
             Dict avec les infos du bureau favori (desk_id, space_id, name)
         """
-        favorites = self.get_favorite_desks()
+        favorites = self.get_favorite_desks(prefetch_dates)
         
         if favorites:
             desk = favorites[0]
@@ -583,79 +1751,73 @@ class OneFlexClient:
         Returns:
             Liste des réservations du jour
         """
-        from datetime import datetime
         today = datetime.now().strftime('%Y-%m-%d')
+        return self._fetch_affectations([today], max_age=self.booking_store_max_age) or []
+    
+    def get_my_bookings(self, days: int = 30) -> List[Dict]:
+        """
+        Récupère les réservations (affectations) de l'utilisateur
         
-        user_id = self.get_my_user_id()
-        if not user_id:
-            logger.error("❌ Impossible de récupérer l'ID utilisateur")
-            return []
+        Args:
+            days: Nombre de jours à récupérer (par défaut 30)
         
-        query = """
-        query affectationsByUserAndDates($userId: UserIdType!, $affectationsFilter: GetAffectationsFilter!) {
-            user(idV2: $userId) {
-                id
-                affectations(affectationFilter: $affectationsFilter) {
-                    id
-                    date
-                    moment
-                    active
-                    desk {
-                        id
-                        name
-                        coordinates
-                        __typename
-                    }
-                    space {
-                        id
-                        name
-                        inheritedName
-                        serviceType
-                        __typename
-                    }
-                    type
-                    description
-                    __typename
-                }
-                __typename
-            }
-        }
+        Returns:
+            Liste des réservations
         """
+        # Générer les dates pour les X prochains jours
+        dates = [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
         
-        variables = {
-            'userId': user_id,
-            'affectationsFilter': {
-                'dates': [today],
-                'withAuthoredSuggestions': True
-            }
-        }
-        
-        data = self._graphql_request(query, variables)
+        affectations = self._fetch_affectations(dates, max_age=self.booking_store_max_age)
         
-        if data and 'user' in data and 'affectations' in data['user']:
-            return data['user']['affectations']
+        if affectations:
+            logger.info(f"📅 Vous avez {len(affectations)} réservation(s)")
+            return affectations
         
+        logger.info("📅 Aucune réservation active")
         return []
     
-    def get_my_bookings(self, days: int = 30) -> List[Dict]:
+    def _fetch_affectations(self, dates: List[str], max_age: Optional[float] = None) -> Optional[List[Dict]]:
         """
-        Récupère les réservations (affectations) de l'utilisateur
+        Récupère les affectations de l'utilisateur pour une liste de dates en une requête
         
-        Args:
-            days: Nombre de jours à récupérer (par défaut 30)
+        Chaque lecture met à jour le stockage local. Avec max_age, seules les dates
+        absentes du stockage ou lues depuis plus de max_age secondes sont demandées
+        à l'API (synchronisation incrémentale), le reste est servi localement.
         
+        Args:
+            dates: Dates au format YYYY-MM-DD
+            max_age: Ancienneté acceptée des données locales en secondes (None = tout relire)
+            
         Returns:
-            Liste des réservations
+            Liste des affectations, ou None en cas d'erreur
         """
+        to_fetch = dates
+        if self.booking_store and max_age is not None:
+            to_fetch = self.booking_store.stale_dates(dates, max_age)
+            if not to_fetch:
+                logger.debug(f"🗄️ {len(dates)} date(s) servie(s) par le stockage local")
+                return self.booking_store.bookings(dates)
+        
         user_id = self.get_my_user_id()
         if not user_id:
             logger.error("❌ Impossible de récupérer l'ID utilisateur")
-            return []
+            return None
         
-        # Générer les dates pour les X prochains jours
-        from datetime import datetime, timedelta
-        dates = [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        data = self._graphql_request(*self._affectations_operation(user_id, to_fetch))
         
+        if not data or 'user' not in data or 'affectations' not in data['user']:
+            return None
+        
+        affectations = data['user']['affectations']
+        if self.booking_store:
+            self.booking_store.replace_dates(to_fetch, affectations)
+            if len(to_fetch) < len(dates):
+                logger.debug(f"🗄️ Synchronisation incrémentale: {len(to_fetch)}/{len(dates)} date(s) relue(s)")
+                return self.booking_store.bookings(dates)
+        return affectations
+    
+    def _affectations_operation(self, user_id: Dict, dates: List[str]) -> tuple:
+        """Construit la requête des affectations pour une liste de dates (query, variables)"""
         query = """
         query affectationsByUserAndDates($userId: UserIdType!, $affectationsFilter: GetAffectationsFilter!) {
             user(idV2: $userId) {
@@ -694,16 +1856,41 @@ class OneFlexClient:
                 'withAuthoredSuggestions': True
             }
         }
+        return query, variables
+    
+    @tracing.traced('load_booking_index')
+    def load_booking_index(self, dates: List[str]) -> Optional[BookingIndex]:
+        """
+        Charge les réservations de tout un horizon dans l'index local
         
-        data = self._graphql_request(query, variables)
+        Seules les dates pas encore couvertes sont demandées à l'API, en une seule
+        requête. book_desk et les annulations s'appuient ensuite sur cet index.
         
-        if data and 'user' in data and 'affectations' in data['user']:
-            affectations = data['user']['affectations']
-            logger.info(f"📅 Vous avez {len(affectations)} réservation(s)")
-            return affectations
+        Args:
+            dates: Dates au format YYYY-MM-DD
+            
+        Returns:
+            L'index à jour, ou None si la récupération a échoué
+        """
+        if self.booking_index is None:
+            self.booking_index = BookingIndex()
         
-        logger.info("📅 Aucune réservation active")
-        return []
+        missing = self.booking_index.missing_dates(dates)
+        if not missing:
+            return self.booking_index
+        
+        affectations = self._fetch_affectations(missing)
+        if affectations is None:
+            logger.warning("⚠️ Impossible de charger l'index des réservations")
+            return None
+        
+        self.booking_index.load(missing, affectations)
+        logger.info(f"🗂️ Index des réservations chargé: {len(missing)} date(s), {len(affectations)} affectation(s)")
+        return self.booking_index
+    
+    def clear_booking_index(self):
+        """Oublie l'index local (celui de la commande ou du job en cours dans un run_scope)"""
+        self.booking_index = None
     
     def has_booking_for_date(self, date: datetime, desk_id: Optional[str] = None) -> bool:
         """
@@ -0,0 +1,125 @@
+"""
+Limiteur de débit (token bucket) partagé par tous les appels à l'API OneFlex
+"""
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket adaptatif
+
+    - Débit régulier de `rate` requêtes/s avec des rafales jusqu'à `burst` requêtes
+    - Sur HTTP 429/503, le débit est divisé par deux et les requêtes sont suspendues
+      le temps indiqué par Retry-After (ou le temps d'un jeton à défaut); un Retry-After
+      porté par une autre réponse (redirection...) est ignoré
+    - Chaque réponse normale fait remonter progressivement le débit vers sa valeur configurée
+    """
+
+    BACKOFF_STATUSES = (429, 503)
+
+    def __init__(self, rate: float = 5.0, burst: int = 10, min_rate: float = 0.2):
+        """
+        Args:
+            rate: Débit régulier (requêtes par seconde)
+            burst: Nombre de requêtes pouvant partir d'un coup
+            min_rate: Débit plancher lorsque l'API freine
+        """
+        self.max_rate = max(rate, min_rate)
+        self.min_rate = min_rate
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, burst: int):
+        """
+        Change le débit et la rafale configurés (instance partagée, réglée au démarrage)
+
+        Args:
+            rate: Débit régulier (requêtes par seconde)
+            burst: Nombre de requêtes pouvant partir d'un coup
+        """
+        with self._lock:
+            self.max_rate = max(rate, self.min_rate)
+            self.rate = self.max_rate
+            self.burst = max(1, burst)
+            self._tokens = min(self._tokens, float(self.burst))
+
+    def _refill(self, now: float):
+        """Ajoute les jetons accumulés depuis la dernière mise à jour"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Attend qu'un jeton soit disponible et le consomme
+
+        Returns:
+            Temps d'attente en secondes
+        """
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_response(self, status_code: int, retry_after: Optional[str] = None):
+        """
+        Adapte le débit selon la réponse du serveur
+
+        Args:
+            status_code: Code HTTP reçu
+            retry_after: Valeur de l'en-tête Retry-After (secondes ou date HTTP)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if status_code in self.BACKOFF_STATUSES:
+                delay = self._parse_retry_after(retry_after)
+                if delay is None:
+                    delay = 1 / self.rate
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._paused_until = max(self._paused_until, now + delay)
+                self._tokens = 0
+                logger.warning(f"🐢 API saturée (HTTP {status_code}), pause de {delay:.1f}s, débit réduit à {self.rate:.2f} req/s")
+            elif self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Convertit un Retry-After (secondes ou date HTTP) en secondes d'attente"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Instance globale, partagée par tous les OneFlexClient (réglée depuis Config au démarrage)
+rate_limiter = RateLimiter()
@@ -0,0 +1,167 @@
+"""
+Réconciliation du calendrier souhaité avec les réservations existantes
+
+Le calendrier souhaité (jours de RESERVATION_DAYS_OF_WEEK sur l'horizon, hors
+vacances) est comparé aux affectations réelles: le plan ne contient que les
+créations et annulations nécessaires. Un jour sans changement de configuration,
+le plan est vide et n'a coûté qu'une lecture.
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from graphql_batch import batch_label
+from vacation_manager import VacationManager
+
+logger = logging.getLogger(__name__)
+
+
+def parse_days_of_week(value: str) -> List[int]:
+    """
+    Jours de la semaine configurés (1=Lundi, 7=Dimanche)
+
+    Raises:
+        ValueError: Si la valeur n'est pas une liste de chiffres séparés par des virgules
+    """
+    days = [int(d.strip()) for d in value.split(',') if d.strip()]
+    if any(d < 1 or d > 7 for d in days):
+        raise ValueError(f"Jour de semaine hors de 1..7: {value}")
+    return days
+
+
+def recurring_dates(days_of_week: Iterable[int], weeks_ahead: int, today: Optional[date] = None) -> List[date]:
+    """
+    Dates des jours configurés sur les semaines à venir (aujourd'hui exclu), triées
+
+    Args:
+        days_of_week: Jours de la semaine (1=Lundi, 7=Dimanche)
+        weeks_ahead: Nombre de semaines
+        today: Date de référence (aujourd'hui par défaut)
+    """
+    today = today or date.today()
+    dates = set()
+    for week in range(weeks_ahead):
+        for day_of_week in days_of_week:
+            days_until = (day_of_week - today.isoweekday()) % 7
+            if days_until == 0:
+                days_until = 7  # Si c'est le même jour, toujours prendre la semaine suivante
+            dates.add(today + timedelta(days=days_until + week * 7))
+    return sorted(dates)
+
+
+class ReconciliationPlan:
+    """Opérations nécessaires pour aligner les réservations sur le calendrier souhaité"""
+
+    def __init__(self, read_dates: List[str], to_book: List[str], to_cancel: List[Dict], already_booked: List[str]):
+        self.read_dates = read_dates  # Dates lues pour établir le plan
+        self.to_book = to_book  # Dates souhaitées sans réservation active
+        self.to_cancel = to_cancel  # Affectations actives pendant les vacances
+        self.already_booked = already_booked  # Dates souhaitées déjà réservées
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.to_book and not self.to_cancel
+
+    def cancel_ids(self) -> List[str]:
+        """IDs distincts des affectations à annuler"""
+        return list(dict.fromkeys(b.get('id') for b in self.to_cancel if b.get('id')))
+
+    def describe(self) -> List[str]:
+        """Lignes lisibles du plan, pour les logs"""
+        lines = [f"➕ {d}" for d in self.to_book]
+        for booking in self.to_cancel:
+            desk = (booking.get('desk') or {}).get('name', 'Bureau')
+            lines.append(f"➖ {booking.get('date')} ({booking.get('moment', '')}) - {desk}")
+        return lines
+
+    def mutation_requests(self, batch_size: int, max_batch_operations: int) -> List[str]:
+        """
+        Requêtes HTTP qu'enverra l'exécution du plan (reconcile_bookings)
+
+        Un createAffectation par lot de batch_size dates, un lot de deleteAffectation
+        aliasés par paquet de max_batch_operations. Un lot de créations rejeté par le
+        serveur est redécoupé en deux: ce surcoût n'est pas prévisible.
+        """
+        batch_size = max(1, batch_size)
+        requests = []
+        for start in range(0, len(self.to_book), batch_size):
+            chunk = self.to_book[start:start + batch_size]
+            requests.append(f"createAffectation ({len(chunk)} date(s))")
+
+        ids = self.cancel_ids()
+        for start in range(0, len(ids), max_batch_operations):
+            group = ids[start:start + max_batch_operations]
+            requests.append('deleteAffectation' if len(group) == 1 else batch_label(['deleteAffectation'] * len(group)))
+        return requests
+
+
+class Reconciler:
+    """
+    Calcule le plan minimal de créations/annulations
+
+    - À créer: chaque date souhaitée sans aucune réservation active (quel que soit le bureau)
+    - À annuler: les réservations actives tombant pendant les vacances (si auto_cancel),
+      sur une fenêtre de cancel_window_days jours; les réservations faites à la main
+      sur d'autres jours ne sont jamais touchées
+    """
+
+    def __init__(
+        self,
+        days_of_week: List[int],
+        weeks_ahead: int,
+        vacation_manager: Optional[VacationManager] = None,
+        auto_cancel: bool = True,
+        cancel_window_days: int = 90
+    ):
+        """
+        Args:
+            days_of_week: Jours de la semaine à réserver (1=Lundi, 7=Dimanche)
+            weeks_ahead: Nombre de semaines de l'horizon
+            vacation_manager: Périodes de vacances (exclues et annulées)
+            auto_cancel: Annuler les réservations pendant les vacances
+            cancel_window_days: Nombre de jours (à partir d'aujourd'hui) où chercher les annulations
+        """
+        self.days_of_week = days_of_week
+        self.weeks_ahead = weeks_ahead
+        self.vacation_manager = vacation_manager or VacationManager()
+        self.auto_cancel = auto_cancel
+        self.cancel_window_days = cancel_window_days
+
+    def desired_dates(self, today: Optional[date] = None) -> List[date]:
+        """Calendrier souhaité: jours configurés de l'horizon, hors vacances"""
+        return self.vacation_manager.filter_vacation_dates(recurring_dates(self.days_of_week, self.weeks_ahead, today))
+
+    def vacation_dates(self, today: Optional[date] = None) -> List[date]:
+        """Jours de vacances de la fenêtre d'annulation"""
+        if not self.auto_cancel or not self.vacation_manager.vacation_periods:
+            return []
+        today = today or date.today()
+        window = (today + timedelta(days=i) for i in range(self.cancel_window_days))
+        return [d for d in window if self.vacation_manager.is_vacation_day(d)]
+
+    def dates_to_read(self, today: Optional[date] = None) -> List[str]:
+        """Seules dates dont les réservations influencent le plan (une seule lecture)"""
+        dates = set(self.desired_dates(today)) | set(self.vacation_dates(today))
+        return [d.strftime('%Y-%m-%d') for d in sorted(dates)]
+
+    def plan(self, affectations: List[Dict], today: Optional[date] = None, confirmed: Iterable[str] = ()) -> ReconciliationPlan:
+        """
+        Compare le calendrier souhaité aux affectations réelles
+
+        Args:
+            affectations: Affectations lues pour dates_to_read()
+            today: Date de référence (aujourd'hui par défaut)
+            confirmed: Dates (YYYY-MM-DD) connues comme réservées sans avoir été relues
+        """
+        active = [a for a in affectations if a.get('active', True)]
+        booked = {a.get('date') for a in active} | set(confirmed)
+
+        desired = [d.strftime('%Y-%m-%d') for d in self.desired_dates(today)]
+        vacation = {d.strftime('%Y-%m-%d') for d in self.vacation_dates(today)}
+
+        return ReconciliationPlan(
+            read_dates=self.dates_to_read(today),
+            to_book=[d for d in desired if d not in booked],
+            to_cancel=[a for a in active if a.get('date') in vacation],
+            already_booked=[d for d in desired if d in booked]
+        )
@@ -0,0 +1,105 @@
+"""
+Mémo des lectures GraphQL le temps d'une commande ou d'un job
+"""
+import copy
+import json
+import threading
+import logging
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _dates(value: Any, found: Optional[Set[str]] = None) -> Set[str]:
+    """Dates (YYYY-MM-DD) visées par des variables: filtres `dates` et `datedMoments`"""
+    found = set() if found is None else found
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == 'dates' and isinstance(item, list):
+                found.update(d for d in item if isinstance(d, str))
+            elif key == 'date' and isinstance(item, str):
+                found.add(item)
+            else:
+                _dates(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            _dates(item, found)
+    return found
+
+
+def _touches_affectations(query: str) -> bool:
+    return 'affectation' in query.lower()
+
+
+class RequestMemo:
+    """
+    Résultats des queries GraphQL déjà obtenues pendant une exécution
+
+    Clé: texte de la query normalisé (espaces) + variables triées. Une mutation
+    invalide les lectures qu'elle peut avoir rendues fausses:
+    - createAffectation: les lectures d'affectations qui portent sur ses dates
+    - deleteAffectation: toutes les lectures d'affectations (dates inconnues)
+    - toute autre mutation: tout le mémo
+    Les accès sont protégés par un verrou (client async).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[Any, Set[str]]] = {}  # clé -> (données, dates)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query: str, variables: Optional[Dict] = None) -> Tuple[str, str]:
+        """Clé normalisée d'une opération"""
+        return ' '.join(query.split()), json.dumps(variables or {}, sort_keys=True, separators=(',', ':'))
+
+    def get(self, query: str, variables: Optional[Dict] = None) -> Tuple[bool, Any]:
+        """
+        Returns:
+            (True, données) si la query a déjà été exécutée, (False, None) sinon
+        """
+        key = self.key(query, variables)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            data = self._entries[key][0]
+        # Copie: l'appelant peut modifier le résultat sans corrompre le mémo
+        return True, copy.deepcopy(data)
+
+    def store(self, query: str, variables: Optional[Dict], data: Any):
+        """Mémorise le résultat d'une query réussie"""
+        entry = (copy.deepcopy(data), _dates(variables))
+        with self._lock:
+            self._entries[self.key(query, variables)] = entry
+
+    def invalidate(self, mutation: str, variables: Optional[Dict] = None) -> int:
+        """
+        Oublie les lectures qu'une mutation a pu modifier
+
+        Returns:
+            Nombre d'entrées oubliées
+        """
+        with self._lock:
+            if not _touches_affectations(mutation):
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+
+            dates = _dates(variables) if 'createaffectation' in mutation.lower() else set()
+            stale = [
+                key for key, (_, entry_dates) in self._entries.items()
+                if _touches_affectations(key[0]) and (not dates or not entry_dates or dates & entry_dates)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+        if stale:
+            logger.debug(f"🧹 {len(stale)} lecture(s) oubliée(s) après une mutation")
+        return len(stale)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,109 @@
+"""
+Politique de retry et disjoncteur (circuit breaker) pour les appels OneFlex
+"""
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    Retry avec backoff exponentiel et jitter ("full jitter")
+
+    Le délai avant la tentative n+1 est tiré au hasard entre 0 et
+    min(max_delay, base_delay * 2^n), pour éviter que plusieurs clients
+    ne retentent tous au même instant.
+    """
+
+    # Codes HTTP transitoires
+    RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+    # Codes pour lesquels le serveur n'a pas traité la requête: sûrs même pour une mutation
+    NOT_PROCESSED_STATUSES = (429, 503)
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        Args:
+            max_attempts: Nombre total de tentatives (1 = pas de retry)
+            base_delay: Délai de base en secondes
+            max_delay: Délai maximum entre deux tentatives
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Délai à attendre après l'échec de la tentative numéro attempt (0 = première)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur: après `failure_threshold` échecs consécutifs, toutes les requêtes
+    échouent immédiatement pendant `reset_timeout` secondes. Une requête de test
+    est ensuite autorisée (semi-ouvert): son succès referme le circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """
+        Args:
+            failure_threshold: Échecs consécutifs avant ouverture
+            reset_timeout: Durée d'ouverture en secondes
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Indique si une requête peut partir"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+                logger.info("🔌 Circuit OneFlex semi-ouvert, requête de test autorisée")
+
+            # Semi-ouvert: une seule requête de test à la fois
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """Signale une requête réussie"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("✅ Circuit OneFlex refermé")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Libère la requête de test sans la compter (abandonnée avant l'envoi)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Signale un échec (réseau ou erreur serveur)"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"⛔ Circuit OneFlex ouvert après {self._failures} échec(s), pause de {self.reset_timeout:.0f}s")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
@@ -0,0 +1,250 @@
+"""
+Planificateur de jobs quotidiens piloté par les échéances
+
+Remplace la boucle "vérifier toutes les minutes": le planificateur dort jusqu'à
+l'échéance du prochain job, à la milliseconde près.
+"""
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, time as dt_time, timedelta
+from typing import Callable, ContextManager, List, Optional
+from zoneinfo import ZoneInfo
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledJob:
+    """Job exécuté chaque jour à une heure locale donnée"""
+
+    HISTORY_SIZE = 20  # Nombre d'exécutions conservées dans l'historique
+
+    def __init__(self, name: str, at: dt_time, func: Callable[[], None], timeout: Optional[float] = None):
+        """
+        Args:
+            name: Nom du job (pour les logs)
+            at: Heure locale d'exécution
+            func: Fonction à appeler
+            timeout: Durée maximale d'une exécution en secondes (None = pas de limite)
+        """
+        self.name = name
+        self.at = at
+        self.func = func
+        self.timeout = timeout
+        self.next_run: Optional[float] = None  # Timestamp UNIX de la prochaine exécution
+        self.last_run: Optional[float] = None
+        self.running_since: Optional[float] = None  # Début de l'exécution en cours (monotonic)
+        self.overdue_reported = False
+        self.history = deque(maxlen=self.HISTORY_SIZE)  # {'started', 'duration', 'status'} par exécution
+
+
+class Scheduler:
+    """
+    Planificateur quotidien sensible au fuseau horaire
+
+    - Les heures sont interprétées dans le fuseau configuré (Europe/Paris par défaut),
+      changements d'heure compris: une heure qui n'existe pas (passage à l'heure d'été)
+      est décalée de la durée du saut, une heure qui existe deux fois (passage à
+      l'heure d'hiver) n'est exécutée qu'une fois
+    - Le sommeil est plafonné à max_sleep secondes pour rattraper un saut de l'horloge
+      murale; un job dont l'échéance est dépassée ne s'exécute qu'une fois
+    - Les jobs tournent dans un pool de threads borné: un job lent ne retarde pas les
+      autres, un job encore en cours n'est pas relancé, et chaque exécution est
+      bornée par son timeout (appliqué via job_context, ex: l'échéance du client OneFlex)
+    - L'horloge et l'attente sont injectables, pour tester la planification sans attendre
+    """
+
+    def __init__(
+        self,
+        timezone: str = 'Europe/Paris',
+        clock: Optional[Callable[[], float]] = None,
+        wait: Optional[Callable[[float], bool]] = None,
+        max_sleep: float = 300.0,
+        workers: int = 3,
+        job_timeout: Optional[float] = None,
+        job_context: Optional[Callable[[Optional[float]], ContextManager]] = None
+    ):
+        """
+        Args:
+            timezone: Fuseau horaire des heures d'exécution
+            clock: Horloge murale (timestamp UNIX), time.time par défaut
+            wait: Attente d'une durée en secondes, retourne True pour arrêter le planificateur
+            max_sleep: Durée maximale d'un sommeil en secondes
+            workers: Nombre de jobs pouvant tourner en même temps (0 = dans le thread du planificateur)
+            job_timeout: Timeout par défaut des jobs en secondes
+            job_context: Fabrique du contexte d'exécution d'un job à partir de son timeout
+        """
+        self.tz = ZoneInfo(timezone)
+        self.clock = clock or time.time
+        self._stop = threading.Event()
+        self.wait = wait or self._stop.wait
+        self.max_sleep = max_sleep
+        self.job_timeout = job_timeout
+        self.job_context = job_context or (lambda timeout: nullcontext())
+        self.jobs: List[ScheduledJob] = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') if workers > 0 else None
+        self._lock = threading.Lock()
+
+    def every_day_at(
+        self,
+        at: str,
+        func: Callable[[], None],
+        name: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> ScheduledJob:
+        """
+        Ajoute un job quotidien
+
+        Args:
+            at: Heure locale (HH:MM ou HH:MM:SS)
+            func: Fonction à appeler
+            name: Nom du job (nom de la fonction par défaut)
+            timeout: Durée maximale d'une exécution (job_timeout par défaut)
+
+        Returns:
+            Le job planifié
+        """
+        fmt = '%H:%M:%S' if at.count(':') == 2 else '%H:%M'
+        timeout = timeout if timeout is not None else self.job_timeout
+        job = ScheduledJob(name or func.__name__, datetime.strptime(at, fmt).time(), func, timeout or None)
+        job.next_run = self.next_occurrence(job.at, self.clock())
+        self.jobs.append(job)
+        return job
+
+    def next_occurrence(self, at: dt_time, after: float) -> float:
+        """
+        Prochaine occurrence strictement après `after` d'une heure locale
+
+        Args:
+            at: Heure locale
+            after: Timestamp UNIX de référence
+
+        Returns:
+            Timestamp UNIX de l'occurrence
+        """
+        day = datetime.fromtimestamp(after, self.tz).date()
+        while True:
+            local = datetime.combine(day, at, tzinfo=self.tz)
+            # fold=0: première occurrence d'une heure ambiguë, heure inexistante
+            # interprétée avec le décalage d'avant le changement (donc décalée du saut)
+            timestamp = local.timestamp()
+            if timestamp > after:
+                return timestamp
+            day += timedelta(days=1)
+
+    def idle_seconds(self) -> Optional[float]:
+        """Secondes avant la prochaine échéance (None sans job)"""
+        if not self.jobs:
+            return None
+        idle = min(job.next_run for job in self.jobs) - self.clock()
+
+        # Se réveiller aussi quand un job en cours dépasse son timeout, pour le signaler
+        now = time.monotonic()
+        with self._lock:
+            for job in self.jobs:
+                if job.running_since is not None and job.timeout and not job.overdue_reported:
+                    idle = min(idle, job.running_since + job.timeout - now)
+        return idle
+
+    def run_pending(self) -> List[ScheduledJob]:
+        """
+        Exécute les jobs arrivés à échéance et replanifie leur prochaine occurrence
+
+        Returns:
+            Les jobs exécutés
+        """
+        now = self.clock()
+        due = sorted((job for job in self.jobs if job.next_run <= now), key=lambda job: job.next_run)
+
+        self._report_overdue()
+
+        for job in due:
+            lag = now - job.next_run
+            # Replanifier avant l'exécution: un job en retard de plusieurs jours ne tourne qu'une fois
+            job.next_run = self.next_occurrence(job.at, now)
+
+            with self._lock:
+                if job.running_since is not None:
+                    running = time.monotonic() - job.running_since
+                    logger.warning(f"⏭️ Job '{job.name}' encore en cours depuis {running:.0f}s, exécution sautée")
+                    job.history.append({'started': now, 'duration': 0.0, 'status': 'skipped'})
+                    metrics.job_runs.inc(job=job.name, status='skipped')
+                    continue
+                job.running_since = time.monotonic()
+                job.overdue_reported = False
+
+            if lag >= 60:
+                logger.warning(f"⏱️ Job '{job.name}' lancé avec {lag:.0f}s de retard (horloge recalée ou machine en veille)")
+            else:
+                logger.info(f"⏱️ Job '{job.name}' lancé ({lag * 1000:.0f} ms de retard)")
+            job.last_run = now
+            if self._executor:
+                self._executor.submit(self._execute, job, now)
+            else:
+                self._execute(job, now)
+
+        return due
+
+    def _execute(self, job: ScheduledJob, started_at: float):
+        """Exécute un job sous son timeout, sans laisser une exception arrêter le planificateur"""
+        status = 'ok'
+        try:
+            # Span racine: les appels API du job s'y rattachent
+            with tracing.span(f"job {job.name}", job=job.name), self.job_context(job.timeout):
+                job.func()
+        except Exception as e:
+            status = 'error'
+            logger.exception(f"❌ Job '{job.name}' en erreur: {e}")
+        finally:
+            with self._lock:
+                duration = time.monotonic() - job.running_since
+                job.running_since = None
+            if status == 'ok' and job.timeout and duration > job.timeout:
+                status = 'timeout'
+            job.history.append({'started': started_at, 'duration': duration, 'status': status})
+            metrics.job_runs.inc(job=job.name, status=status)
+            metrics.job_duration.observe(duration, job=job.name)
+            logger.info(f"🏁 Job '{job.name}' terminé en {duration:.1f}s ({status})")
+
+    def _report_overdue(self):
+        """Signale (une fois) les jobs qui dépassent leur timeout"""
+        now = time.monotonic()
+        with self._lock:
+            for job in self.jobs:
+                if job.running_since is None or not job.timeout or job.overdue_reported:
+                    continue
+                if now - job.running_since > job.timeout:
+                    job.overdue_reported = True
+                    logger.error(f"⌛ Job '{job.name}' toujours en cours après {job.timeout:.0f}s (timeout dépassé)")
+
+    def run_forever(self):
+        """Boucle principale: dort jusqu'à la prochaine échéance, puis exécute les jobs dus"""
+        while True:
+            self.run_pending()
+
+            idle = self.idle_seconds()
+            delay = self.max_sleep if idle is None else min(self.max_sleep, max(0.0, idle))
+            if self.wait(delay):
+                return
+
+    def stop(self):
+        """Arrête run_forever (depuis un autre thread)"""
+        self._stop.set()
+
+    def shutdown(self, wait: bool = False):
+        """Libère le pool de workers"""
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+
+    def describe(self) -> List[str]:
+        """Prochaines exécutions, pour les logs"""
+        return [
+            f"{job.name}: {datetime.fromtimestamp(job.next_run, self.tz).strftime('%d/%m/%Y %H:%M:%S %Z')}"
+            for job in sorted(self.jobs, key=lambda job: job.next_run)
+        ]
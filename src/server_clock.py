@@ -0,0 +1,100 @@
+"""
+Estimation du décalage entre l'horloge locale et celle du serveur OneFlex
+"""
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ServerClock:
+    """
+    Décalage d'horloge estimé à partir de l'en-tête Date des réponses
+
+    L'en-tête Date (à la seconde près) a été produit par le serveur entre l'envoi
+    et la réception de la requête. Chaque réponse donne donc un intervalle sûr pour
+    le décalage serveur - local:
+
+        [Date - réception, Date + 1 - envoi]
+
+    Les intervalles successifs sont intersectés, ce qui affine l'estimation bien
+    en dessous de la seconde au fil des requêtes. L'intervalle retenu est élargi
+    avec le temps pour tenir compte de la dérive de l'horloge locale; si un nouvel
+    échantillon le contredit (horloge recalée), l'estimation repart de zéro.
+    """
+
+    def __init__(self, drift_rate: float = 1e-4):
+        """
+        Args:
+            drift_rate: Dérive maximale supposée de l'horloge locale (secondes par seconde)
+        """
+        self.drift_rate = drift_rate
+        self._low: Optional[float] = None
+        self._high: Optional[float] = None
+        self._updated = 0.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, sent_at: float, received_at: float, date_header: Optional[str]):
+        """
+        Intègre une réponse du serveur
+
+        Args:
+            sent_at: Heure locale d'envoi de la requête (timestamp UNIX)
+            received_at: Heure locale de réception de la réponse
+            date_header: Valeur de l'en-tête Date de la réponse
+        """
+        if not date_header:
+            return
+        try:
+            server_time = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return
+
+        low, high = server_time - received_at, server_time + 1 - sent_at
+
+        with self._lock:
+            now = time.monotonic()
+            if self._low is not None:
+                widen = (now - self._updated) * self.drift_rate
+                current_low, current_high = self._low - widen, self._high + widen
+                if low <= current_high and current_low <= high:
+                    low, high = max(low, current_low), min(high, current_high)
+                else:
+                    logger.warning(f"🕰️ Horloge locale recalée, décalage serveur réestimé ({(low + high) / 2:+.3f}s)")
+            self._low, self._high = low, high
+            self._updated = now
+            self.samples += 1
+
+    def _bounds(self) -> Optional[tuple]:
+        """Intervalle courant du décalage, élargi de la dérive depuis le dernier échantillon"""
+        with self._lock:
+            if self._low is None:
+                return None
+            widen = (time.monotonic() - self._updated) * self.drift_rate
+            return self._low - widen, self._high + widen
+
+    @property
+    def offset(self) -> float:
+        """Décalage estimé serveur - local en secondes (0 sans échantillon)"""
+        bounds = self._bounds()
+        return (bounds[0] + bounds[1]) / 2 if bounds else 0.0
+
+    @property
+    def uncertainty(self) -> Optional[float]:
+        """Demi-largeur de l'intervalle du décalage en secondes (None sans échantillon)"""
+        bounds = self._bounds()
+        return (bounds[1] - bounds[0]) / 2 if bounds else None
+
+    def now(self) -> float:
+        """Heure estimée du serveur (timestamp UNIX)"""
+        return time.time() + self.offset
+
+    def describe(self) -> str:
+        """Résumé lisible pour les logs"""
+        if self.uncertainty is None:
+            return "décalage serveur inconnu"
+        return f"décalage serveur {self.offset * 1000:+.0f} ms (±{self.uncertainty * 1000:.0f} ms, {self.samples} échantillon(s))"
@@ -0,0 +1,305 @@
+"""
+Mode "snipe": réservation déclenchée à l'instant exact d'ouverture d'une date
+
+Tout ce qui peut être fait à l'avance l'est avant l'ouverture (T0): token, ID
+utilisateur, favoris, réservations existantes, corps des mutations déjà sérialisés
+et connexion TLS ouverte. À T0, il ne reste qu'à écrire la requête sur la socket.
+"""
+import json
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+import metrics
+from graphql_batch import operation_name
+from oneflex_client import DeadlineExceeded, OneFlexClient, booking_error_kind
+
+logger = logging.getLogger(__name__)
+
+
+class BookingSniper:
+    """
+    Prépare puis envoie la réservation d'une date à son heure d'ouverture
+
+    L'attente se fait en deux temps: sommeil jusqu'à quelques millisecondes de T0,
+    puis attente active pour partir à la milliseconde. Les bureaux favoris sont
+    tentés dans l'ordre; tant que la fenêtre de retry n'est pas écoulée, un rejet
+    (date pas encore ouverte, horloge en avance...) relance un tour.
+    """
+
+    SPIN_WINDOW = 0.02  # Attente active sur les 20 dernières millisecondes
+    CALIBRATION_PROBES = 3  # Requêtes de chauffe/calage d'horloge juste avant T0 (une par seconde)
+    RETRY_INTERVAL = 0.1  # Pause entre deux tours de tentatives
+
+    def __init__(
+        self,
+        client: OneFlexClient,
+        retry_window: float = 3.0,
+        clock: Optional[Callable[[], float]] = None
+    ):
+        """
+        Args:
+            client: Client OneFlex configuré
+            retry_window: Durée après T0 pendant laquelle les rejets sont retentés (secondes)
+            clock: Horloge de référence (timestamp UNIX), l'heure estimée du serveur par défaut
+        """
+        self.client = client
+        self.retry_window = retry_window
+        self.clock = clock or client.server_clock.now
+        self._attempts: List[Dict] = []
+
+    def prepare(self, date: datetime, release_at: float, moments: List[str] = None) -> bool:
+        """
+        Fait tout le travail préalable à l'envoi
+
+        Args:
+            date: Date à réserver
+            release_at: Instant d'ouverture T0 (timestamp UNIX)
+            moments: Moments à réserver (toute la journée par défaut)
+
+        Returns:
+            True si une tentative est prête, False s'il n'y a rien à envoyer
+        """
+        self._attempts = []
+        date_str = date.strftime('%Y-%m-%d')
+        
+        journal = self.client.journal
+        if journal and journal.confirmed_dates([date_str]):
+            logger.info(f"📓 Réservation du {date.strftime('%d/%m/%Y')} déjà confirmée par le journal, rien à envoyer")
+            return False
+
+        # Le token doit rester valide jusqu'après la fenêtre de tentatives
+        expires_in = self.client.token_expires_in()
+        needed = release_at + self.retry_window - self.clock() + self.client.refresh_margin()
+        if expires_in is not None and expires_in < needed and self.client.refresh_token:
+            logger.info("🔄 Token renouvelé avant l'ouverture")
+            self.client.refresh_access_token()
+
+        user_id = self.client.get_my_user_id()
+        if not user_id:
+            logger.error("❌ Impossible de récupérer l'ID utilisateur")
+            return False
+
+        # Favoris et réservations existantes de la date dans la même requête
+        favorites = self.client.get_favorite_desks(prefetch_dates=[date_str])
+        if not favorites:
+            logger.error("❌ Aucun bureau favori à réserver")
+            return False
+
+        if self.client.booking_index and self.client.booking_index.has_booking(date_str):
+            logger.info(f"✅ Réservation déjà existante le {date.strftime('%d/%m/%Y')}, rien à envoyer")
+            return False
+
+        dated_moments = [{"date": date_str, "moment": moment} for moment in (moments or ["MORNING", "AFTERNOON"])]
+        for desk in favorites:
+            query, variables = self.client._create_affectation_operation(
+                user_id, desk['desk_id'], desk['space_id'], dated_moments
+            )
+            self._attempts.append({
+                'desk': desk,
+                'operation': (query, variables),
+                'name': operation_name(query),
+                'dated_moments': dated_moments,
+                'body': json.dumps({'query': query, 'variables': variables}).encode('utf-8')
+            })
+
+        logger.info(f"🎯 Snipe prêt pour le {date.strftime('%d/%m/%Y')}: {len(self._attempts)} bureau(x) en lice")
+        return True
+
+    def run(self, release_at: float) -> tuple:
+        """
+        Attend T0 puis envoie les tentatives préparées
+
+        Args:
+            release_at: Instant d'ouverture T0 (timestamp UNIX)
+
+        Returns:
+            tuple: (success: bool, already_existed: bool), comme OneFlexClient.book_desk
+        """
+        if not self._attempts:
+            return (False, False)
+
+        # Ouvrir (ou rouvrir) la connexion keep-alive et caler l'horloge juste avant T0
+        self._wait_until(release_at - self.CALIBRATION_PROBES - 1)
+        self._calibrate()
+        logger.info(f"🕰️ Envoi calé sur l'heure du serveur: {self.client.server_clock.describe()}")
+
+        self._wait_until(release_at)
+
+        number = 0
+        while True:
+            for attempt in self._attempts:
+                number += 1
+                date_str = attempt['dated_moments'][0]['date']
+                self._journal_begin(attempt)
+                created, rejection = self._fire(attempt, release_at, number)
+                
+                # Échec ambigu: la réservation a pu être créée, relire avant de tenter un autre bureau
+                if rejection == 'ambiguous':
+                    booked = self.client._reload_booked_dates([date_str])
+                    if booked is None:
+                        # L'intention reste en suspens dans le journal: la reprise vérifiera
+                        logger.error("❌ État de la réservation inconnu, arrêt du snipe pour éviter une double réservation")
+                        metrics.record_booking(False, False)
+                        return (False, False)
+                    if date_str in booked:
+                        self._journal_finish(date_str, 'created')
+                        logger.info(f"✅ Réservation créée malgré l'erreur (confirmée après relecture, tentative {number})")
+                        metrics.record_booking(True, False)
+                        return (True, False)
+                
+                # Rejet "déjà réservé": confirmé par une lecture avant de s'arrêter
+                if rejection == 'already_booked' and self.client._own_booking_exists(date_str):
+                    self._journal_finish(date_str, 'already_booked')
+                    logger.info("✅ Réservation déjà existante (confirmée après relecture), fin du snipe")
+                    metrics.record_booking(True, True)
+                    return (True, True)
+                if created:
+                    self._journal_finish(date_str, 'created')
+                    desk = attempt['desk']
+                    self.client._index_created_affectation(created, attempt['dated_moments'], desk['name'])
+                    logger.info(f"✅ Réservation confirmée: {desk['name']} (tentative {number})")
+                    metrics.record_booking(True, False)
+                    return (True, False)
+                self._journal_finish(date_str, 'failed')
+
+            if self.clock() - release_at >= self.retry_window:
+                break
+            time.sleep(self.RETRY_INTERVAL)
+
+        logger.error(f"❌ Snipe échoué après {number} tentative(s)")
+        metrics.record_booking(False, False)
+        return (False, False)
+
+    def _journal_begin(self, attempt: Dict):
+        """Inscrit la tentative dans le journal avant son envoi"""
+        journal = self.client.journal
+        if journal:
+            journal.begin(
+                [journal.create_key(attempt['dated_moments'][0]['date'])],
+                desk_id=attempt['desk']['desk_id'],
+                moments=[dm['moment'] for dm in attempt['dated_moments']]
+            )
+
+    def _journal_finish(self, date_str: str, outcome: str):
+        """Inscrit le résultat d'une tentative dans le journal"""
+        journal = self.client.journal
+        if journal:
+            journal.finish({journal.create_key(date_str): outcome})
+
+    def _wait_until(self, target: float):
+        """Attend l'instant target: sommeil d'abord, attente active sur la fin"""
+        while True:
+            remaining = target - self.clock()
+            if remaining <= 0:
+                return
+            if remaining > self.SPIN_WINDOW:
+                # Réveils réguliers pour suivre l'horloge si elle est ajustée pendant l'attente
+                time.sleep(min(remaining - self.SPIN_WINDOW, 1.0))
+
+    def _calibrate(self):
+        """
+        Requêtes minimales qui établissent la connexion TLS avant T0
+
+        Chacune part juste avant un changement de seconde de l'horloge estimée:
+        l'en-tête Date de la réponse indique de quel côté elle est tombée, ce qui
+        resserre l'estimation du décalage avec le serveur.
+        """
+        rtt = 0.0
+        for _ in range(self.CALIBRATION_PROBES):
+            self._wait_until(math.floor(self.clock()) + 1 - rtt / 2)
+            start = time.perf_counter()
+            if self.client._graphql_request("query warmup { __typename }", memoize=False) is None:
+                logger.warning("⚠️ Requête de chauffe échouée, la connexion sera ouverte à T0")
+                return
+            rtt = time.perf_counter() - start
+        logger.info(f"🔥 Connexion prête ({rtt * 1000:.0f} ms aller-retour)")
+
+    def _fire(self, attempt: Dict, release_at: float, number: int) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Envoie une mutation pré-sérialisée et journalise sa latence par rapport à T0
+
+        Comme _post_graphql: disjoncteur, refresh du token sur 401 (le même corps est
+        renvoyé une fois) et métriques par opération.
+
+        Returns:
+            (affectation créée ou None, type de rejet du serveur ou None); le rejet vaut
+            'ambiguous' quand le serveur a pu traiter la mutation sans qu'on le sache
+            (timeout de lecture, 5xx, réponse illisible)
+        """
+        client = self.client
+        breaker = client.circuit_breaker
+        policy = client.retry_policy
+        desk_name = attempt['desk']['name']
+        operation = attempt['name']
+
+        if not breaker.allow_request():
+            logger.error(f"⛔ Tentative {number} ({desk_name}): circuit OneFlex ouvert, non envoyée")
+            return None, None
+
+        client._count_request(operation)
+        sent_at = self.clock()
+        start = time.perf_counter()
+        try:
+            response = client._send('POST', client.GQL_ENDPOINT, data=attempt['body'])
+            if response.status_code == 401:
+                # Token expiré à T0: le renouveler puis renvoyer la même mutation
+                breaker.record_success()  # Le serveur répond
+                logger.warning(f"⚠️ Tentative {number} ({desk_name}): token expiré, refresh puis renvoi")
+                if client.refresh_access_token():
+                    response = client._send('POST', client.GQL_ENDPOINT, data=attempt['body'])
+        except DeadlineExceeded as e:
+            # Levée avant l'envoi: la mutation n'est pas partie
+            breaker.release_trial()
+            self._record(operation, start, 'failed')
+            logger.error(f"❌ Tentative {number} ({desk_name}): {e}")
+            return None, None
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            self._record(operation, start, 'failed')
+            logger.error(f"❌ Tentative {number} ({desk_name}): erreur de requête {e}")
+            client.forget_reads(*attempt['operation'])
+            # Seul un échec de connexion garantit que la mutation n'est pas partie
+            return None, (None if isinstance(e, requests.exceptions.ConnectTimeout) else 'ambiguous')
+        client.forget_reads(*attempt['operation'])
+        received_at = self.clock()
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        timing = f"envoyée à T0{(sent_at - release_at) * 1000:+.1f} ms, réponse à T0{(received_at - release_at) * 1000:+.1f} ms"
+        if response.status_code != 200:
+            self._record(operation, start, 'failed')
+            logger.warning(f"⚠️ Tentative {number} ({desk_name}): HTTP {response.status_code}, {timing}")
+            # 4xx, 429 et 503: refusée sans traitement; autre 5xx: peut-être appliquée
+            ambiguous = response.status_code >= 500 and response.status_code not in policy.NOT_PROCESSED_STATUSES
+            return None, ('ambiguous' if ambiguous else None)
+
+        try:
+            result = response.json()
+        except ValueError:
+            self._record(operation, start, 'failed')
+            logger.warning(f"⚠️ Tentative {number} ({desk_name}): réponse illisible, {timing}")
+            return None, 'ambiguous'
+        created = (result.get('data') or {}).get('createAffectation')
+        if result.get('errors') or not created:
+            self._record(operation, start, 'graphql_error')
+            logger.warning(f"⚠️ Tentative {number} ({desk_name}) rejetée, {timing}: {result.get('errors')}")
+            client._forget_missing_desk(attempt['desk']['desk_id'], result.get('errors'))
+            return None, booking_error_kind(result.get('errors'))
+
+        self._record(operation, start, 'success')
+        logger.info(f"🎯 Tentative {number} ({desk_name}) acceptée, {timing}")
+        return created, None
+
+    @staticmethod
+    def _record(operation: str, start: float, outcome: str):
+        """Métriques d'une tentative, comme celles de _graphql_request"""
+        metrics.graphql_latency.observe(time.perf_counter() - start, operation=operation, outcome=outcome)
+        metrics.graphql_requests.inc(operation=operation, outcome=outcome)
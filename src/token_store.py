@@ -0,0 +1,105 @@
+"""
+Stockage des tokens OneFlex renouvelés, un fichier par compte
+
+Remplace la réécriture du .env à chaque refresh: le .env n'est lu qu'au
+démarrage, les tokens obtenus ensuite sont écrits ici de façon atomique.
+"""
+import json
+import os
+import re
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """
+    Access token, refresh token et expiration d'un compte
+
+    Chaque écriture passe par un fichier temporaire synchronisé sur disque (fsync)
+    puis renommé: un arrêt brutal laisse l'ancien ou le nouveau fichier, jamais un
+    fichier tronqué. Le chemin est résolu une fois pour toutes et une écriture
+    identique à la précédente est ignorée.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Fichier JSON des tokens
+        """
+        self.path = Path(path).resolve()
+        self._last: Optional[Dict] = None  # Dernier contenu lu ou écrit
+
+    @classmethod
+    def for_account(cls, directory: str, account: Optional[str]) -> 'TokenStore':
+        """
+        Stockage du compte dans un dossier (tokens-<compte>.json)
+
+        Args:
+            directory: Dossier des fichiers de tokens
+            account: Identifiant du compte (email ou sujet du token)
+        """
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', account or 'default')
+        return cls(str(Path(directory) / f"tokens-{name}.json"))
+
+    def load(self) -> Optional[Dict]:
+        """
+        Returns:
+            Dict access_token, refresh_token, expires_at, ou None si absent/illisible
+        """
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Stockage des tokens illisible: {e}")
+            return None
+        if not isinstance(data, dict) or not data.get('access_token'):
+            return None
+        self._last = data
+        return dict(data)
+
+    def save(self, access_token: str, refresh_token: Optional[str], expires_at: Optional[float]) -> bool:
+        """
+        Enregistre les tokens (rien n'est écrit s'ils n'ont pas changé)
+
+        Returns:
+            True si le fichier a été écrit
+        """
+        data = {'access_token': access_token, 'refresh_token': refresh_token, 'expires_at': expires_at}
+        if data == self._last:
+            return False
+
+        tmp_path = self.path.with_suffix('.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)  # Lisible par le seul propriétaire
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._fsync_directory()
+        except OSError as e:
+            logger.error(f"❌ Impossible d'enregistrer les tokens: {e}")
+            return False
+
+        self._last = data
+        logger.info(f"💾 Tokens enregistrés dans {self.path}")
+        return True
+
+    def _fsync_directory(self):
+        """Rend le renommage durable (sans effet sur les systèmes qui ne le permettent pas)"""
+        try:
+            fd = os.open(self.path.parent, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
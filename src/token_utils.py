@@ -0,0 +1,57 @@
+"""
+Utilitaires pour lire les claims des tokens JWT OneFlex
+
+Le décodage est local et sans vérification de signature: il sert uniquement à
+connaître le sujet et l'expiration du token, le serveur restant seul juge de sa validité.
+"""
+import base64
+import json
+from typing import Dict, Optional
+
+
+def decode_jwt_claims(token: Optional[str]) -> Dict:
+    """
+    Décode le payload d'un JWT sans vérifier la signature
+
+    Args:
+        token: Token JWT (header.payload.signature)
+
+    Returns:
+        Dict des claims, vide si le token n'est pas un JWT lisible
+    """
+    if not token or token.count('.') != 2:
+        return {}
+
+    payload = token.split('.')[1]
+    payload += '=' * (-len(payload) % 4)  # Le base64url des JWT n'a pas de padding
+
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode('ascii')))
+    except (ValueError, UnicodeDecodeError):
+        return {}
+
+    return claims if isinstance(claims, dict) else {}
+
+
+def token_subject(token: Optional[str]) -> Optional[str]:
+    """Retourne le sujet (claim 'sub') du token, ou None"""
+    subject = decode_jwt_claims(token).get('sub')
+    return str(subject) if subject is not None else None
+
+
+def token_lifetime(token: Optional[str]) -> Optional[float]:
+    """Retourne la durée de validité du token (claims 'exp' - 'iat', secondes), ou None"""
+    claims = decode_jwt_claims(token)
+    try:
+        return float(claims['exp']) - float(claims['iat'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def token_expiry(token: Optional[str]) -> Optional[float]:
+    """Retourne l'expiration du token (claim 'exp', timestamp UNIX), ou None"""
+    exp = decode_jwt_claims(token).get('exp')
+    try:
+        return float(exp) if exp is not None else None
+    except (TypeError, ValueError):
+        return None
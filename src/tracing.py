@@ -0,0 +1,148 @@
+"""
+Traces légères: un span racine par job ou commande, des spans enfants par appel API
+
+Les spans suivent le contexte d'exécution (contextvars), y compris dans les threads
+du client async. Chaque span terminé est écrit sur une ligne JSON (TRACE_FILE), ce
+qui permet de reconstruire après coup la chronologie d'une exécution.
+"""
+import functools
+import json
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('oneflex_current_span', default=None)
+
+
+class Span:
+    """Portion chronométrée d'une exécution"""
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, **attributes):
+        """Ajoute des attributs au span"""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration_ms': round((self.duration or 0) * 1000, 3),
+            'status': self.status,
+            'thread': threading.current_thread().name,
+            'attributes': self.attributes,
+        }
+
+
+class Tracer:
+    """Crée les spans et écrit les spans terminés dans un fichier JSON lines"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Fichier d'export (None ou vide = traces désactivées)
+        """
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+
+    def configure(self, path: Optional[str]):
+        """
+        Change le fichier d'export (instance partagée, réglée au démarrage)
+
+        Args:
+            path: Fichier d'export (None ou vide = traces désactivées)
+        """
+        with self._lock:
+            self.path = Path(path) if path else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Ouvre un span, enfant du span courant s'il y en a un
+
+        Usage:
+            with tracer.span('book_desk', date='2026-03-02', desk_id='...') as span:
+                ...
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._started
+            _current_span.reset(token)
+            self._export(span)
+
+    def _export(self, span: Span):
+        """Ajoute le span au fichier (une ligne JSON)"""
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        try:
+            with self._lock:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+        except OSError as e:
+            logger.warning(f"⚠️ Impossible d'écrire la trace dans {self.path}: {e}")
+            self.path = None
+
+
+def current_span() -> Optional[Span]:
+    """Span en cours dans ce contexte (None hors trace)"""
+    return _current_span.get()
+
+
+def annotate(**attributes):
+    """Ajoute des attributs au span courant, s'il y en a un"""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def traced(name: str):
+    """
+    Décorateur: exécute la fonction dans un span
+
+    Les attributs connus seulement dans la fonction s'ajoutent avec annotate().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Instance globale, désactivée tant que main ne l'a pas configurée (TRACE_FILE)
+tracer = Tracer()
+span = tracer.span